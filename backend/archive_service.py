@@ -0,0 +1,141 @@
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, inspect, insert, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import ClauseAdapter
+from database import engine, SessionLocal, ARCHIVE_SCHEMA
+import models
+
+# Rows moved per commit: keeps each write lock short (~0.1 s for patients, whose delete
+# also updates the search index), so clinical writes interleave with a long run
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_INTERVAL_HOURS = 6
+
+# Hot table -> (model, age column, retention days, extra conditions, archive sort column).
+# Rows whose age column is older than the retention horizon move to the archive database
+# (hospital_archive.db, attached to every connection as "archive").
+ARCHIVE_POLICIES = {
+    "patients": (models.PatientRecord, models.PatientRecord.discharge_time, 90, (), "timestamp"),
+    "tasks": (models.Task, func.coalesce(models.Task.completed_at, models.Task.due_time), 30,
+              (models.Task.status.in_(["Completed", "Cancelled"]),), "due_time"),
+    "events": (models.Event, models.Event.timestamp, 90, (), "timestamp"),
+    "inventory_logs": (models.InventoryLog, models.InventoryLog.timestamp, 90, (), "timestamp"),
+    "prediction_log": (models.PredictionLog, models.PredictionLog.timestamp, 30, (), "timestamp"),
+}
+
+def _archive_table(table: Table, sort_column: str) -> Table:
+    # Same columns, no foreign keys (their targets stay in the hot database)
+    archived = Table(
+        table.name, archive_metadata,
+        *[Column(c.name, c.type, primary_key=c.primary_key) for c in table.columns],
+        schema=ARCHIVE_SCHEMA
+    )
+    Index(f"ix_archive_{table.name}_{sort_column}_id", archived.c[sort_column], archived.c.id)
+    return archived
+
+archive_metadata = MetaData()
+ARCHIVE_TABLES = {
+    name: _archive_table(model.__table__, sort_column)
+    for name, (model, _, _, _, sort_column) in ARCHIVE_POLICIES.items()
+}
+
+class ArchiveService:
+    """
+    Hot/cold split: closed records past their retention horizon are moved out of the
+    tables the dashboards scan into the attached archive database.
+    A move copies a batch into the archive, commits, then deletes it from the hot table.
+    A crash in between leaves a row in both places, never in neither; reads across both
+    skip the duplicate and the next run finishes the delete.
+    """
+    @staticmethod
+    def ensure_schema(bind=engine):
+        """Creates missing archive tables / indexes and adds columns new to models.py."""
+        archive_metadata.create_all(bind=bind)
+        inspector = inspect(bind)
+        with bind.begin() as conn:
+            for table in ARCHIVE_TABLES.values():
+                existing = {col["name"] for col in inspector.get_columns(table.name, schema=ARCHIVE_SCHEMA)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        col_type = column.type.compile(dialect=bind.dialect)
+                        conn.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{table.name} ADD COLUMN {column.name} {col_type}"))
+
+    @staticmethod
+    def sources(model):
+        """Tables holding a model's rows: the hot table first, then its archive (if archived)."""
+        archived = ARCHIVE_TABLES.get(model.__tablename__)
+        return [model.__table__, archived] if archived is not None else [model.__table__]
+
+    @staticmethod
+    def adapt(conditions, table: Table):
+        """Re-targets filters written against the hot model onto `table` (matched by column name)."""
+        if table.schema != ARCHIVE_SCHEMA:
+            return list(conditions)
+        adapter = ClauseAdapter(table, adapt_on_names=True)
+        return [adapter.traverse(c) for c in conditions]
+
+    @staticmethod
+    def merge(ordered_sources, key, reverse: bool = False):
+        """
+        Merges row streams that are each sorted by `key`, dropping a row whose key equals
+        the previous one (the same record caught in both tables mid-move).
+        """
+        last = object()
+        for row in heapq.merge(*ordered_sources, key=key, reverse=reverse):
+            k = key(row)
+            if k != last:
+                last = k
+                yield row
+
+    @staticmethod
+    def archive_table(db: Session, name: str, now: datetime = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+        """Moves every row of one hot table past its horizon. Returns how many moved."""
+        model, age_column, retention_days, extra, _ = ARCHIVE_POLICIES[name]
+        hot, archived = model.__table__, ARCHIVE_TABLES[name]
+        horizon = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        columns = [c.name for c in hot.columns]
+        moved = 0
+        while True:
+            ids = db.execute(
+                select(hot.c.id).where(age_column != None, age_column < horizon, *extra).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return moved
+            db.execute(insert(archived).prefix_with("OR REPLACE").from_select(
+                columns, select(*hot.c).where(hot.c.id.in_(ids))
+            ))
+            db.commit()
+            db.execute(delete(hot).where(hot.c.id.in_(ids)))
+            db.commit()
+            moved += len(ids)
+
+    @staticmethod
+    def run(now: datetime = None):
+        """One archiving pass over every policy. Returns {table: rows moved}."""
+        db = SessionLocal()
+        try:
+            return {name: ArchiveService.archive_table(db, name, now) for name in ARCHIVE_POLICIES}
+        finally:
+            db.close()
+
+class Archiver:
+    """Runs ArchiveService.run off the event loop every `interval_hours`, starting at boot."""
+    def __init__(self, interval_hours: float = ARCHIVE_INTERVAL_HOURS):
+        self.interval = interval_hours * 3600
+
+    async def run(self):
+        while True:
+            try:
+                moved = await asyncio.to_thread(ArchiveService.run)
+                if any(moved.values()):
+                    print(f"Archived: {moved}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Archiving failed, retrying next cycle: {e}")
+            await asyncio.sleep(self.interval)
+
+if __name__ == "__main__":
+    ArchiveService.ensure_schema()
+    print(f"Archived: {ArchiveService.run()}")
@@ -0,0 +1,95 @@
+import threading
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+import models
+
+CLAIMED_KEY = "claimed_beds"
+
+class BedAllocator:
+    """
+    Bed-level concurrency control that actually works on SQLite.
+    SQLite ignores SELECT ... FOR UPDATE, so a bed is claimed with a conditional
+    UPDATE ... WHERE is_occupied = 0 AND status = 'AVAILABLE'. That statement is the
+    first write of the transaction, so it takes SQLite's write lock and re-checks
+    the row atomically; a rowcount of 0 means another request (or worker process)
+    got there first.
+    Inside one process, a per-pool lock plus an in-flight set keep concurrent
+    requests from even trying the same bed, so contention costs no failed claims.
+    """
+    _pool_locks = {}
+    _registry_lock = threading.Lock()
+    _in_flight = set()
+    _in_flight_lock = threading.Lock()
+
+    @staticmethod
+    def pool_lock(pool: str) -> threading.Lock:
+        with BedAllocator._registry_lock:
+            if pool not in BedAllocator._pool_locks:
+                BedAllocator._pool_locks[pool] = threading.Lock()
+            return BedAllocator._pool_locks[pool]
+
+    @staticmethod
+    def _claim(db: Session, bed_id: str) -> bool:
+        result = db.execute(
+            update(models.BedModel)
+            .where(
+                models.BedModel.id == bed_id,
+                models.BedModel.is_occupied == False,
+                models.BedModel.status == "AVAILABLE"
+            )
+            .values(is_occupied=True, status="OCCUPIED")
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount != 1:
+            return False
+        with BedAllocator._in_flight_lock:
+            BedAllocator._in_flight.add(bed_id)
+        db.info.setdefault(CLAIMED_KEY, set()).add(bed_id)
+        return True
+
+    @staticmethod
+    def claim_bed(db: Session, bed_id: str) -> bool:
+        """Claims a specific bed (direct admission). Returns False if it is taken."""
+        with BedAllocator.pool_lock(bed_id):
+            if bed_id in BedAllocator._in_flight:
+                return False
+            return BedAllocator._claim(db, bed_id)
+
+    @staticmethod
+    def claim_first_available(db: Session, bed_type: str, gender: str = None, batch_size: int = 8):
+        """
+        Claims the first free bed of a type (and ward gender) and returns it, or None if the pool is full.
+        The claim is part of the caller's transaction and is released by its rollback.
+        """
+        pool = f"{bed_type}:{gender or 'Any'}"
+        with BedAllocator.pool_lock(pool):
+            while True:
+                query = db.query(models.BedModel.id).filter(
+                    models.BedModel.type == bed_type,
+                    models.BedModel.is_occupied == False,
+                    models.BedModel.status == "AVAILABLE"
+                )
+                if gender:
+                    query = query.filter(models.BedModel.gender == gender)
+                with BedAllocator._in_flight_lock:
+                    in_flight = list(BedAllocator._in_flight)
+                if in_flight:
+                    query = query.filter(models.BedModel.id.notin_(in_flight))
+                candidates = [row.id for row in query.limit(batch_size).all()]
+                if not candidates:
+                    return None
+
+                for bed_id in candidates:
+                    if BedAllocator._claim(db, bed_id):
+                        bed = db.get(models.BedModel, bed_id)
+                        db.refresh(bed)
+                        return bed
+                # Every candidate was taken by another process in the meantime; look again
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_claims(session, transaction):
+    # Committed claims are now visible as occupied rows; rolled back ones are free again
+    if transaction.parent is None and CLAIMED_KEY in session.info:
+        with BedAllocator._in_flight_lock:
+            BedAllocator._in_flight.difference_update(session.info.pop(CLAIMED_KEY))
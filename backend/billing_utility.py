@@ -1,6 +1,8 @@
 from datetime import datetime
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import models
+from event_bus import EventBus
 
 def calculate_accrued_bed_cost(admission_time: datetime, daily_rate: float, end_time: datetime = None) -> float:
     """Calculates accrued bed cost: (end_time - start_time) * daily_rate / 86400 (seconds in a day)."""
@@ -15,7 +17,10 @@ def calculate_accrued_bed_cost(admission_time: datetime, daily_rate: float, end_
 class BillingListener:
     @staticmethod
     def log_event(db: Session, patient_id: str, item_type: str, description: str, amount: float):
-        """Automatically posts a line-item to the patient_ledger and updates the FinancialLedger."""
+        """
+        Automatically posts a line-item to the patient_ledger and updates the FinancialLedger.
+        Does not commit: the entry joins the caller's unit of work.
+        """
         entry = models.BillingLedger(
             patient_id=patient_id,
             item_type=item_type,
@@ -33,20 +38,48 @@ class BillingListener:
             description=f"Revenue: {description} for {patient_id}"
         )
         db.add(ledger_entry)
-        db.commit()
         
-        # [NEW] Broadcast to CFO Dashboard
-        from main import manager
-        import asyncio
-        asyncio.create_task(manager.broadcast({
+        # [NEW] Broadcast to CFO Dashboard (outbox row, delivered once the caller commits)
+        EventBus.publish(db, {
             "type": "REVENUE_UPDATE",
             "desc": description,
             "amt": amount,
             "patient_id": patient_id,
             "timestamp": datetime.utcnow().isoformat()
-        }))
+        })
         return entry
 
+    @staticmethod
+    def log_events(db: Session, patient_id: str, item_type: str, lines):
+        """
+        Batched log_event for several charges of one clinical event ([(description, amount)]):
+        the patient ledger stays itemised (one executemany), revenue is booked as one
+        FinancialLedger row and one REVENUE_UPDATE. Does not commit.
+        """
+        if not lines:
+            return
+        now = datetime.utcnow()
+        db.execute(insert(models.BillingLedger), [
+            {"patient_id": patient_id, "item_type": item_type, "description": description, "amount": amount, "timestamp": now}
+            for description, amount in lines
+        ])
+        description = ", ".join(d for d, _ in lines)
+        total = sum(amount for _, amount in lines)
+        db.add(models.FinancialLedger(
+            transaction_type="CREDIT",
+            category="REVENUE",
+            amount=total,
+            reference_id=patient_id,
+            description=f"Revenue: {description} for {patient_id}"
+        ))
+        EventBus.publish(db, {
+            "type": "REVENUE_UPDATE",
+            "desc": description,
+            "amt": total,
+            "patient_id": patient_id,
+            "timestamp": now.isoformat()
+        })
+
     @staticmethod
     def log_financial_transaction(db: Session, t_type: str, category: str, amount: float, description: str, ref_id: str = None):
         """Universal ledger logger for professional RCM."""
@@ -0,0 +1,41 @@
+from sqlalchemy.orm import Session
+from hospital_state import HospitalSnapshot, bed_counts, hospital_state
+
+OCCUPANCY_UNITS = ["ER", "ICU", "Wards", "Surgery"]
+VENTILATORS_TOTAL = 20
+DEFAULT_TOTAL_BEDS = 190
+
+class DashboardService:
+    """
+    /api/dashboard/stats, derived from the shared hospital state snapshot: dashboards poll
+    every few seconds, and between commits to beds, ambulances or staff a poll runs no queries.
+    """
+    @staticmethod
+    def from_snapshot(snapshot: HospitalSnapshot) -> dict:
+        occupancy = {unit: snapshot.beds["by_type"].get(unit, bed_counts())["in_use"] for unit in OCCUPANCY_UNITS}
+        total_patients = sum(occupancy.values())
+        total_beds = snapshot.total_beds or DEFAULT_TOTAL_BEDS
+        doctors = snapshot.staff_on_shift.get("Doctor", 0)
+
+        # Staff Ratio (Patients per Doctor)
+        ratio_str = "N/A"
+        if doctors > 0:
+            ratio_str = f"1:{round(total_patients / doctors, 1)}"
+
+        return {
+            "staff_ratio": ratio_str,
+            "occupancy": occupancy,
+            "bed_stats": {
+                "total": total_beds,
+                "occupied": total_patients,
+                "available": total_beds - total_patients
+            },
+            "resources": {
+                "Ventilators": {"total": VENTILATORS_TOTAL, "in_use": snapshot.beds["ventilators_in_use"]},
+                "Ambulances": {"total": sum(snapshot.ambulances.values()), "available": snapshot.ambulances.get("IDLE", 0)}
+            }
+        }
+
+    @staticmethod
+    def get_stats(db: Session) -> dict:
+        return DashboardService.from_snapshot(hospital_state.snapshot(db))
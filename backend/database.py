@@ -1,13 +1,26 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./hospital_os.db"
+ARCHIVE_DATABASE_PATH = "./hospital_archive.db" # Cold rows moved out by archive_service
+ARCHIVE_SCHEMA = "archive"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragma(dbapi_connection, connection_record):
+    # WAL: readers (long exports, history streams) never block clinical writes and
+    # see a consistent snapshot; the setting persists in the database file
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (ARCHIVE_DATABASE_PATH,))
+    cursor.execute(f"PRAGMA {ARCHIVE_SCHEMA}.journal_mode=WAL")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import math
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models
+from inventory_service import hour_bucket, BURN_WINDOW_HOURS
+
+HISTORY_HOURS = 14 * 24    # Hourly usage fed to the model
+SEASON_HOURS = 24          # Daily demand cycle
+HORIZON_HOURS = 7 * 24     # Furthest stockout the forecast can see
+MIN_SEASONAL_HISTORY = 2 * SEASON_HOURS # Shorter histories get a flat mean instead
+DAMPING = 0.98             # Damped trend: a busy morning does not extrapolate for a week
+Z_SCORE = 1.645            # 90% two-sided bands / 95% service level for reorder quantities
+REORDER_LEAD_HOURS = 24    # Supplier lead time
+REORDER_COVER_HOURS = 72   # Stock a reorder should cover after it arrives
+FORECAST_REFRESH_SECONDS = 300
+
+# Smoothing parameters tried for every item (alpha: level, beta: trend, gamma: season);
+# each item keeps the combination with the lowest one-step-ahead error
+PARAMETER_GRID = list(itertools.product([0.05, 0.2, 0.5], [0.01, 0.1], [0.05, 0.3]))
+
+def fit_forecast(series: np.ndarray, horizon: int = HORIZON_HOURS, season: int = SEASON_HOURS):
+    """
+    Additive Holt-Winters (damped trend, `season`-hour seasonality) fitted to every row of
+    `series` (items x hours) at once: the smoothing recursion runs over time, vectorised
+    across items and PARAMETER_GRID. Rows with less than MIN_SEASONAL_HISTORY hours since
+    their first usage fall back to their mean rate.
+    Returns (demand per future hour (items x horizon, >= 0), residual std per item, seasonal mask).
+    """
+    n_items, n_hours = series.shape
+    params = np.array(PARAMETER_GRID)
+    alpha, beta, gamma = (params[:, i, None] for i in range(3)) # (grid, 1): broadcast over items
+    y = np.broadcast_to(series, (len(params), n_items, n_hours))
+
+    level = series[:, :season].mean(axis=1)
+    trend = (series[:, season:2 * season].mean(axis=1) - level) / season
+    seasonal = series[:, :season] - level[:, None]
+    level = np.tile(level, (len(params), 1))
+    trend = np.tile(trend, (len(params), 1))
+    seasonal = np.tile(seasonal, (len(params), 1, 1))
+    sse = np.zeros((len(params), n_items))
+    for t in range(season, n_hours):
+        s = seasonal[:, :, t % season]
+        error = y[:, :, t] - (level + DAMPING * trend + s)
+        sse += error ** 2
+        new_level = alpha * (y[:, :, t] - s) + (1 - alpha) * (level + DAMPING * trend)
+        trend = beta * (new_level - level) + (1 - beta) * DAMPING * trend
+        seasonal[:, :, t % season] = gamma * (y[:, :, t] - new_level) + (1 - gamma) * s
+        level = new_level
+
+    best = sse.argmin(axis=0)
+    pick = (best, np.arange(n_items))
+    steps = np.arange(1, horizon + 1)
+    damped = np.cumsum(DAMPING ** steps) # phi + phi^2 + ... + phi^h
+    season_index = (n_hours + steps - 1) % season
+    demand = level[pick][:, None] + damped[None, :] * trend[pick][:, None] + seasonal[best, np.arange(n_items)][:, season_index]
+    sigma = np.sqrt(sse[pick] / max(n_hours - season, 1))
+
+    # Short or empty histories: flat mean over the hours since first use
+    used = series > 0
+    first_use = np.where(used.any(axis=1), used.argmax(axis=1), n_hours)
+    seasonal_mask = n_hours - first_use >= MIN_SEASONAL_HISTORY
+    span = np.maximum(n_hours - first_use, 1)
+    mean_rate = series.sum(axis=1) / span
+    flat_sigma = np.sqrt(((series - mean_rate[:, None]) ** 2 * (np.arange(n_hours) >= first_use[:, None])).sum(axis=1) / span)
+    demand = np.where(seasonal_mask[:, None], demand, mean_rate[:, None])
+    sigma = np.where(seasonal_mask, sigma, flat_sigma)
+    return np.clip(demand, 0, None), sigma, seasonal_mask
+
+def first_crossing(cumulative: np.ndarray, stock: np.ndarray, step_ends: np.ndarray):
+    """Hours until each row's cumulative demand reaches its stock (linear within an hour); inf if never."""
+    reached = cumulative >= stock[:, None]
+    hit = reached.any(axis=1)
+    k = reached.argmax(axis=1)
+    rows = np.arange(len(stock))
+    before = np.where(k > 0, cumulative[rows, k - 1], 0.0)
+    step = np.maximum(cumulative[rows, k] - before, 1e-9)
+    start = np.where(k > 0, step_ends[k - 1], 0.0)
+    hours = start + (step_ends[k] - start) * np.clip((stock - before) / step, 0, 1)
+    return np.where(hit, hours, np.inf)
+
+def demand_until(cumulative: np.ndarray, step_ends: np.ndarray, hours: float):
+    """Each row's expected cumulative demand `hours` from now (linear within an hour)."""
+    k = min(int(np.searchsorted(step_ends, hours)), len(step_ends) - 1)
+    before = cumulative[:, k - 1] if k > 0 else 0.0
+    start = step_ends[k - 1] if k > 0 else 0.0
+    return before + (cumulative[:, k] - before) * min(max((hours - start) / (step_ends[k] - start), 0.0), 1.0)
+
+class DemandForecaster:
+    """
+    Cached demand model for every inventory item, refreshed in the background. A request
+    only combines the cached demand curves with current stock levels (one read).
+    """
+    def __init__(self, refresh_seconds: float = FORECAST_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.model = None
+
+    @staticmethod
+    def load_series(db: Session, origin: datetime):
+        """Item ids and their hourly usage (items x HISTORY_HOURS) up to `origin`, from the burn-rate rollup."""
+        burn = models.InventoryBurnRate
+        start = origin - timedelta(hours=HISTORY_HOURS)
+        hour_index = cast(func.round((func.julianday(burn.hour_start) - func.julianday(start)) * 24), Integer)
+        ids = np.array(db.execute(select(models.InventoryItem.id).order_by(models.InventoryItem.id)).scalars().all(), dtype=np.int64)
+        # Plain tuples: NumPy converts Row objects one element at a time (30x slower)
+        rows = np.array([tuple(r) for r in db.execute(
+            select(burn.item_id, hour_index, burn.quantity_used).where(burn.hour_start >= start, burn.hour_start < origin)
+        )], dtype=np.float64).reshape(-1, 3)
+        series = np.zeros((len(ids), HISTORY_HOURS))
+        if len(rows) and len(ids):
+            item_rows = np.searchsorted(ids, rows[:, 0].astype(np.int64))
+            known = (item_rows < len(ids)) & (ids[np.minimum(item_rows, len(ids) - 1)] == rows[:, 0])
+            np.add.at(series, (item_rows[known], rows[known, 1].astype(np.int64)), rows[known, 2])
+        return ids, series
+
+    def refresh(self, now: datetime = None):
+        """Refits every item on complete hours up to the current one and swaps the cached model."""
+        origin = hour_bucket(now or datetime.utcnow())
+        db = SessionLocal()
+        try:
+            ids, series = DemandForecaster.load_series(db, origin)
+        finally:
+            db.close()
+        demand, sigma, seasonal = fit_forecast(series)
+        self.model = {"origin": origin, "index": {int(i): n for n, i in enumerate(ids)},
+                      "demand": demand, "sigma": sigma, "seasonal": seasonal}
+        return self.model
+
+    def forecast(self, db: Session, now: datetime = None):
+        now = now or datetime.utcnow()
+        model = self.model or self.refresh(now)
+        items = db.execute(select(
+            models.InventoryItem.id, models.InventoryItem.name, models.InventoryItem.category,
+            models.InventoryItem.quantity, models.InventoryItem.reorder_level
+        ).order_by(models.InventoryItem.id)).all()
+        if not items:
+            return []
+
+        # Align cached curves with current items (items added since the last refresh forecast zero)
+        rows = np.array([model["index"].get(item.id, -1) for item in items])
+        known = rows >= 0
+        demand = np.where(known[:, None], model["demand"][np.maximum(rows, 0)], 0.0)
+        sigma = np.where(known, model["sigma"][np.maximum(rows, 0)], 0.0)
+        seasonal = known & model["seasonal"][np.maximum(rows, 0)]
+        stock = np.array([max(item.quantity or 0, 0) for item in items], dtype=np.float64)
+
+        # Hour 0 of the curve is the model's origin hour: keep only what is left of it
+        elapsed = min((now - model["origin"]).total_seconds() / 3600, HORIZON_HOURS - 1)
+        step_ends = np.arange(1, HORIZON_HOURS + 1) - elapsed
+        remaining = np.clip(step_ends, 0, 1) # Fraction of each hour still ahead
+        cumulative = np.cumsum(demand * remaining, axis=1)
+        spread = Z_SCORE * sigma[:, None] * np.sqrt(np.maximum(step_ends, 0))
+        hours = first_crossing(cumulative, stock, step_ends)
+        hours_early = first_crossing(cumulative + spread, stock, step_ends)
+        hours_late = first_crossing(np.maximum(cumulative - spread, 0), stock, step_ends)
+
+        # Order-up-to level: expected demand over lead time + cover, plus safety stock
+        window = REORDER_LEAD_HOURS + REORDER_COVER_HOURS
+        target = demand_until(cumulative, step_ends, window) + Z_SCORE * sigma * math.sqrt(window)
+        reorder = np.ceil(np.maximum(target - stock, 0))
+        burn = demand_until(cumulative, step_ends, BURN_WINDOW_HOURS) / BURN_WINDOW_HOURS # Units/hour, next 6 hours
+
+        forecast_data = []
+        for n, item in enumerate(items):
+            hours_remaining = float(hours[n]) if np.isfinite(hours[n]) else 999.0
+            status = "Normal"
+            if hours_remaining < 3:
+                status = "Critical" # Stockout Imminent
+            elif hours_remaining < 12:
+                status = "Warning" # Draft Reorder
+            forecast_data.append({
+                "id": item.id,
+                "name": item.name,
+                "category": item.category,
+                "quantity": item.quantity,
+                "reorder_level": item.reorder_level,
+                "burn_rate": round(float(burn[n]), 2),
+                "hours_remaining": round(hours_remaining, 1),
+                "stockout_at": (now + timedelta(hours=hours_remaining)).isoformat() if hours_remaining < 999 else None,
+                # Confidence band on the stockout time (None: not within the horizon)
+                "stockout_hours_low": round(float(hours_early[n]), 1) if np.isfinite(hours_early[n]) else None,
+                "stockout_hours_high": round(float(hours_late[n]), 1) if np.isfinite(hours_late[n]) else None,
+                "reorder_quantity": int(reorder[n]),
+                "status": status,
+                "model": "holt_winters" if seasonal[n] else "mean_rate",
+            })
+        return forecast_data
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Demand forecast refresh failed, keeping the previous model: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+demand_forecaster = DemandForecaster()
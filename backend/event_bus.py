@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import models
+
+PENDING_KEY = "outbox_pending"
+
+class EventBus:
+    """
+    Transactional outbox for WebSocket events.
+    Messages are written to the event_outbox table inside the caller's transaction,
+    so a rollback drops them and a commit makes them durable. The OutboxDispatcher
+    delivers them off the request path.
+    """
+    dispatcher = None
+
+    @staticmethod
+    def publish(db: Session, message: dict):
+        """Adds a WebSocket message to the caller's unit of work. Sent once the transaction commits."""
+        db.add(models.OutboxEvent(event_type=message.get("type"), payload=message))
+        db.info[PENDING_KEY] = True
+
+    @staticmethod
+    def attach(dispatcher):
+        EventBus.dispatcher = dispatcher
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_dispatcher(session):
+    if session.info.pop(PENDING_KEY, False) and EventBus.dispatcher:
+        EventBus.dispatcher.wake()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+class OutboxDispatcher:
+    def __init__(self, session_factory, manager, batch_size: int = 200, poll_seconds: float = 2.0, linger_seconds: float = 0.05, retention_hours: int = 24):
+        self.session_factory = session_factory
+        self.manager = manager
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.linger_seconds = linger_seconds
+        self.retention = timedelta(hours=retention_hours)
+        self.loop = None
+        self.wakeup = None
+        self.last_prune = datetime.min
+
+    def wake(self):
+        """Thread-safe nudge; commits happen on worker threads as well as the event loop."""
+        if self.loop and self.wakeup:
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                while await self.drain_once():
+                    pass
+                if datetime.utcnow() - self.last_prune > timedelta(minutes=10):
+                    await asyncio.to_thread(self._prune)
+                    self.last_prune = datetime.utcnow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Outbox dispatch failed, retrying: {e}")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_seconds)
+                # Linger briefly so commits arriving together are drained as one batch
+                await asyncio.sleep(self.linger_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Sends one batch of undelivered events (oldest first). Returns how many were sent."""
+        batch = await asyncio.to_thread(self._fetch_batch)
+        if not batch:
+            return 0
+        await self.manager.broadcast_batch([payload for _, payload in batch])
+        await asyncio.to_thread(self._mark_dispatched, [event_id for event_id, _ in batch])
+        return len(batch)
+
+    def _fetch_batch(self):
+        db = self.session_factory()
+        try:
+            rows = db.query(models.OutboxEvent.id, models.OutboxEvent.payload).filter(
+                models.OutboxEvent.dispatched_at == None
+            ).order_by(models.OutboxEvent.id.asc()).limit(self.batch_size).all()
+            return [(row.id, row.payload) for row in rows]
+        finally:
+            db.close()
+
+    def _mark_dispatched(self, ids):
+        db = self.session_factory()
+        try:
+            db.query(models.OutboxEvent).filter(models.OutboxEvent.id.in_(ids)).update(
+                {"dispatched_at": datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self):
+        db = self.session_factory()
+        try:
+            db.query(models.OutboxEvent).filter(
+                models.OutboxEvent.dispatched_at < datetime.utcnow() - self.retention
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
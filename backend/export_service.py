@@ -0,0 +1,205 @@
+import csv
+import io
+import json
+from datetime import datetime
+from itertools import islice
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, select, tuple_, union
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from history_service import HistoryService, to_json
+from archive_service import ArchiveService
+import models
+
+EXPORT_CHUNK_SIZE = 2000 # Rows fetched per round trip (yield_per) and written per chunk / row group
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Exportable tables: oldest first, ordered and resumed on (timestamp column, primary key)
+EXPORT_TABLES = {
+    "patients": (models.PatientRecord, models.PatientRecord.timestamp),
+    "patient_ledger": (models.BillingLedger, models.BillingLedger.timestamp),
+    "financial_ledger": (models.FinancialLedger, models.FinancialLedger.timestamp),
+    "surgery_history": (models.SurgeryHistory, models.SurgeryHistory.end_time),
+    "inventory_logs": (models.InventoryLog, models.InventoryLog.timestamp),
+}
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+class _ChunkSink:
+    """Write-only file object for pyarrow: collects bytes until the stream drains them."""
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+class ExportService:
+    """
+    Bulk export of the clinical and financial tables.
+    One ordered query per export (per source table for archived tables, merged), iterated
+    with yield_per so only EXPORT_CHUNK_SIZE rows are in memory; the database runs in WAL mode, so the long read neither blocks writers
+    nor sees rows committed after it started.
+    Exports can be pulled in batches: with a limit, the batch's last key is looked up first
+    (an index-only scan) and returned as the cursor for the next batch, so a failed batch is
+    retried from the same cursor.
+    """
+    @staticmethod
+    def plan(db: Session, table: str, filters=(), cursor: str = None, limit: int = None):
+        """
+        Resolves one export batch: returns (conditions, next_cursor).
+        Raises ValueError on a malformed cursor.
+        """
+        model, ts_col = EXPORT_TABLES[table]
+        id_col = model.__table__.c.id
+        conditions = [ts_col != None, *filters]
+        if cursor:
+            after_ts, after_id = HistoryService.decode_cursor(cursor)
+            conditions.append(tuple_(ts_col, id_col) > tuple_(after_ts, after_id))
+        if not limit:
+            return conditions, None
+
+        # Last row of this batch and whether anything follows it (UNION drops a row
+        # caught in both the hot and archive tables mid-move)
+        keys = union(*[
+            select(t.c[ts_col.key].label("ts"), t.c.id.label("id")).where(*ArchiveService.adapt(conditions, t))
+            for t in ArchiveService.sources(model)
+        ]).subquery()
+        keys = db.execute(select(keys.c.ts, keys.c.id).order_by(keys.c.ts, keys.c.id).offset(limit - 1).limit(2)).all()
+        if not keys:
+            return conditions, None
+        last_ts, last_id = keys[0]
+        conditions.append(tuple_(ts_col, id_col) <= tuple_(last_ts, last_id))
+        next_cursor = HistoryService.encode_cursor(last_ts, last_id) if len(keys) > 1 else None
+        return conditions, next_cursor
+
+    @staticmethod
+    def iter_chunks(table: str, conditions, chunk_size: int = EXPORT_CHUNK_SIZE):
+        """
+        Yields lists of row tuples (table column order) from one server-side cursor, with its
+        own session (a streaming response outlives the request's dependencies).
+        """
+        model, ts_col = EXPORT_TABLES[table]
+        db = SessionLocal()
+        try:
+            # Hot table first, then its archive: one cursor each, merged by (timestamp, id)
+            streams = []
+            for t in ArchiveService.sources(model):
+                result = db.execute(
+                    select(*t.columns).where(*ArchiveService.adapt(conditions, t))
+                    .order_by(t.c[ts_col.key], t.c.id)
+                    .execution_options(yield_per=chunk_size)
+                )
+                streams.append(result)
+            if len(streams) == 1:
+                yield from streams[0].partitions()
+                return
+            ts_index = list(model.__table__.columns).index(model.__table__.c[ts_col.key])
+            id_index = list(model.__table__.columns).index(model.__table__.c.id)
+            merged = ArchiveService.merge(streams, key=lambda r: (r[ts_index], r[id_index]))
+            while rows := list(islice(merged, chunk_size)):
+                yield rows
+        finally:
+            db.close()
+
+    @staticmethod
+    def stream(table: str, conditions, fmt: str):
+        """Yields the export in the requested format, one write per chunk."""
+        chunks = ExportService.iter_chunks(table, conditions)
+        if fmt == "csv":
+            return ExportService._csv(table, chunks)
+        if fmt == "ndjson":
+            names = [c.name for c in EXPORT_TABLES[table][0].__table__.columns]
+            return ("".join(to_json(dict(zip(names, r))) + "\n" for r in rows) for rows in chunks)
+        return ExportService._parquet(table, chunks)
+
+    @staticmethod
+    def _csv(table: str, chunks):
+        columns = EXPORT_TABLES[table][0].__table__.columns
+        # Only datetime and JSON columns need converting; the rest go to csv as-is
+        convert = [i for i, c in enumerate(columns) if not isinstance(c.type, (Boolean, Integer, Float, String))]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([c.name for c in columns])
+        for rows in chunks:
+            if convert:
+                rows = [list(r) for r in rows]
+                for r in rows:
+                    for i in convert:
+                        r[i] = _csv_value(r[i])
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @staticmethod
+    def parquet_schema(table: str):
+        """Arrow schema from the model's column types (JSON columns are exported as JSON text)."""
+        import pyarrow as pa
+        fields = []
+        for column in EXPORT_TABLES[table][0].__table__.columns:
+            if isinstance(column.type, Boolean):
+                arrow_type = pa.bool_()
+            elif isinstance(column.type, Integer):
+                arrow_type = pa.int64()
+            elif isinstance(column.type, Float):
+                arrow_type = pa.float64()
+            elif isinstance(column.type, DateTime):
+                arrow_type = pa.timestamp("us")
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(column.name, arrow_type))
+        return pa.schema(fields)
+
+    @staticmethod
+    def _parquet(table: str, chunks):
+        # One row group per chunk, flushed to the client as soon as it is written
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = ExportService.parquet_schema(table)
+        text_columns = {f.name for f in schema if f.type == pa.string()}
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        try:
+            for rows in chunks:
+                if not rows:
+                    continue
+                columns = {}
+                for name, values in zip(schema.names, zip(*rows)):
+                    if name in text_columns:
+                        values = [v if v is None or isinstance(v, str) else json.dumps(v) for v in values]
+                    columns[name] = values
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
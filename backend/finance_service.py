@@ -3,6 +3,9 @@ from sqlalchemy import func
 from datetime import datetime, timedelta
 import models
 from billing_utility import calculate_accrued_bed_cost
+from time_filters import hospital_today, range_filter, local_date
+from archive_service import ArchiveService
+from hospital_state import hospital_state
 
 class FinanceService:
     @staticmethod
@@ -33,7 +36,7 @@ class FinanceService:
         days_cash = cash_balance / avg_daily_expense if avg_daily_expense > 0 else 0.0
         
         # 4. ARPOB: Total Revenue / Occupied Beds
-        occupied_beds_count = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
+        occupied_beds_count = hospital_state.snapshot(db).occupied_beds
         arpob = ledger_total / occupied_beds_count if occupied_beds_count > 0 else 0.0
         
         # 5. Margin
@@ -156,37 +159,43 @@ class FinanceService:
 
     @staticmethod
     def get_revenue_history(db: Session, days: int = 30):
-        """Calculates revenue and expenses by date from the database."""
+        """
+        Calculates revenue and expenses per hospital-local (IST) date.
+        One grouped query per table over an indexed timestamp range, instead of 2 x days scans.
+        """
+        last_day = hospital_today()
+        first_day = last_day - timedelta(days=days - 1)
+
+        def daily_totals(model):
+            day = local_date(model.timestamp)
+            rows = db.query(day, func.sum(model.amount)).filter(
+                *range_filter(model.timestamp, first_day, last_day)
+            ).group_by(day).all()
+            return {d: total or 0.0 for d, total in rows}
+
+        # 1. Daily Revenue (Ledger only for simplicity in history)
+        # In a full app, we'd include snapshots of bed costs
+        daily_rev = daily_totals(models.BillingLedger)
+        # 2. Daily Expenses
+        daily_exp = daily_totals(models.HospitalExpense)
+
         history = []
-        now = datetime.utcnow()
         for i in range(days):
-            target_date = (now - timedelta(days=i)).date()
-            
-            # 1. Daily Revenue (Ledger only for simplicity in history)
-            # In a full app, we'd include snapshots of bed costs
-            daily_rev = db.query(func.sum(models.BillingLedger.amount)).filter(
-                func.date(models.BillingLedger.timestamp) == target_date
-            ).scalar() or 0.0
-            
-            # 2. Daily Expenses
-            daily_exp = db.query(func.sum(models.HospitalExpense.amount)).filter(
-                func.date(models.HospitalExpense.timestamp) == target_date
-            ).scalar() or 0.0
-            
+            target_date = (first_day + timedelta(days=i)).strftime("%Y-%m-%d")
             history.append({
-                "date": target_date.strftime("%Y-%m-%d"),
-                "revenue": round(daily_rev, 2),
-                "expenses": round(daily_exp, 2)
+                "date": target_date,
+                "revenue": round(daily_rev.get(target_date, 0.0), 2),
+                "expenses": round(daily_exp.get(target_date, 0.0), 2)
             })
-            
-        return sorted(history, key=lambda x: x['date'])
+        return history
 
     @staticmethod
     def get_payer_mix(db: Session):
         """Calculates payer distribution from the database."""
-        mix = db.query(
-            models.PatientRecord.payer_type,
-            func.count(models.PatientRecord.id)
-        ).group_by(models.PatientRecord.payer_type).all()
+        # Counted in the hot table and the archive, so archiving doesn't shift the mix
+        mix = {}
+        for table in ArchiveService.sources(models.PatientRecord):
+            for name, count in db.query(table.c.payer_type, func.count(table.c.id)).group_by(table.c.payer_type):
+                mix[name] = mix.get(name, 0) + count
         
-        return [{"name": name or "Cash", "value": count} for name, count in mix]
+        return [{"name": name or "Cash", "value": count} for name, count in mix.items()]
@@ -0,0 +1,113 @@
+import base64
+import json
+import orjson
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from archive_service import ArchiveService
+import models
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 1000 # Rows held in memory at once while streaming
+
+# History feeds: newest first, keyset-paged on (timestamp column, primary key)
+HISTORY_FEEDS = {
+    "clinical": (models.PatientRecord, models.PatientRecord.timestamp),
+    "surgery": (models.SurgeryHistory, models.SurgeryHistory.end_time),
+    "opd": (models.PatientQueue, models.PatientQueue.check_in_time),
+}
+
+def to_json(row: dict) -> str:
+    # orjson writes naive datetimes in the same ISO format FastAPI's jsonable_encoder produces.
+    # Rows read from an archive table are keyed by quoted_name (a str subclass), which orjson
+    # only accepts with OPT_NON_STR_KEYS
+    return orjson.dumps(row, option=orjson.OPT_NON_STR_KEYS, default=str).decode()
+
+class HistoryService:
+    """
+    Bounded-memory reads over the history tables.
+    Rows are ordered newest first by (timestamp, id) and paged with a keyset cursor:
+    each page is one indexed range scan that starts where the previous page ended,
+    so page 10,000 costs the same as page 1 (OFFSET would rescan everything before it).
+    Feeds whose old rows are archived (clinical) read across the hot and archive tables.
+    """
+    @staticmethod
+    def encode_cursor(timestamp: datetime, row_id) -> str:
+        raw = json.dumps([timestamp.isoformat(), row_id])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        """Returns (timestamp, id). Raises ValueError on a malformed cursor."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(timestamp), row_id
+        except Exception:
+            raise ValueError("Invalid history cursor")
+
+    @staticmethod
+    def fetch_page(db: Session, feed: str, filters=(), cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+        """One page of a history feed as plain dicts, plus the cursor for the next page (None at the end)."""
+        model, ts_col = HISTORY_FEEDS[feed]
+        conditions = [ts_col != None, *filters]
+        if cursor:
+            after_ts, after_id = HistoryService.decode_cursor(cursor)
+            conditions.append(tuple_(ts_col, model.__table__.c.id) < tuple_(after_ts, after_id))
+
+        # Archived feeds read one page from the hot table, then one from the archive, and merge.
+        # Hot first: the archiver commits its copy before the hot delete, so a row moved
+        # between the two reads is seen at least once (and deduplicated by the merge)
+        pages = []
+        for table in ArchiveService.sources(model):
+            pages.append(db.execute(
+                select(*table.columns).where(*ArchiveService.adapt(conditions, table))
+                .order_by(table.c[ts_col.key].desc(), table.c.id.desc()).limit(limit + 1)
+            ).all())
+        key = lambda r: (getattr(r, ts_col.key), r.id)
+        rows = list(ArchiveService.merge(pages, key, reverse=True))[:limit + 1]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = HistoryService.encode_cursor(*key(rows[-1]))
+        return [dict(r._mapping) for r in rows], next_cursor
+
+    @staticmethod
+    def iter_pages(feed: str, filters=(), chunk_size: int = STREAM_CHUNK_SIZE):
+        """
+        Walks a whole feed page by page with its own session (a streaming response
+        outlives the request's dependencies). Memory stays at one chunk.
+        """
+        db = SessionLocal()
+        try:
+            cursor = None
+            while True:
+                rows, cursor = HistoryService.fetch_page(db, feed, filters, cursor, chunk_size)
+                yield rows
+                if cursor is None:
+                    break
+        finally:
+            db.close()
+
+    @staticmethod
+    def stream(feed: str, filters=(), fmt: str = "json"):
+        """
+        Yields the feed as NDJSON, or as one JSON array (the same body the endpoints
+        always returned, built incrementally instead of in memory). One write per page.
+        """
+        if fmt == "ndjson":
+            for rows in HistoryService.iter_pages(feed, filters):
+                if rows:
+                    yield "\n".join(to_json(r) for r in rows) + "\n"
+            return
+
+        yield "["
+        separator = ""
+        for rows in HistoryService.iter_pages(feed, filters):
+            if rows:
+                yield separator + ",".join(to_json(r) for r in rows)
+                separator = ","
+        yield "]"
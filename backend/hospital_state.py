@@ -0,0 +1,129 @@
+import threading
+import time
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import models
+from table_versions import table_versions
+
+# Bound on staleness for writes the version counters cannot see (another worker process)
+SNAPSHOT_MAX_AGE_SECONDS = 30
+
+def bed_counts():
+    return {"total": 0, "occupied": 0, "in_use": 0, "available": 0, "by_status": {}}
+
+class HospitalSnapshot:
+    """
+    Point-in-time occupancy, OPD queue, ambulance and staff figures.
+    beds: {"total", "occupied", "in_use", "available", "ventilators_in_use", "by_status",
+           "by_type": {type: counts}, "by_unit": {unit: counts}}; occupied means is_occupied,
+           in_use also counts beds in OCCUPIED status (the dashboard's occupancy).
+    queue / ambulances: {status: count}; staff_on_shift: {role: clocked-in count}.
+    """
+    def __init__(self, beds: dict, queue: dict, ambulances: dict, staff_on_shift: dict):
+        self.beds = beds
+        self.queue = queue
+        self.ambulances = ambulances
+        self.staff_on_shift = staff_on_shift
+
+    @property
+    def total_beds(self) -> int:
+        return self.beds["total"]
+
+    @property
+    def occupied_beds(self) -> int:
+        return self.beds["occupied"]
+
+    @property
+    def available_beds(self) -> int:
+        return self.beds["available"]
+
+    @property
+    def load_index(self) -> float:
+        return self.occupied_beds / self.total_beds if self.total_beds > 0 else 0.0
+
+    @property
+    def opd_waiting(self) -> int:
+        return self.queue.get("WAITING", 0)
+
+    def occupied(self, bed_type: str) -> int:
+        return self.beds["by_type"].get(bed_type, bed_counts())["occupied"]
+
+class HospitalState:
+    """
+    One in-process snapshot behind every capacity read (dashboard stats, external capacity,
+    public status, diversion, inflow forecast, financial KPIs, ambulance dispatch). Each
+    section is a single grouped query, memoized on the commit version of its table: a commit
+    recounts the sections whose table it touched, in full, and between commits a capacity
+    read runs no queries.
+    """
+    SECTIONS = {
+        # section: (table it is computed from, loader)
+        "beds": ("beds", "load_beds"),
+        "queue": ("patient_queue", "load_queue"),
+        "ambulances": ("ambulances", "load_ambulances"),
+        "staff_on_shift": ("staff", "load_staff"),
+    }
+
+    def __init__(self, max_age_seconds: float = SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age = max_age_seconds
+        self._sections = {} # section -> (table version, value, monotonic time computed)
+        self._lock = threading.Lock()
+
+    def snapshot(self, db: Session) -> HospitalSnapshot:
+        return HospitalSnapshot(**{name: self._section(db, name) for name in HospitalState.SECTIONS})
+
+    def _section(self, db: Session, name: str):
+        table, loader = HospitalState.SECTIONS[name]
+        # Version read before loading: a commit landing mid-query leaves a stale key behind
+        key = table_versions.key(table)
+        cached = self._sections.get(name)
+        if cached and cached[0] == key and time.monotonic() - cached[2] < self.max_age:
+            return cached[1]
+        with self._lock: # Concurrent readers after a change load once
+            cached = self._sections.get(name)
+            if cached and cached[0] == key and time.monotonic() - cached[2] < self.max_age:
+                return cached[1]
+            value = getattr(HospitalState, loader)(db)
+            self._sections[name] = (key, value, time.monotonic())
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._sections = {}
+
+    @staticmethod
+    def load_beds(db: Session) -> dict:
+        bed = models.BedModel
+        rows = db.execute(
+            select(bed.type, bed.unit, bed.status, bed.is_occupied, bed.ventilator_in_use, func.count())
+            .group_by(bed.type, bed.unit, bed.status, bed.is_occupied, bed.ventilator_in_use)
+        ).all()
+        beds = {**bed_counts(), "ventilators_in_use": 0, "by_type": {}, "by_unit": {}}
+        for bed_type, unit, status, is_occupied, ventilator, n in rows:
+            for counts in (beds, beds["by_type"].setdefault(bed_type, bed_counts()), beds["by_unit"].setdefault(unit, bed_counts())):
+                counts["total"] += n
+                counts["occupied"] += n if is_occupied else 0
+                counts["in_use"] += n if is_occupied or status == "OCCUPIED" else 0
+                counts["by_status"][status] = counts["by_status"].get(status, 0) + n
+            if ventilator:
+                beds["ventilators_in_use"] += n
+        for counts in (beds, *beds["by_type"].values(), *beds["by_unit"].values()):
+            counts["available"] = counts["total"] - counts["occupied"]
+        return beds
+
+    @staticmethod
+    def load_queue(db: Session) -> dict:
+        queue = models.PatientQueue
+        return dict(db.execute(select(queue.status, func.count()).group_by(queue.status)).all())
+
+    @staticmethod
+    def load_ambulances(db: Session) -> dict:
+        amb = models.Ambulance
+        return dict(db.execute(select(amb.status, func.count()).group_by(amb.status)).all())
+
+    @staticmethod
+    def load_staff(db: Session) -> dict:
+        staff = models.Staff
+        return dict(db.execute(select(staff.role, func.count()).where(staff.is_clocked_in == True).group_by(staff.role)).all())
+
+hospital_state = HospitalState()
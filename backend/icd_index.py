@@ -0,0 +1,174 @@
+import re
+import os
+import json
+import threading
+from bisect import bisect_left, bisect_right
+import importlib.metadata
+import simple_icd_10 as icd
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MAX_TOKEN_PREFIX = 12 # Longer query tokens are cut to this before the posting lookup
+# Precomputed index, rebuilt whenever the simple_icd_10 release changes
+INDEX_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "icd_index.json")
+
+def normalize_code(code: str) -> str:
+    """'i219' / 'I21.9' / ' I21.9 ' -> 'I219' (the index key; dots are cosmetic in ICD-10)."""
+    return code.strip().upper().replace(".", "")
+
+class ICDIndex:
+    """
+    In-memory typeahead index over the full simple_icd_10 catalogue
+    (categories and subcategories, ~12k codes).
+    - Codes: dot-less code keys, one sorted list per key length, searched with bisect.
+    - Descriptions: every prefix of every word maps to a posting list of entry ids.
+    Entry ids are assigned in rank order (broader, shorter codes first), so every posting
+    list is already ranked and a query can stop as soon as it has `limit` hits.
+    """
+    def __init__(self, codes: list, descriptions: list, postings: dict):
+        self.codes = codes
+        self.descriptions = descriptions
+        self.postings = postings
+        self.by_code = {normalize_code(code): i for i, code in enumerate(codes)}
+        # Sorted code keys per key length: a prefix walk visits broader codes first
+        self.keys_by_length = {}
+        for key in sorted(self.by_code):
+            self.keys_by_length.setdefault(len(key), []).append(key)
+
+    @staticmethod
+    def build():
+        """Builds the index from the simple_icd_10 catalogue (~0.4 s)."""
+        entries = []
+        for code in icd.get_all_codes(True):
+            if icd.is_category_or_subcategory(code):
+                entries.append((code, icd.get_description(code)))
+        entries.sort(key=lambda e: (len(e[0]), len(e[1]), e[0]))
+
+        descriptions = [desc for _, desc in entries]
+        postings = {}
+        for i, desc in enumerate(descriptions):
+            for token in set(TOKEN_RE.findall(desc.lower())):
+                for end in range(1, min(len(token), MAX_TOKEN_PREFIX) + 1):
+                    postings.setdefault(token[:end], []).append(i)
+        # Ids are appended in increasing order, so each list is sorted by rank
+        return ICDIndex([code for code, _ in entries], descriptions, postings)
+
+    @staticmethod
+    def load(path: str = INDEX_FILE):
+        """Loads the precomputed index (~0.1 s), building and saving it if missing or stale."""
+        version = importlib.metadata.version("simple_icd_10")
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == version:
+                return ICDIndex(data["codes"], data["descriptions"], data["postings"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        index = ICDIndex.build()
+        try:
+            with open(path, "w") as f:
+                json.dump({
+                    "version": version,
+                    "codes": index.codes,
+                    "descriptions": index.descriptions,
+                    "postings": index.postings
+                }, f)
+        except OSError as e:
+            print(f"ICD index not cached: {e}")
+        return index
+
+    def lookup(self, code: str):
+        """Exact code lookup: returns the entry dict or None."""
+        i = self.by_code.get(normalize_code(code))
+        return self._entry(i) if i is not None else None
+
+    def search(self, query: str, limit: int = 10):
+        """
+        Ranked typeahead: exact code, then code-prefix matches, then description matches
+        (all query words must prefix-match a word of the description).
+        """
+        query = query.strip()
+        if not query:
+            return []
+        results = []
+        seen = set()
+
+        def add(i):
+            if i not in seen:
+                seen.add(i)
+                results.append(i)
+
+        key = normalize_code(query)
+        if key.isalnum():
+            exact = self.by_code.get(key)
+            if exact is not None:
+                add(exact)
+            for i in self._code_prefix(key, limit):
+                if len(results) >= limit:
+                    break
+                add(i)
+
+        if len(results) < limit:
+            for i in self._text_matches(query, limit + len(results)):
+                if len(results) >= limit:
+                    break
+                add(i)
+
+        return [self._entry(i) for i in results]
+
+    def _code_prefix(self, key: str, limit: int):
+        # Broader codes first, then in code order (I20, I21, ... before I200). Within one
+        # length the keys with this prefix form a contiguous run of its sorted list, so each
+        # length costs a bisect plus the hits taken: a one-letter prefix never walks its ~1k codes
+        ids = []
+        for length in sorted(self.keys_by_length):
+            if len(ids) >= limit:
+                break
+            keys = self.keys_by_length[length]
+            start = bisect_left(keys, key)
+            end = min(bisect_right(keys, key + "~", lo=start), start + limit - len(ids))
+            ids.extend(self.by_code[k] for k in keys[start:end])
+        return ids
+
+    def _text_matches(self, query: str, limit: int):
+        tokens = [t[:MAX_TOKEN_PREFIX] for t in TOKEN_RE.findall(query.lower())]
+        if not tokens:
+            return []
+        lists = []
+        for token in tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                return []
+            lists.append(posting)
+        # Walk the shortest (already ranked) list; membership in the others is a bisect
+        lists.sort(key=len)
+        driver, others = lists[0], lists[1:]
+        matches = []
+        for i in driver:
+            if all(ICDIndex._contains(other, i) for other in others):
+                matches.append(i)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    @staticmethod
+    def _contains(posting: list, i: int) -> bool:
+        pos = bisect_left(posting, i)
+        return pos < len(posting) and posting[pos] == i
+
+    def _entry(self, i: int) -> dict:
+        code = self.codes[i]
+        return {"code": code, "desc": self.descriptions[i], "chapter": code[0]}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_icd_index() -> ICDIndex:
+    """Process-wide index, built once (warmed at startup so no request pays for it)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ICDIndex.load()
+    return _index
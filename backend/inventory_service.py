@@ -1,101 +1,225 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, case, delete, insert, select, update, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 import models
 from billing_utility import BillingListener # [NEW]
+from event_bus import EventBus
+from stock_alerts import StockAlertService
+
+BURN_WINDOW_HOURS = 6 # Forecast burn_rate: mean expected usage over the next window
+
+def hour_bucket(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+class ConsumptionRules:
+    """
+    The consumption_rules table held in memory, with item names resolved to ids.
+    Loaded on first use; call invalidate_consumption_rules() after editing rules or items.
+    """
+    def __init__(self, rules, item_ids):
+        self.rules = rules          # [(trigger, patterns, item_id, quantity)]
+        self.item_ids = item_ids    # InventoryItem.name -> id
+
+    @staticmethod
+    def load(db: Session):
+        item_ids = dict(db.query(models.InventoryItem.name, models.InventoryItem.id).all())
+        rules = []
+        for rule in db.query(models.ConsumptionRule).order_by(models.ConsumptionRule.id).all():
+            if rule.item_name not in item_ids:
+                print(f"Warning: consumption rule {rule.id} names unknown item '{rule.item_name}'.")
+                continue
+            patterns = [p.strip().lower() for p in rule.pattern.split("|")] if rule.trigger == "condition" else [rule.pattern]
+            rules.append((rule.trigger, patterns, item_ids[rule.item_name], rule.quantity))
+        return ConsumptionRules(rules, item_ids)
+
+    def items_for(self, context: str, condition: str) -> dict:
+        """{item_id: quantity} consumed by a clinical event."""
+        condition = (condition or "").lower()
+        quantities = {}
+        for trigger, patterns, item_id, quantity in self.rules:
+            if trigger == "context":
+                matched = context == patterns[0]
+            elif trigger == "context_prefix":
+                matched = context.startswith(patterns[0])
+            else: # condition keywords
+                matched = any(p in condition for p in patterns)
+            if matched:
+                quantities[item_id] = quantities.get(item_id, 0) + quantity
+        return quantities
+
+_consumption_rules = None
+
+def get_consumption_rules(db: Session) -> ConsumptionRules:
+    global _consumption_rules
+    if _consumption_rules is None:
+        _consumption_rules = ConsumptionRules.load(db)
+    return _consumption_rules
+
+def invalidate_consumption_rules():
+    global _consumption_rules
+    _consumption_rules = None
 
 class InventoryService:
     @staticmethod
-    def deduct_stock(db: Session, item_name: str, quantity: int, patient_name: str = "Unknown", bed_id: str = None, condition: str = None):
+    def deduct_stock(db: Session, item_name: str, quantity: int, patient_name: str = "Unknown", bed_id: str = None, condition: str = None, patient_id: str = None):
         """
         Deducts stock for a specific item.
         Triggers a low stock alert if quantity falls below reorder level.
         Returns the updated item and whether an alert is needed.
+        Pass patient_id when the patient record is not committed yet (single unit of work).
         """
-        item = db.query(models.InventoryItem).filter(models.InventoryItem.name == item_name).first()
-        
-        if not item:
+        item_id = get_consumption_rules(db).item_ids.get(item_name)
+        if item_id is None:
+            invalidate_consumption_rules() # Possibly added since the cache was loaded
+            item_id = get_consumption_rules(db).item_ids.get(item_name)
+        if item_id is None:
             print(f"Warning: Inventory item '{item_name}' not found.")
             return None, False
 
-        # Deduct quantity (prevent negative stock)
-        deducted_qty = min(item.quantity, quantity)
-        item.quantity -= deducted_qty
-        
-        # Log the usage
-        log = models.InventoryLog(
-            item_id=item.id,
-            patient_name=patient_name,
-            bed_id=bed_id,
-            quantity_used=deducted_qty,
-            reason=f"Usage for {condition}" if condition else "Standard Usage",
-            timestamp=datetime.utcnow()
-        )
-        db.add(log)
-        
+        items = InventoryService.deduct_items(db, {item_id: quantity}, patient_name, bed_id, condition, patient_id)
+        if not items:
+            return None, False
+        return items[0], items[0].quantity < items[0].reorder_level
+
+    @staticmethod
+    def deduct_items(db: Session, quantities: dict, patient_name: str = "Unknown", bed_id: str = None, condition: str = None, patient_id: str = None):
+        """
+        Deducts every item of one clinical event ({item_id: quantity}) as a batch: one atomic
+        decrement statement, one executemany each for the usage logs and burn-rate buckets,
+        and a single billing write. Stock never goes negative: an item that runs out is logged
+        and billed for what it gave, and the missing units go out as a STOCK_SHORTFALL event.
+        Does not commit. Returns the items at their new level (id, name, quantity, reorder_level, unit_price).
+        """
+        rows, used = InventoryService.decrement(db, quantities)
+        if not rows:
+            return []
+        shortfall = [r for r in rows if used[r.id] < quantities[r.id]]
+        if shortfall:
+            EventBus.publish(db, {
+                "type": "STOCK_SHORTFALL",
+                "patient_name": patient_name,
+                "bed_id": bed_id,
+                "items": [{"item_name": r.name, "requested": quantities[r.id], "supplied": used[r.id]} for r in shortfall],
+                "message": "Out of stock for " + ", ".join(f"{r.name} (short {quantities[r.id] - used[r.id]})" for r in shortfall)
+            })
+
+        taken = [r for r in rows if used[r.id] > 0] # Nothing to log or bill for an empty item
+        if not taken:
+            return rows
+        now = datetime.utcnow()
+        reason = f"Usage for {condition}" if condition else "Standard Usage"
+        db.execute(insert(models.InventoryLog), [
+            {"item_id": r.id, "patient_name": patient_name, "bed_id": bed_id, "quantity_used": used[r.id], "reason": reason, "timestamp": now}
+            for r in taken
+        ])
+        InventoryService.record_burn(db, used, now)
+
         # [NEW] Automatic Billing
-        if bed_id:
-            patient = db.query(models.PatientRecord).filter(models.PatientRecord.bed_id == bed_id).first()
-            if patient:
-                BillingListener.log_event(
-                    db, 
-                    patient.id, 
-                    "PHARMACY", 
-                    f"Inventory: {item_name} (x{deducted_qty})", 
-                    item.unit_price * deducted_qty
-                )
-        
-        is_low_stock = item.quantity < item.reorder_level
-        return item, is_low_stock
+        if bed_id and not patient_id:
+            patient = db.query(models.PatientRecord.id).filter(models.PatientRecord.bed_id == bed_id).first()
+            patient_id = patient.id if patient else None
+        if patient_id:
+            BillingListener.log_events(db, patient_id, "PHARMACY", [
+                (f"Inventory: {r.name} (x{used[r.id]})", r.unit_price * used[r.id]) for r in taken
+            ])
+
+        return rows
 
     @staticmethod
-    async def process_usage(db: Session, manager, context: str, patient_data: dict):
+    def decrement(db: Session, quantities: dict):
+        """
+        Atomic stock decrements for {item_id: quantity}, done in SQL so concurrent events never
+        lose an update: one `quantity = quantity - n WHERE quantity >= n ... RETURNING` for the
+        whole batch. An item without enough stock gives what it has left (never below zero) via
+        a compare-and-set on the level just read. Returns (rows at their new level, {item_id: taken}).
+        """
+        item = models.InventoryItem.__table__
+        returned = (item.c.id, item.c.name, item.c.quantity, item.c.reorder_level, item.c.unit_price)
+        need = case(quantities, value=item.c.id)
+        rows = db.execute(
+            update(item).where(item.c.id.in_(quantities), item.c.quantity >= need)
+            .values(quantity=item.c.quantity - need).returning(*returned)
+        ).all()
+        used = {r.id: quantities[r.id] for r in rows}
+
+        for item_id in quantities.keys() - used.keys():
+            while True:
+                seen = db.execute(select(item.c.quantity).where(item.c.id == item_id)).scalar()
+                if seen is None:
+                    break # Unknown item
+                take = min(seen, quantities[item_id])
+                row = db.execute(
+                    update(item).where(item.c.id == item_id, item.c.quantity == seen)
+                    .values(quantity=item.c.quantity - take).returning(*returned)
+                ).first()
+                if row:
+                    rows.append(row)
+                    used[item_id] = take
+                    break
+        return rows, used
+
+    @staticmethod
+    def record_burn(db: Session, used: dict, at: datetime):
+        """Adds {item_id: quantity} to the items' hourly burn buckets: one upsert, in the caller's transaction."""
+        params = [{"hour_start": hour_bucket(at), "item_id": item_id, "quantity_used": n} for item_id, n in used.items() if n > 0]
+        if not params:
+            return
+        burn = models.InventoryBurnRate
+        stmt = sqlite_insert(burn)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[burn.hour_start, burn.item_id],
+            set_={"quantity_used": burn.quantity_used + stmt.excluded.quantity_used}
+        ), params)
+
+    @staticmethod
+    def rebuild_burn_rates(db: Session):
+        """Recomputes the hourly rollup from the hot inventory_logs (migration / repair)."""
+        logs = models.InventoryLog
+        bucket = func.strftime("%Y-%m-%d %H:00:00.000000", logs.timestamp)
+        db.execute(delete(models.InventoryBurnRate))
+        db.execute(insert(models.InventoryBurnRate).from_select(
+            ["hour_start", "item_id", "quantity_used"],
+            select(bucket, logs.item_id, func.sum(logs.quantity_used))
+            .where(logs.timestamp != None, logs.item_id != None)
+            .group_by(bucket, logs.item_id)
+        ))
+        db.commit()
+
+    @staticmethod
+    def backfill_burn_rates(db: Session):
+        """Builds the rollup once for databases that have usage logs but predate it."""
+        if db.query(models.InventoryBurnRate.item_id).first() is None and db.query(models.InventoryLog.id).first() is not None:
+            InventoryService.rebuild_burn_rates(db)
+
+    @staticmethod
+    def record_usage(db: Session, context: str, patient_data: dict):
         """
         Orchestrates deductions based on clinical context (e.g., 'ICU', 'Surgery').
-        Broadcasts alerts via WebSocket if thresholds are breached.
+        Does not commit; inventory refresh and low stock alerts are written to the
+        outbox and go out when the caller's unit of work commits.
         """
-        items_to_deduct = []
         patient_name = patient_data.get("patient_name", "Unknown")
         bed_id = patient_data.get("bed_id")
+        patient_id = patient_data.get("patient_id")
         condition = patient_data.get("condition", "")
 
-        # 1. Determine Items based on Rules
-        if context == "ICU":
-            items_to_deduct.extend([("Ventilator Circuit", 1), ("Sedation Kit", 1)])
-        elif context == "ER":
-             items_to_deduct.extend([("Trauma IV Kit", 1), ("Saline Pack", 1)])
-        elif context.startswith("Surgery"):
-             items_to_deduct.extend([("OR Prep Kit", 1), ("Sterile Gowns", 2)])
-        elif context == "OPD_Consultation":
-             items_to_deduct.extend([("Gloves", 2), ("Tongue Depressor", 1)])
-
-        # 2. Global Overrides (Infection Control)
-        if "infec" in condition.lower() or "isolation" in condition.lower():
-            items_to_deduct.append(("PPE Kit", 1))
-
-        # [NEW] Cleaning Context
-        if context == "Cleaning":
-             items_to_deduct.extend([("Sanitization Kit", 1), ("Bed Linens", 1)])
-
-        # 3. Process Executions
-        alerts = []
-        for item_name, qty in items_to_deduct:
-            updated_item, is_low = InventoryService.deduct_stock(db, item_name, qty, patient_name, bed_id, condition)
-            if updated_item and is_low:
-                alerts.append(updated_item)
+        # 1. Determine Items based on Rules (consumption_rules, cached)
+        quantities = get_consumption_rules(db).items_for(context, condition)
+        if not quantities:
+            return
 
-        db.commit()
+        # 2. One batched deduction for the whole event
+        items = InventoryService.deduct_items(db, quantities, patient_name, bed_id, condition, patient_id)
 
-        # 4. Broadcast Updates
-        if items_to_deduct:
-             # Just tell frontend to refresh inventory
-             await manager.broadcast({"type": "REFRESH_INVENTORY"})
-
-        # 5. Broadcast Specific Alerts
-        for alert_item in alerts:
-            await manager.broadcast({
-                "type": "LOW_STOCK_ALERT",
-                "item_name": alert_item.name,
-                "remaining": alert_item.quantity,
-                "message": f"CRITICAL: {alert_item.name} is low ({alert_item.quantity} remaining)!"
-            })
+        # 3. Broadcast Updates: just tell frontend to refresh inventory
+        EventBus.publish(db, {"type": "REFRESH_INVENTORY"})
+
+        # 4. Broadcast Specific Alerts: only when an item's alert state changes
+        StockAlertService.evaluate(db, items)
+
+    @staticmethod
+    def process_usage(db: Session, context: str, patient_data: dict):
+        """Standalone variant of record_usage that commits the deductions and their events."""
+        InventoryService.record_usage(db, context, patient_data)
+        db.commit()
@@ -2,7 +2,9 @@ import simple_icd_10 as icd
 import uvicorn
 import math
 import uuid
+import asyncio
 import os
+import importlib.util
 from dotenv import load_dotenv
 
 load_dotenv() # Load environment variables from .env file
@@ -11,10 +13,12 @@ from datetime import timedelta
 from datetime import datetime,timezone
 from typing import List, Optional
 from datetime import datetime, date
-from sqlalchemy import func
+from sqlalchemy import func, case
 
-from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect, Depends, BackgroundTasks, Request, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -22,19 +26,39 @@ from passlib.context import CryptContext
 from jose import jwt
 
 
-from database import engine, get_db
-from database import engine, get_db
+from database import engine, get_db, SessionLocal
 import models
 from inventory_service import InventoryService # [NEW] Import Service
+from demand_forecast import demand_forecaster
+from stock_alerts import StockAlertService, StockAlertEscalator
 from sqlalchemy import desc # For ordering logs
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from billing_utility import BillingListener, calculate_accrued_bed_cost # [NEW]
 from finance_service import FinanceService
+from dashboard_service import DashboardService
+from hospital_state import hospital_state
+from occupancy_series import OccupancySeries, OccupancyRecorder, as_utc
+from response_cache import ResponseCacheMiddleware
+from event_bus import EventBus, OutboxDispatcher
+from bed_allocator import BedAllocator
+from queue_service import QueueService, calculate_priority_index, apply_static_scores, queue_version, AUTO_DISPATCH
+from icd_index import get_icd_index
+from migrate_db import upgrade_schema
+from history_service import HistoryService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from time_filters import day_filter, range_filter
+from patient_search import PatientSearch
+from export_service import ExportService, EXPORT_TABLES, EXPORT_FORMATS
+from archive_service import ArchiveService, Archiver
+import schemas
+from schemas import FastJSONResponse, columns, as_dicts
 
 load_dotenv()
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+PatientSearch.ensure_schema(engine) # FTS5 patient search index + sync triggers
+ArchiveService.ensure_schema(engine) # Cold tables in hospital_archive.db
 
 # [NEW] Seed Inventory Data
 def seed_inventory():
@@ -60,6 +84,27 @@ def seed_inventory():
             item.unit_price = price
     db.commit()
 
+def seed_consumption_rules():
+    db = next(get_db())
+    if db.query(models.ConsumptionRule).first():
+        return # Rules are data: keep whatever has been edited since
+    rules = [
+        ("context", "ICU", "Ventilator Circuit", 1),
+        ("context", "ICU", "Sedation Kit", 1),
+        ("context", "ER", "Trauma IV Kit", 1),
+        ("context", "ER", "Saline Pack", 1),
+        ("context_prefix", "Surgery", "OR Prep Kit", 1),
+        ("context_prefix", "Surgery", "Sterile Gowns", 2),
+        ("context", "OPD_Consultation", "Gloves", 2),
+        ("context", "OPD_Consultation", "Tongue Depressor", 1),
+        ("context", "Cleaning", "Sanitization Kit", 1),
+        ("context", "Cleaning", "Bed Linens", 1),
+        ("condition", "infec|isolation", "PPE Kit", 1), # Infection control, any context
+    ]
+    for trigger, pattern, item_name, qty in rules:
+        db.add(models.ConsumptionRule(trigger=trigger, pattern=pattern, item_name=item_name, quantity=qty))
+    db.commit()
+
 def seed_doctor_rooms():
     db = next(get_db())
     rooms = [
@@ -137,6 +182,7 @@ def seed_finance_data():
     db.commit()
 
 seed_inventory()
+seed_consumption_rules()
 seed_doctor_rooms()
 seed_partner_hospitals()
 seed_bed_master()
@@ -144,6 +190,9 @@ seed_finance_data()
 
 app = FastAPI(title="PHRELIS Hospital OS")
 
+# Polled read endpoints served from memory until a commit touches their tables (response_cache.CACHE_RULES).
+# Added first so CORS stays the outer layer and sees every response, cached or not.
+app.add_middleware(ResponseCacheMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -151,6 +200,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Content-Disposition"], # Batched exports
 )
 # Security Config
 PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -317,8 +367,19 @@ class ConnectionManager:
         for connection in self.active_connections:
             try: await connection.send_json(message)
             except: pass
+    async def broadcast_batch(self, messages: List[dict]):
+        # Identical messages in one batch (e.g. repeated REFRESH_INVENTORY) are sent once,
+        # at the position of their last occurrence so state updates keep their final order
+        last_index = {}
+        for i, message in enumerate(messages):
+            last_index[repr(message)] = i
+        for i, message in enumerate(messages):
+            if last_index[repr(message)] == i:
+                await self.broadcast(message)
 
 manager = ConnectionManager()
+outbox_dispatcher = OutboxDispatcher(SessionLocal, manager)
+EventBus.attach(outbox_dispatcher)
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
@@ -426,9 +487,9 @@ def generate_smart_tasks(db: Session, bed_id: str, condition: str,patient_id: st
             models.Task(bed_id=bed_id,patient_id=patient_id, description="Routine Ward Rounds", due_time=now + timedelta(hours=4), priority="Low")
         ]
     
+    # Added to the caller's unit of work; the caller commits
     if tasks:
         db.add_all(tasks)
-        db.commit()
 
 @app.get("/api/tasks/sync-all")
 async def sync_existing_patients(db: Session = Depends(get_db)):
@@ -444,7 +505,8 @@ async def sync_existing_patients(db: Session = Depends(get_db)):
             generate_smart_tasks(db, bed.id, bed.condition or "Stable")
             
     # Tell the frontend to update via WebSocket
-    await manager.broadcast({"type": "REFRESH_RESOURCES"})
+    EventBus.publish(db, {"type": "REFRESH_RESOURCES"})
+    db.commit()
     return {"message": f"Tasks generated for {len(occupied_beds)} patients"}
 
 
@@ -473,8 +535,8 @@ async def login(request: LoginRequest, db: Session = Depends(get_db)):
 
 @app.post("/api/erp/admit")
 async def admit_patient(request: AdmissionRequest, db: Session = Depends(get_db)):
-    # 1. Find the bed with a lock to prevent double-booking
-    bed = db.query(models.BedModel).filter(models.BedModel.id == request.bed_id).with_for_update().first()
+    # 1. Find the bed (the claim below prevents double-booking)
+    bed = db.query(models.BedModel).filter(models.BedModel.id == request.bed_id).first()
     
     if not bed:
         raise HTTPException(status_code=404, detail="Bed not found")
@@ -500,8 +562,9 @@ async def admit_patient(request: AdmissionRequest, db: Session = Depends(get_db)
              detail="Infection Control: Infectious patients must be admitted to an Isolation Unit."
          )
 
-    # Occupancy check
-    if bed.is_occupied:
+    # Occupancy check: atomic claim, so concurrent admissions cannot both win the bed
+    if bed.is_occupied or not BedAllocator.claim_bed(db, bed.id):
+         db.rollback()
          raise HTTPException(status_code=400, detail=f"Bed {bed.id} is already occupied.")
 
     # 3. Update Bed Data
@@ -530,10 +593,9 @@ async def admit_patient(request: AdmissionRequest, db: Session = Depends(get_db)
         assigned_staff=request.staff_id
     )
     
+    # Everything below is one unit of work: a single commit, broadcasts after it
     try:
         db.add(new_record)
-        db.commit()
-        db.refresh(bed)
         
         # 5. Trigger Smart Worklist & Real-time Sync
         generate_smart_tasks(db, bed.id, request.condition, patient_id=new_patient_id)
@@ -541,9 +603,9 @@ async def admit_patient(request: AdmissionRequest, db: Session = Depends(get_db)
         # 6. INVENTORY SYNC
         # Determine context based on bed type (ICU/ER/Wards)
         inv_context = bed.type if bed.type in ["ICU", "ER"] else "Wards"
-        await InventoryService.process_usage(
-            db, manager, inv_context, 
-            {"patient_name": request.patient_name, "bed_id": bed.id, "condition": request.condition}
+        InventoryService.record_usage(
+            db, inv_context, 
+            {"patient_name": request.patient_name, "bed_id": bed.id, "patient_id": new_patient_id, "condition": request.condition}
         )
         
         # 7. ADD ADMISSION FEE (Fixed Charge)
@@ -557,18 +619,20 @@ async def admit_patient(request: AdmissionRequest, db: Session = Depends(get_db)
                 master.admission_fee
             )
         
-        await manager.broadcast({
+        EventBus.publish(db, {
             "type": "BED_UPDATE", 
             "bed_id": bed.id, 
             "new_status": "OCCUPIED",
             "patient_gender": request.gender
         })
         
-        return {"message": "Admission Successful", "bed_id": bed.id, "patient_id": new_patient_id}
+        db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database Sync Failed: {str(e)}")
 
+    return {"message": "Admission Successful", "bed_id": bed.id, "patient_id": new_patient_id}
+
 
 @app.post("/api/tasks/complete/{task_id}")
 async def complete_task(task_id: int, db: Session = Depends(get_db)):
@@ -580,22 +644,42 @@ async def complete_task(task_id: int, db: Session = Depends(get_db)):
     task.status = "Completed"
     task.completed_at = datetime.utcnow()
     
-    db.commit()
-    db.refresh(task) # Ensure the object is updated with DB state
-    
-    # CRITICAL: If you have a WebSocket manager, broadcast the refresh
+    # CRITICAL: broadcast the refresh (delivered by the outbox after commit)
     # This tells the frontend "Something changed, re-fetch your data!"
-    try:
-        await manager.broadcast({"type": "REFRESH_RESOURCES"})
-    except:
-        pass # Fallback if manager isn't initialized
+    EventBus.publish(db, {"type": "REFRESH_RESOURCES"})
+    
+    db.commit()
         
     return {"status": "success", "task_id": task_id}
 
 
-@app.get("/api/erp/beds")
-def list_beds(db: Session = Depends(get_db)):
-    return db.query(models.BedModel).all()
+@app.get("/api/erp/beds", response_model=List[schemas.BedOut])
+def list_beds(
+    fields: Optional[str] = Query(None, description="Comma-separated BedOut fields, e.g. id,status,color_code (id is always included)"),
+    unit: Optional[str] = Query(None, description="Comma-separated units"),
+    type: Optional[str] = Query(None, description="Comma-separated bed types (ICU, ER, Wards, ...)"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses (AVAILABLE, OCCUPIED, DIRTY, CLEANING)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Bed board. Projection and filters run in SQL: a ward tablet asking for
+    ?unit=ICU&fields=id,status,color_code reads three columns of its own unit only
+    (indexed on unit/type + status).
+    """
+    try:
+        wanted = schemas.sparse_fields(schemas.BedOut, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    selected = columns(models.BedModel, schemas.BedOut, wanted)
+    if wanted is None or "color_code" in wanted:
+        selected.append(case(models.BED_STATUS_COLORS, value=models.BedModel.status, else_=models.BED_UNKNOWN_COLOR).label("color_code"))
+
+    query = db.query(*selected)
+    for column, values in ((models.BedModel.unit, unit), (models.BedModel.type, type), (models.BedModel.status, status)):
+        values = schemas.csv_values(values)
+        if values:
+            query = query.filter(column.in_(values))
+    return FastJSONResponse(as_dicts(query))
 
 @app.post("/api/erp/discharge/{bed_id}")
 async def discharge(bed_id: str, db: Session = Depends(get_db)):
@@ -622,14 +706,14 @@ async def discharge(bed_id: str, db: Session = Depends(get_db)):
         bed.patient_age = None
         bed.condition = None
         bed.ventilator_in_use = False
-        db.commit()
         
-        await manager.broadcast({
+        EventBus.publish(db, {
             "type": "BED_UPDATE", 
             "bed_id": bed.id, 
             "new_status": "DIRTY",
             "color_code": bed.get_color_code()
         })
+        db.commit()
         return {"status": "success"}
     raise HTTPException(status_code=404, detail="Bed not found")
 
@@ -641,20 +725,20 @@ async def start_cleaning(bed_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Bed not found")
         
     bed.status = "CLEANING"
-    db.commit()
     
     # [NEW] Inventory Usage for Cleaning
-    await InventoryService.process_usage(
-        db, manager, "Cleaning", 
+    InventoryService.record_usage(
+        db, "Cleaning", 
         {"patient_name": "Bed Turnover", "bed_id": bed.id, "condition": "Standard Cleaning"}
     )
 
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "BED_UPDATE", 
         "bed_id": bed.id, 
         "new_status": "CLEANING",
         "color_code": bed.get_color_code()
     })
+    db.commit()
     return {"status": "success"}
 
 @app.post("/api/erp/beds/{bed_id}/cleaning-complete")
@@ -666,14 +750,14 @@ async def cleaning_complete(bed_id: str, db: Session = Depends(get_db)):
     bed.status = "AVAILABLE"
     # Ensure is_occupied is false just in case
     bed.is_occupied = False 
-    db.commit()
     
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "BED_UPDATE", 
         "bed_id": bed.id, 
         "new_status": "AVAILABLE",
         "color_code": bed.get_color_code()
     })
+    db.commit()
     return {"status": "success"}
 
 
@@ -703,13 +787,10 @@ async def start_surgery(request: SurgeryStartRequest, db: Session = Depends(get_
     bed.current_state = "OCCUPIED"
     bed.status = "OCCUPIED"
     bed.is_occupied = True
-    
-    db.commit()
-    db.refresh(bed)
 
     # REMOVED the duplicate iso_time assignment that was causing the crash
 
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "SURGERY_UPDATE",
         "bed_id": bed.id,
         "state": "OCCUPIED",
@@ -717,12 +798,14 @@ async def start_surgery(request: SurgeryStartRequest, db: Session = Depends(get_
         "expected_end_time": iso_time
     })
 
-    # [NEW] Inventory Hook
-    await InventoryService.process_usage(
-        db, manager, "Surgery", 
+    # [NEW] Inventory Hook (same transaction as the room update)
+    InventoryService.record_usage(
+        db, "Surgery", 
         {"patient_name": bed.patient_name, "bed_id": bed.id, "condition": "Surgery Start"}
     )
 
+    db.commit()
+
     return {"status": "started", "end_time": iso_time}
 
 from datetime import datetime, timezone, timedelta
@@ -744,18 +827,17 @@ async def extend_surgery(bed_id: str, request: SurgeryExtendRequest, db: Session
     
     bed.current_state = "OCCUPIED"
     bed.status = "OCCUPIED"
-    db.commit()
-    db.refresh(bed)
 
     # FIX: Use replace to ensure a clean 'Z' for the frontend
     iso_time = bed.expected_end_time.isoformat().replace("+00:00", "Z")
 
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "SURGERY_EXTENDED",
         "bed_id": bed.id,
         "state": "OCCUPIED",
         "expected_end_time": iso_time
     })
+    db.commit()
     return {"status": "extended", "new_end_time": iso_time}
 
 
@@ -800,10 +882,8 @@ async def complete_surgery(bed_id: str, db: Session = Depends(get_db)):
     bed.admission_time = None 
     bed.expected_end_time = None 
     # Optional: Clear these if you want the "Dirty" card to be anonymous
-   
-    db.commit()
     
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "SURGERY_UPDATE", 
         "bed_id": bed.id, 
         "state": "DIRTY",
@@ -811,6 +891,7 @@ async def complete_surgery(bed_id: str, db: Session = Depends(get_db)):
         "surgeon_name": bed.surgeon_name,
         "expected_end_time": None
     })
+    db.commit()
     return {"status": "completed"}
 
 @app.post("/api/surgery/release/{bed_id}")
@@ -829,14 +910,13 @@ async def release_surgery_room(bed_id: str, db: Session = Depends(get_db)):
     bed.admission_time = None 
     bed.expected_end_time = None 
     
-    db.commit()
-    
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "ROOM_RELEASED",
         "bed_id": bed.id,
         "state": "AVAILABLE",
         "expected_end_time": None 
     })
+    db.commit()
     return {"status": "released"}
 
 @app.post("/api/triage/assess")
@@ -856,20 +936,13 @@ async def assess_patient(request: TriageRequest, db: Session = Depends(get_db)):
     spo2 = request.vitals.get("spo2", 100)
     ventilator_needed = spo2 < 88 and level <= 2
     
-    # 4. Find Available Bed with Database Locking
-    query = db.query(models.BedModel).filter(
-        models.BedModel.type == bed_type, 
-        models.BedModel.is_occupied == False,
-        models.BedModel.status == "AVAILABLE"
-    )
-
+    # 4. Claim an Available Bed
     # Apply Gender Constraint ONLY if the target is a Ward
     # ICU and ER remain gender-neutral for emergency speed
-    if bed_type == "Wards":
-        query = query.filter(models.BedModel.gender == target_bed_gender)
-
-    # Use with_for_update to prevent race conditions during high-concurrency
-    bed = query.with_for_update(skip_locked=True).first()
+    # BedAllocator claims atomically to prevent race conditions during high-concurrency
+    bed = BedAllocator.claim_first_available(
+        db, bed_type, gender=target_bed_gender if bed_type == "Wards" else None
+    )
 
     # 5. Create Patient Record
     new_patient_id = str(uuid.uuid4())
@@ -900,10 +973,8 @@ async def assess_patient(request: TriageRequest, db: Session = Depends(get_db)):
         # Trigger Smart Nursing Worklist tasks
         generate_smart_tasks(db, bed.id, bed.condition, patient_id=new_patient_id)
 
-    db.commit()
-
     # 7. Real-time Broadcast to Dashboard
-    await manager.broadcast({
+    EventBus.publish(db, {
         "type": "NEW_ADMISSION", 
         "bed_id": assigned_id,
         "patient_gender": request.gender,
@@ -916,15 +987,19 @@ async def assess_patient(request: TriageRequest, db: Session = Depends(get_db)):
         inv_context = bed.type if bed.type in ["ICU", "ER"] else "Wards"
         
         # Trigger inventory deduction shared logic
-        await InventoryService.process_usage(
-            db, manager, inv_context, 
+        InventoryService.record_usage(
+            db, inv_context, 
             {
                 "patient_name": request.patient_name, 
                 "bed_id": bed.id, 
+                "patient_id": new_patient_id,
                 "condition": new_record.condition # Contains "ESI X: Justification"
             }
         )
 
+    # Single commit for record, bed, tasks, inventory and outbox events
+    db.commit()
+
     return {
         "patient_name": request.patient_name,  # Added
         "acuity": bed_type,                    # Added (e.g., "ICU", "ER", "Wards")
@@ -941,78 +1016,99 @@ async def assess_patient(request: TriageRequest, db: Session = Depends(get_db)):
 
 
 
-@app.get("/api/history/day/{target_date}")
-def get_history_by_day(target_date: date, db: Session = Depends(get_db)):
-    records = db.query(models.PatientRecord).filter(
-        func.date(models.PatientRecord.timestamp) == target_date
-    ).order_by(models.PatientRecord.timestamp.desc()).all()
-    
-    # Return directly; FastAPI's JSONEncoder handles Datetime objects 
-    # but ensure they include timezone info if possible.
-    return records
+def history_response(db: Session, feed: str, filters, cursor: Optional[str], limit: Optional[int], format: str):
+    """
+    Shared shape of the history endpoints (newest first):
+    - ?limit=N[&cursor=...] -> one keyset page: {"items": [...], "next_cursor": "..." | null}
+    - ?format=ndjson        -> every row, streamed as NDJSON
+    - no parameters         -> every row as a JSON array, as before, but streamed page by page
+    """
+    if limit is not None or cursor is not None:
+        try:
+            items, next_cursor = HistoryService.fetch_page(db, feed, filters, cursor, limit or DEFAULT_PAGE_SIZE)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse({"items": items, "next_cursor": next_cursor})
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(HistoryService.stream(feed, filters, format), media_type=media_type)
+
+@app.get("/api/history/day/{target_date}", response_model=schemas.ClinicalHistoryOut)
+def get_history_by_day(
+    target_date: date,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    # target_date is an IST calendar day; filtered as a UTC half-open range on the indexed column
+    filters = day_filter(models.PatientRecord.timestamp, target_date)
+    return history_response(db, "clinical", filters, cursor, limit, format)
+
+@app.get("/api/history/surgery", response_model=schemas.SurgeryHistoryOut)
+def get_surgery_history(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    # Fetching end_time for surgery (optional IST date range, both ends inclusive)
+    filters = range_filter(models.SurgeryHistory.end_time, start_date, end_date)
+    return history_response(db, "surgery", filters, cursor, limit, format)
+
+@app.get("/api/history/opd", response_model=schemas.OpdHistoryOut)
+def get_opd_history(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    # Optional IST date range on check-in time, both ends inclusive
+    filters = (models.PatientQueue.status == "COMPLETED",) + range_filter(models.PatientQueue.check_in_time, start_date, end_date)
+    return history_response(db, "opd", filters, cursor, limit, format)
+
+@app.get("/api/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db)
+):
+    """
+    Streams a whole table (oldest first) for audits and the data team, in bounded memory.
+    - start_date / end_date: optional IST date range, both ends inclusive
+    - limit: export in batches; the response's X-Next-Cursor header resumes after it
+    - cursor: continue (or retry) from a previous batch
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown export table. Choose from: {', '.join(EXPORT_TABLES)}")
+    if format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
 
-@app.get("/api/history/surgery")
-def get_surgery_history(db: Session = Depends(get_db)):
+    filters = range_filter(EXPORT_TABLES[table][1], start_date, end_date)
     try:
-        # Fetching end_time for surgery
-        history = db.query(models.SurgeryHistory).order_by(models.SurgeryHistory.end_time.desc()).all()
-        return history
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        conditions, next_cursor = ExportService.plan(db, table, filters, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@app.get("/api/history/opd")
-def get_opd_history(db: Session = Depends(get_db)):
-    try:
-        records = db.query(models.PatientQueue).filter(
-            models.PatientQueue.status == "COMPLETED"
-        ).order_by(models.PatientQueue.check_in_time.desc()).all()
-        return records
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    headers = {"Content-Disposition": f'attachment; filename="{table}.{format}"'}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    # Sync generator: Starlette iterates it in the threadpool, off the event loop
+    return StreamingResponse(ExportService.stream(table, conditions, format), media_type=EXPORT_FORMATS[format], headers=headers)
     
 # --- OPD Triage & Queue Logic ---
 
 
 # --- Integrated ICD-10 Priority Logic ---
-
-# Chapter-based weights (Industry standard approach)
-ICD_CHAPTER_WEIGHTS = {
-    "I": 40,  # Circulatory System
-    "J": 35,  # Respiratory System
-    "S": 30,  # Injury, poisoning (Trauma)
-    "T": 30,  # External causes
-    "G": 25,  # Nervous system
-    "A": 15,  # Infectious and parasitic
-    "B": 15,  # Infectious and parasitic
-    "E": 20,  # Endocrine/Metabolic
-    "L": 5,   # Skin diseases (Lower priority)
-}
-
-def calculate_priority_index(patient: models.PatientQueue):
-    """
-    Phrelis Triage Algorithm v2.5 (ICD-10 Integrated)
-    """
-    # 1. Base ESI: (6 - Level) * 20
-    score = (6 - patient.base_acuity) * 20
-    
-    # 2. ICD-10 Dynamic Weighting [INTEGRATED]
-    if hasattr(patient, 'icd_code') and patient.icd_code:
-        # Validate using simple_icd_10 library
-        if icd.is_valid_item(patient.icd_code):
-            chapter = patient.icd_code[0].upper()
-            chapter_bonus = ICD_CHAPTER_WEIGHTS.get(chapter, 10)
-            score += chapter_bonus
-            
-    # 3. Standard Symptom Bonuses (Fallback/Addition)
-    symptoms_lower = [s.lower() for s in (patient.symptoms or [])]
-    if any("chest pain" in s for s in symptoms_lower): score += 25
-    if any("shortness of breath" in s for s in symptoms_lower): score += 20
-    
-    # 4. Anti-Starvation (Wait-Time Compensation)
-    wait_time_mins = (datetime.utcnow() - patient.check_in_time).total_seconds() / 60
-    score += (wait_time_mins // 2)
-    
-    return float(score)
+# Scoring lives in queue_service: a static part fixed at check-in plus the wait-time bonus
 
 # --- Updated API Endpoints ---
 
@@ -1020,12 +1116,13 @@ def calculate_priority_index(patient: models.PatientQueue):
 def validate_icd(code: str):
     """
     Bio-Intake Helper: Validates a code and returns the medical description.
+    Served from the in-memory ICD-10 index (one dict lookup).
     """
-    is_valid = icd.is_valid_item(code)
+    entry = get_icd_index().lookup(code)
     return {
-        "valid": is_valid,
-        "description": icd.get_description(code) if is_valid else "Unknown Medical Code",
-        "chapter": code[0].upper() if is_valid else None
+        "valid": entry is not None,
+        "description": entry["desc"] if entry else "Unknown Medical Code",
+        "chapter": entry["chapter"] if entry else None
     }
 
 @app.post("/api/queue/checkin")
@@ -1051,15 +1148,27 @@ async def queue_checkin(request: QueueCheckInRequest, db: Session = Depends(get_
         status="WAITING"
     )
     
+    # Calculate static score (ICD-10 + ESI + symptoms) and the ordering key once, at check-in
+    apply_static_scores(patient)
+    
     db.add(patient)
-    db.commit()
-    db.refresh(patient)
     
-    # Calculate initial score based on ICD-10 + ESI
-    patient.priority_score = calculate_priority_index(patient)
+    # Server-side dispatch: idle rooms take the top of the queue in the same unit of work
+    dispatched = []
+    if AUTO_DISPATCH:
+        db.flush()
+        dispatched = QueueService.dispatch_idle_rooms(db)
+    
+    QueueService.mark_changed(db)
+    EventBus.publish(db, {
+        "type": "QUEUE_UPDATE",
+        "dispatched": [{"room_id": r, "patient_id": p} for r, p in dispatched]
+    })
     db.commit()
     
-    await manager.broadcast({"type": "QUEUE_UPDATE"})
+    for _, dispatched_id in dispatched:
+        record_consultation_usage(db, dispatched_id)
+    
     return {"status": "success", "patient_id": new_id, "priority_score": patient.priority_score}
 
 @app.post("/api/clinical/classify")
@@ -1075,48 +1184,67 @@ async def clinical_classify(request: dict):
     classification = await ai_agent.classify_icd(complaint, symptoms)
     return classification
 
-@app.get("/api/queue/sorted")
-def get_sorted_queue(db: Session = Depends(get_db)):
-    """
-    Real-time Orchestration Hub: Recalculates all scores to 
-    account for growing wait times.
-    """
-    patients = db.query(models.PatientQueue).filter(models.PatientQueue.status == "WAITING").all()
-    
-    for p in patients:
-        p.priority_score = calculate_priority_index(p)
-    
-    db.commit() 
-    
-    # Sort by Priority Score (Descending)
-    sorted_patients = sorted(patients, key=lambda x: x.priority_score, reverse=True)
+def build_sorted_queue(db: Session, version: int, now: datetime):
+    sorted_patients, avg_score = QueueService.get_sorted_waiting(db, now)
+    _, service_rate = QueueService.service_capacity(db)
     
     # Surge Logic
-    avg_score = sum(p.priority_score for p in sorted_patients) / len(sorted_patients) if sorted_patients else 0
     surge_warning = avg_score > 105 # Critical threshold
 
     return {
         "patients": sorted_patients,
         "surge_warning": surge_warning,
         "average_score": avg_score,
-        "system_status": "CRITICAL" if surge_warning else "STABLE"
+        "system_status": "CRITICAL" if surge_warning else "STABLE",
+        "service_rate_per_hour": round(service_rate * 60, 1),
+        "auto_dispatch": AUTO_DISPATCH, # Clients leave idle rooms to the server when on
+        "version": version
     }
 
-# --- Internal ICD-10 Search Helper (For Demo) ---
+@app.get("/api/queue/sorted", response_model=schemas.SortedQueueOut)
+def get_sorted_queue(request: Request, db: Session = Depends(get_db)):
+    """
+    Real-time Orchestration Hub: Live scores (including growing wait times) are derived
+    at read time; the order comes from the indexed priority_key, so nothing is written.
+    Supports If-None-Match: unchanged queue + same scoring minute -> 304 without a query.
+    """
+    # Read the version before the data so an ETag never vouches for newer state than it carries
+    version = queue_version.version
+    now = QueueService.score_clock()
+    etag = queue_version.etag(f"-{now:%H%M}")
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return FastJSONResponse(build_sorted_queue(db, version, now), headers={"ETag": etag})
+
+@app.get("/api/queue/sorted/poll", response_model=schemas.SortedQueueOut)
+async def poll_sorted_queue(
+    since_version: int = Query(-1),
+    timeout: float = Query(25.0, ge=0, le=60),
+    db: Session = Depends(get_db)
+):
+    """
+    Long-poll variant: returns at once if the queue version differs from since_version,
+    otherwise blocks until the next check-in/call/complete or the timeout (204).
+    The payload also carries the rooms, so one long-poll replaces both 5s polls.
+    """
+    version = await queue_version.wait_for_change(since_version, timeout)
+    if version == since_version:
+        return Response(status_code=204)
+
+    def load():
+        payload = build_sorted_queue(db, version, QueueService.score_clock())
+        payload["rooms"] = as_dicts(db.query(*columns(models.DoctorRoom, schemas.DoctorRoomOut)))
+        return FastJSONResponse(payload)
+    return await run_in_threadpool(load)
+
+# --- ICD-10 Typeahead Search ---
 @app.get("/api/queue/icd-search")
-def search_icd_codes(query: str):
+def search_icd_codes(query: str, limit: int = Query(10, ge=1, le=50)):
     """
-    Simulated ICD-10 Lookup Service.
-    In a real app, this would hit an external library or ICD-10 database.
+    ICD-10 Lookup Service over the full simple_icd_10 catalogue.
+    Ranked: exact code, code prefix (e.g. 'I2', 'i21.9'), then description words ('heart fail').
     """
-    # Example mock data
-    mock_codes = [
-        {"code": "I21.9", "desc": "Acute Myocardial Infarction (Heart Attack)"},
-        {"code": "J44.9", "desc": "Chronic Obstructive Pulmonary Disease (COPD)"},
-        {"code": "S06.0X1A", "desc": "Concussion, Initial Encounter"},
-        {"code": "L03.90", "desc": "Cellulitis, Unspecified"}
-    ]
-    return [c for c in mock_codes if query.lower() in c['desc'].lower() or query.lower() in c['code'].lower()]
+    return get_icd_index().search(query, limit)
 
 
 
@@ -1189,9 +1317,13 @@ def search_icd_codes(query: str):
 #         "average_score": avg_score
 #     }
 
-@app.get("/api/queue/rooms")
-def get_doctor_rooms(db: Session = Depends(get_db)):
-    return db.query(models.DoctorRoom).all()
+@app.get("/api/queue/rooms", response_model=List[schemas.DoctorRoomOut])
+def get_doctor_rooms(request: Request, db: Session = Depends(get_db)):
+    etag = queue_version.etag()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    rooms = as_dicts(db.query(*columns(models.DoctorRoom, schemas.DoctorRoomOut)))
+    return FastJSONResponse(rooms, headers={"ETag": etag})
 
 @app.post("/api/queue/call/{patient_id}")
 async def call_to_room(
@@ -1205,38 +1337,42 @@ async def call_to_room(
     if not patient or not room:
         raise HTTPException(status_code=404, detail="Patient or Room not found")
         
-    if room.status == "ACTIVE":
+    # 1. Update Room Status (Linking the patient to the room)
+    # Conditional UPDATEs: a room or patient taken by another screen or the dispatcher loses cleanly
+    if not QueueService.claim_room(db, room_id, patient_id):
+        db.rollback()
         raise HTTPException(status_code=400, detail="Room is already active")
 
-    # 1. Update Patient Status
-    patient.status = "CONSULTATION"
-    # Ensure your PatientQueue model has 'assigned_room' column
-    if hasattr(patient, 'assigned_room'):
-        patient.assigned_room = room_id
+    # 2. Update Patient Status (keep the score the patient was called with for history)
+    if not QueueService.claim_patient(db, patient_id, room_id, calculate_priority_index(patient)):
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Patient is no longer waiting")
     
-    # 2. Update Room Status (Linking the patient to the room)
-    room.status = "ACTIVE"
-    room.current_patient_id = patient_id
+    # 3. Global Broadcast (outbox, committed with the call)
+    QueueService.mark_changed(db)
+    EventBus.publish(db, {"type": "QUEUE_UPDATE", "room_id": room_id, "status": "ACTIVE", "patient_id": patient_id})
     
     db.commit()
     
-    # 3. Trigger Inventory Hook
+    # 4. Trigger Inventory Hook
+    record_consultation_usage(db, patient_id)
+    
+    return {"status": "called", "room_id": room_id, "patient_id": patient_id}
+
+def record_consultation_usage(db: Session, patient_id: str):
+    """OPD consult inventory hook. Runs after the call commits, so a stock problem never blocks a call."""
+    patient = db.query(models.PatientQueue).filter(models.PatientQueue.id == patient_id).first()
     # Safety check for patient name field (standardizing names)
     p_name = getattr(patient, "patient_name", "Unknown Patient")
     
     try:
-        await InventoryService.process_usage(
-            db, manager, "OPD_Consultation", 
-            {"patient_name": p_name, "id": patient.id, "condition": "OPD Consult"}
+        InventoryService.process_usage(
+            db, "OPD_Consultation", 
+            {"patient_name": p_name, "id": patient_id, "condition": "OPD Consult"}
         )
     except Exception as e:
+        db.rollback()
         print(f"Inventory hook failed but continuing: {e}")
-    
-    # 4. Global Broadcasts
-    await manager.broadcast({"type": "QUEUE_UPDATE"})
-    await manager.broadcast({"type": "ROOM_UPDATE", "room_id": room_id, "status": "ACTIVE"})
-    
-    return {"status": "called", "room_id": room_id, "patient_id": patient_id}
 
 @app.post("/api/queue/complete/{room_id}")
 async def complete_consultation(room_id: str, db: Session = Depends(get_db)):
@@ -1253,16 +1389,34 @@ async def complete_consultation(room_id: str, db: Session = Depends(get_db)):
     # We use getattr as a safety measure while you transition your DB schema
     patient_id = getattr(room, "current_patient_id", None)
     
+    # 3. Reset the room status (only if it still holds this patient: a double 'complete' is a no-op)
+    if not QueueService.release_room(db, room_id, patient_id):
+        db.rollback()
+        return {"status": "already_idle", "message": "Room is not currently occupied"}
+    
     if patient_id:
         patient = db.query(models.PatientQueue).filter(models.PatientQueue.id == patient_id).first()
         if patient:
             patient.status = "COMPLETED"
+            patient.consultation_end = datetime.utcnow()
+            # Rolling service-rate stats feed the per-patient ETA in /api/queue/sorted
+            if patient.consultation_start:
+                QueueService.record_service(db, room_id, patient.consultation_start, patient.consultation_end)
             # Logic: If you want to free up a bed in the ward automatically, add it here.
-
-    # 3. Reset the room status
-    room.status = "IDLE"
-    if hasattr(room, "current_patient_id"):
-        room.current_patient_id = None
+    
+    # 4. Auto-dispatch: the freed room takes the highest-priority waiting patient in the same commit
+    next_patient_id = QueueService.dispatch_next(db, room_id) if AUTO_DISPATCH else None
+    
+    # 5. Real-time Broadcast to Frontend (one message, committed with the status change)
+    # This triggers the 'mutateQueue' and 'mutateRooms' in your Next.js page
+    QueueService.mark_changed(db)
+    EventBus.publish(db, {
+        "type": "QUEUE_UPDATE",
+        "room_id": room_id,
+        "status": "ACTIVE" if next_patient_id else "IDLE",
+        "patient_id": next_patient_id,
+        "completed_patient_id": patient_id
+    })
     
     try:
         db.commit()
@@ -1270,30 +1424,22 @@ async def complete_consultation(room_id: str, db: Session = Depends(get_db)):
         db.rollback()
         print(f"Database Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to update database")
-
-    # 4. Real-time Broadcast to Frontend
-    # This triggers the 'mutateQueue' and 'mutateRooms' in your Next.js page
-    await manager.broadcast({"type": "QUEUE_UPDATE"})
-    await manager.broadcast({
-        "type": "ROOM_UPDATE", 
-        "room_id": room_id, 
-        "status": "IDLE"
-    })
     
-    return {"status": "completed", "room_id": room_id}
+    if next_patient_id:
+        record_consultation_usage(db, next_patient_id)
+    
+    return {"status": "completed", "room_id": room_id, "next_patient_id": next_patient_id}
 
 @app.get("/api/external/capacity")
 def get_external_capacity(db: Session = Depends(get_db)):
     """Anonymized bed availability and patient load data"""
-    total_beds = db.query(models.BedModel).count()
-    occupied_beds = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
-    opd_waiting = db.query(models.PatientQueue).filter(models.PatientQueue.status == "WAITING").count()
+    snapshot = hospital_state.snapshot(db)
     
     return {
         "hospital_name": "Phrelis General",
-        "bed_capacity": total_beds,
-        "beds_available": total_beds - occupied_beds,
-        "opd_load": opd_waiting,
+        "bed_capacity": snapshot.total_beds,
+        "beds_available": snapshot.available_beds,
+        "opd_load": snapshot.opd_waiting,
         "timestamp": datetime.utcnow()
     }
 
@@ -1307,114 +1453,30 @@ def get_inventory(db: Session = Depends(get_db)):
 @app.get("/api/inventory/forecast")
 def get_inventory_forecast(db: Session = Depends(get_db)):
     """
-    Predictive Engine: Calculates burn rate and exhaustion time.
+    Predictive Engine: per-item demand forecast (seasonal exponential smoothing over hourly
+    usage), predicted stockout time with a confidence band, and a suggested reorder quantity.
+    The model is refitted in the background; a request reads it plus the current stock levels.
     """
-    # 1. Calculate Hospital Load Multiplier
-    total_beds = db.query(models.BedModel).count() or 1
-    occupied_beds = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
-    occupancy_rate = occupied_beds / total_beds
-    
-    # Dynamic Weighting: Global 1.2x overhead if hospital is busy (>80%)
-    load_multiplier = 1.2 if occupancy_rate > 0.8 else 1.0
-    
-    items = db.query(models.InventoryItem).all()
-    forecast_data = []
-    
-    now = datetime.utcnow()
-    six_hours_ago = now - timedelta(hours=6)
-    
-    for item in items:
-        # 2. Historical Windowing (Last 6 Hours)
-        logs = db.query(models.InventoryLog).filter(
-            models.InventoryLog.item_id == item.id,
-            models.InventoryLog.timestamp >= six_hours_ago
-        ).all()
-        
-        total_used = sum(log.quantity_used for log in logs)
-        
-        # 3. Consumption Rate Calculation (Units per Hour)
-        # Avoid division by zero, default to minimal usage to prevent infinite exhaustion time
-        raw_burn_rate = total_used / 6.0
-        if raw_burn_rate == 0: raw_burn_rate = 0.1 # Baseline trickle
-            
-        # Apply Logic: Dynamic Weighting
-        adjusted_burn_rate = raw_burn_rate * load_multiplier
-        
-        # 4. Exhaustion Prediction
-        hours_remaining = 999.0
-        if adjusted_burn_rate > 0:
-            hours_remaining = item.quantity / adjusted_burn_rate
-            
-        # 5. Smart Alert Thresholds
-        status = "Normal"
-        if hours_remaining < 3:
-            status = "Critical" # Stockout Imminent
-        elif hours_remaining < 12:
-            status = "Warning" # Draft Reorder
-            
-        forecast_data.append({
-            "id": item.id,
-            "name": item.name,
-            "category": item.category,
-            "quantity": item.quantity,
-            "reorder_level": item.reorder_level,
-            "burn_rate": round(adjusted_burn_rate, 2),
-            "hours_remaining": round(hours_remaining, 1),
-            "status": status,
-            "load_multiplier": load_multiplier if occupancy_rate > 0.8 else 1.0 # For debugging/UI transparency
-        })
-        
-    return forecast_data
+    return demand_forecaster.forecast(db)
 
+@app.get("/api/inventory/alerts")
+def get_stock_alerts(db: Session = Depends(get_db)):
+    """Open low-stock alerts (LOW / CRITICAL), most severe first. Read from the alert state table, not the inventory."""
+    return StockAlertService.open_alerts(db)
 
-@app.get("/api/dashboard/stats")
-def get_dashboard_stats(db: Session = Depends(get_db)):
+@app.post("/api/inventory/alerts/{item_id}/ack")
+def acknowledge_stock_alert(item_id: int, db: Session = Depends(get_db)):
+    """Acknowledges an open stock alert: it stops escalating until the item's state worsens."""
+    if not StockAlertService.acknowledge(db, item_id):
+        raise HTTPException(status_code=404, detail="No open stock alert for this item")
+    return {"status": "acknowledged", "item_id": item_id}
 
-    def get_count(unit_type: str):
-        return db.query(models.BedModel).filter(
-            models.BedModel.type == unit_type, 
-           (models.BedModel.is_occupied == True) | (models.BedModel.status == "OCCUPIED")
-        ).count()
-
-    er_occ = get_count("ER")
-    icu_occ = get_count("ICU")
-    wards_occ = get_count("Wards")
-    surgery_occ = get_count("Surgery")
-    
-    total_beds = db.query(models.BedModel).count() or 190
 
-    # Resource Usage
-    vents_in_use = db.query(models.BedModel).filter(models.BedModel.ventilator_in_use == True).count()
-    amb_total = db.query(models.Ambulance).count()
-    amb_avail = db.query(models.Ambulance).filter(models.Ambulance.status == "IDLE").count()
-
-    # Staff Ratio (Patients per Doctor)
-    total_doctors = db.query(models.Staff).filter(models.Staff.role == "Doctor", models.Staff.is_clocked_in == True).count()
-    total_patients = er_occ + icu_occ + wards_occ + surgery_occ
-    
-    ratio_str = "N/A"
-    if total_doctors > 0:
-        ratio = round(total_patients / total_doctors, 1)
-        ratio_str = f"1:{ratio}"
+@app.get("/api/dashboard/stats")
+def get_dashboard_stats(db: Session = Depends(get_db)):
+    """Occupancy, staff ratio and resources, from the hospital state snapshot."""
+    return FastJSONResponse(DashboardService.get_stats(db))
 
-    return {
-        "staff_ratio": ratio_str,
-        "occupancy": {
-            "ER": er_occ, 
-            "ICU": icu_occ, 
-            "Wards": wards_occ, 
-            "Surgery": surgery_occ
-        },
-        "bed_stats": {
-            "total": total_beds,
-            "occupied": er_occ + icu_occ + wards_occ + surgery_occ,
-            "available": total_beds - (er_occ + icu_occ + wards_occ + surgery_occ)
-        },
-        "resources": {
-            "Ventilators": {"total": 20, "in_use": vents_in_use},
-            "Ambulances": {"total": amb_total, "available": amb_avail}
-        }
-    }
 # Ambulance System 
 
 @app.get("/api/ambulances")
@@ -1427,10 +1489,7 @@ def dispatch_ambulance(request: AmbulanceRequest, db: Session = Depends(get_db))
     required_type = "ICU" if request.severity.upper() == "HIGH" else "ER"
     
     total_beds = 20 if required_type == "ICU" else 60
-    occupied = db.query(models.BedModel).filter(
-        models.BedModel.type == required_type, 
-        models.BedModel.is_occupied == True
-    ).count()
+    occupied = hospital_state.snapshot(db).occupied(required_type)
     
     if occupied >= total_beds:
         return {
@@ -1475,20 +1534,21 @@ def reset_ambulance(ambulance_id: str, db: Session = Depends(get_db)):
 
 # Staff & Task Management 
 
-@app.get("/api/staff")
+@app.get("/api/staff", response_model=schemas.StaffOverviewOut)
 def get_staff(db: Session = Depends(get_db)):
 
     total_nurses = db.query(models.Staff).filter(models.Staff.role == "Nurse", models.Staff.is_clocked_in == True).count()
     total_doctors = db.query(models.Staff).filter(models.Staff.role == "Doctor", models.Staff.is_clocked_in == True).count()
     
-    staff_list = db.query(models.Staff).all()
-    assignments = db.query(models.BedAssignment).filter(models.BedAssignment.is_active == True).all()
+    # Schema columns only (never hashed_password)
+    staff_list = as_dicts(db.query(*columns(models.Staff, schemas.StaffOut)))
+    assignments = as_dicts(db.query(*columns(models.BedAssignment, schemas.BedAssignmentOut)).filter(models.BedAssignment.is_active == True))
     
-    return {
+    return FastJSONResponse({
         "stats": {"nurses_on_shift": total_nurses, "doctors_on_shift": total_doctors},
         "staff": staff_list,
         "assignments": assignments
-    }
+    })
 
 @app.post("/api/staff/clock")
 def clock_staff(request: StaffClockIn, db: Session = Depends(get_db)):
@@ -1637,6 +1697,9 @@ def initialize_hospital_beds(db: Session):
 def seed_db():
     db = next(get_db())
     initialize_hospital_beds(db)
+    QueueService.backfill_scores(db)
+    InventoryService.backfill_burn_rates(db)
+    StockAlertService.sync_all(db)
     
     # Seed Ambulances
     if db.query(models.Ambulance).count() == 0:
@@ -1684,7 +1747,7 @@ async def predict_inflow(db: Session = Depends(get_db)):
     weather = await WeatherService.get_weather_coefficient()
     w_mult = weather["multiplier"] 
     
-    occupied_count = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
+    occupied_count = hospital_state.snapshot(db).occupied_beds
     # Saturation factor based on real-time bed data
     saturation_factor = 1 + (occupied_count / 60) * 0.25 
 
@@ -1734,6 +1797,25 @@ def log_event(event: EventCreate, db: Session = Depends(get_db)):
     db.commit()
     return {"status": "success", "event_id": new_event.id}
 
+@app.get("/api/metrics/occupancy")
+def get_occupancy_series(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = Query(None, description="1m, 15m or 1h; picked from the range when omitted"),
+    metrics: Optional[str] = Query(None, description="Comma-separated metric names; all when omitted"),
+    db: Session = Depends(get_db)
+):
+    """
+    Recorded occupancy, OPD queue, ventilator and ambulance series over [start, end)
+    (default: the last 24 hours). Naive timestamps are UTC, like the stored ones.
+    """
+    end = as_utc(end) if end else datetime.utcnow()
+    start = as_utc(start) if start else end - timedelta(hours=24)
+    try:
+        return FastJSONResponse(OccupancySeries.query(db, start, end, resolution, schemas.csv_values(metrics)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/metrics/latency")
 def get_latency_metrics(db: Session = Depends(get_db)):
     # Calculate average time between TRANSFER_START and TRANSFER_COMPLETE in last 24h
@@ -1836,28 +1918,23 @@ async def get_public_status(db: Session = Depends(get_db)):
     Returns anonymized counts and load index.
     Load Index: 0.0 (Empty) to 1.0 (Full)
     """
-    total_beds = db.query(models.BedModel).count()
-    occupied_beds = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
-    
-    available = total_beds - occupied_beds
-    load_index = occupied_beds / total_beds if total_beds > 0 else 0.0
+    snapshot = hospital_state.snapshot(db)
     
     return {
         "hospital_name": "Phrelis ERP Core",
-        "total_beds": total_beds,
-        "occupied": occupied_beds,
-        "available": available,
-        "load_index": round(load_index, 2),
-        "status": "CRITICAL" if load_index >= 1.0 else "NORMAL"
+        "total_beds": snapshot.total_beds,
+        "occupied": snapshot.occupied_beds,
+        "available": snapshot.available_beds,
+        "load_index": round(snapshot.load_index, 2),
+        "status": "CRITICAL" if snapshot.load_index >= 1.0 else "NORMAL"
     }
 
 @app.get("/api/diversion/recommend")
 async def get_diversion_recommendation(db: Session = Depends(get_db)):
     # 1. Check local capacity
-    total_beds = db.query(models.BedModel).count()
-    occupied_beds = db.query(models.BedModel).filter(models.BedModel.is_occupied == True).count()
+    snapshot = hospital_state.snapshot(db)
     
-    if occupied_beds < total_beds:
+    if snapshot.occupied_beds < snapshot.total_beds:
         return {"recommendation": None, "reason": "Capacity available locally"}
 
     # 2. Fetch Partner data (Mocking the external API calls for this demo)
@@ -2000,17 +2077,33 @@ def recalculate_stay_durations():
 @app.on_event("startup")
 async def schedule_tasks():
     # In a real app, use a scheduler like APScheduler. For now, we define the hook.
-    pass
+    # Outbox dispatcher: delivers committed WebSocket events, including any left over from before a restart
+    app.state.outbox_task = asyncio.create_task(outbox_dispatcher.run())
+    # Hot/cold archiver: moves closed records past their retention horizon out of the hot tables
+    app.state.archive_task = asyncio.create_task(Archiver().run())
+    # Inventory demand model: refitted every few minutes so forecasts are a cache read
+    app.state.forecast_task = asyncio.create_task(demand_forecaster.run())
+    # Stock alerts: re-sends open, unacknowledged alerts that are due for escalation
+    app.state.stock_alert_task = asyncio.create_task(StockAlertEscalator().run())
+    # Occupancy time series: one sample a minute, rolled into 15-minute and hourly buckets
+    app.state.occupancy_task = asyncio.create_task(OccupancyRecorder().run())
+    # ICD-10 typeahead index: load (or build and cache) it off the event loop before the first keystroke
+    await asyncio.to_thread(get_icd_index)
+
+@app.on_event("shutdown")
+async def stop_tasks():
+    app.state.outbox_task.cancel()
+    app.state.archive_task.cancel()
+    app.state.forecast_task.cancel()
+    app.state.stock_alert_task.cancel()
+    app.state.occupancy_task.cancel()
 
 @app.get("/api/patients/search")
-async def search_patients(q: str, db: Session = Depends(get_db)):
-    results = db.query(models.PatientRecord).filter(
-        (models.PatientRecord.patient_name.ilike(f"%{q}%")) | 
-        (models.PatientRecord.id.ilike(f"%{q}%"))
-    ).all()
-    return results
+def search_patients(q: str, limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
+    """Prefix-ranked lookup over name, id, condition and bed, served by the FTS5 index."""
+    return PatientSearch.search(db, q, limit)
 
-@app.get("/api/billing/live/{patient_id}")
+@app.get("/api/billing/live/{patient_id}", response_model=schemas.LiveBillingOut)
 async def get_live_billing(patient_id: str, db: Session = Depends(get_db)):
     # 1. Fetch patient and bed
     patient = db.query(models.PatientRecord).filter(models.PatientRecord.id == patient_id).first()
@@ -2033,15 +2126,15 @@ async def get_live_billing(patient_id: str, db: Session = Depends(get_db)):
             )
             
     # 3. Sum ledger entries
-    ledger_entries = db.query(models.BillingLedger).filter(models.BillingLedger.patient_id == patient_id).all()
-    resource_total = sum(item.amount for item in ledger_entries)
+    ledger_entries = as_dicts(db.query(*columns(models.BillingLedger, schemas.LedgerEntryOut)).filter(models.BillingLedger.patient_id == patient_id))
+    resource_total = sum(item["amount"] or 0.0 for item in ledger_entries)
     
     # 4. Apply taxes (18% GST)
     subtotal = accrued_bed_cost + resource_total
     tax = subtotal * 0.18
     grand_total = subtotal + tax
     
-    return {
+    return FastJSONResponse({
         "patient_id": patient_id,
         "patient_name": patient.patient_name,
         "bed_info": {
@@ -2058,7 +2151,7 @@ async def get_live_billing(patient_id: str, db: Session = Depends(get_db)):
             "grand_total": round(grand_total, 2)
         },
         "ledger": ledger_entries
-    }
+    })
 
 
 
@@ -1,6 +1,29 @@
 
 from database import engine
+from sqlalchemy import inspect, text
 import models  # This must be imported to register your classes
+from patient_search import PatientSearch
+from archive_service import ArchiveService
+
+def upgrade_schema(bind=engine):
+    """
+    Brings an existing hospital_os.db up to date with models.py.
+    create_all only creates missing tables, so columns and indexes added to
+    existing tables are applied here (ALTER TABLE ADD COLUMN / CREATE INDEX IF NOT EXISTS).
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col['name'] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+                    print(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
 
 def migrate():
     print("Synchronizing Database Schema...")
@@ -8,9 +31,12 @@ def migrate():
         # This command creates all tables defined in models.py 
         # (hospital_beds, surgery_history, etc.) with all their current columns.
         models.Base.metadata.create_all(bind=engine)
+        upgrade_schema()
+        PatientSearch.ensure_schema()
+        ArchiveService.ensure_schema()
         print("Success: All tables and columns are now synchronized.")
     except Exception as e:
         print(f"Migration Failed: {e}")
 
 if __name__ == "__main__":
-    migrate()
\ No newline at end of file
+    migrate()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, JSON, DateTime, Float ,ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, JSON, DateTime, Float ,ForeignKey, Index
 from datetime import datetime
 from database import Base
 
@@ -12,6 +12,14 @@ class BedMaster(Base):
     admission_fee = Column(Float, default=0.0) # [NEW] Fixed one-time charge
 
 
+BED_STATUS_COLORS = {
+    "AVAILABLE": "#32CD32", # Green
+    "OCCUPIED": "#FF4500",  # Red-Orange
+    "DIRTY": "#FFA500",     # Orange
+    "CLEANING": "#87CEEB",  # Sky Blue
+}
+BED_UNKNOWN_COLOR = "#808080" # Grey
+
 class BedModel(Base):
     __tablename__ = "beds"
     
@@ -39,12 +47,13 @@ class BedModel(Base):
     cleanup_start_time = Column(DateTime, nullable=True)
     next_surgery_start_time = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_beds_unit_status", "unit", "status"), # Per-unit bed board
+        Index("ix_beds_type_status", "type", "status"),
+    )
+
     def get_color_code(self):
-        if self.status == "AVAILABLE": return "#32CD32" # Green
-        if self.status == "OCCUPIED": return "#FF4500"  # Red-Orange
-        if self.status == "DIRTY": return "#FFA500"     # Orange
-        if self.status == "CLEANING": return "#87CEEB"  # Sky Blue
-        return "#808080" # Grey (Unknown)
+        return BED_STATUS_COLORS.get(self.status, BED_UNKNOWN_COLOR)
     
 
 
@@ -87,6 +96,10 @@ class PatientRecord(Base):
     payer_type = Column(String, default="Cash") # Cash, Insurance, Scheme
     collection_status = Column(String, default="Billed") # Billed, Paid, Pending
 
+    __table_args__ = (
+        Index("ix_patients_timestamp_id", "timestamp", "id"), # Keyset paging of clinical history
+    )
+
 class Department(Base):
     __tablename__ = "departments"
     
@@ -171,6 +184,10 @@ class SurgeryHistory(Base):
     total_duration_minutes = Column(Integer)
     overtime_minutes = Column(Integer, default=0)
 
+    __table_args__ = (
+        Index("ix_surgery_history_end_time_id", "end_time", "id"), # Keyset paging of surgery history
+    )
+
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
     
@@ -190,7 +207,57 @@ class InventoryLog(Base):
     bed_id = Column(String, nullable=True) # Matches BedModel.id
     quantity_used = Column(Integer)
     reason = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True) # Burn-rate windows
+
+class ConsumptionRule(Base):
+    """Items a clinical event consumes; read through inventory_service.get_consumption_rules."""
+    __tablename__ = "consumption_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    trigger = Column(String)   # context (exact), context_prefix, or condition (keywords)
+    pattern = Column(String)   # Context name / prefix, or "|"-separated condition keywords
+    item_name = Column(String) # InventoryItem.name
+    quantity = Column(Integer, default=1)
+
+class InventoryBurnRate(Base):
+    """Hourly usage rollup per item, maintained by InventoryService.deduct_stock (burn-rate forecasts)."""
+    __tablename__ = "inventory_burn_hourly"
+
+    hour_start = Column(DateTime, primary_key=True) # UTC, truncated to the hour
+    item_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    quantity_used = Column(Integer, default=0)
+
+class StockAlert(Base):
+    """Low-stock alert state per item (OK / LOW / CRITICAL), maintained by stock_alerts.StockAlertService."""
+    __tablename__ = "stock_alerts"
+    __table_args__ = (
+        Index("ix_stock_alerts_state", "state"), # Open alerts
+        Index("ix_stock_alerts_next_escalation_at", "next_escalation_at"),
+    )
+
+    item_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    state = Column(String, default="OK")
+    quantity = Column(Integer) # Stock level at the last transition
+    opened_at = Column(DateTime, nullable=True)
+    changed_at = Column(DateTime, nullable=True)
+    escalation_level = Column(Integer, default=0)
+    next_escalation_at = Column(DateTime, nullable=True) # None: acknowledged or not open
+    acknowledged_at = Column(DateTime, nullable=True)
+
+class OccupancySample(Base):
+    """Occupancy time series bucket (mean / min / max of the samples in it), maintained by occupancy_series.OccupancyRecorder."""
+    __tablename__ = "occupancy_series"
+    __table_args__ = (
+        Index("ix_occupancy_series_resolution_bucket", "resolution", "bucket_start"), # Retention pruning
+    )
+
+    resolution = Column(Integer, primary_key=True) # Bucket width in seconds: 60, 900, 3600
+    metric = Column(String, primary_key=True)      # e.g. occupied.type.ICU, opd_queue
+    bucket_start = Column(DateTime, primary_key=True) # UTC
+    value = Column(Float)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    samples = Column(Integer, default=1)
 
 class PatientQueue(Base):
     __tablename__ = "patient_queue"
@@ -209,6 +276,15 @@ class PatientQueue(Base):
     status = Column(String, default="WAITING") # WAITING, CONSULTATION, COMPLETED
     priority_score = Column(Float, default=0.0)
     assigned_room = Column(String, nullable=True)
+    static_score = Column(Float, nullable=True) # ESI + ICD + symptom part, fixed at check-in
+    priority_key = Column(Float, nullable=True) # Time-invariant ordering key (see queue_service)
+    consultation_start = Column(DateTime, nullable=True) # Set when called into a room
+    consultation_end = Column(DateTime, nullable=True) # Set when the room completes
+
+    __table_args__ = (
+        Index("ix_patient_queue_status_priority", "status", "priority_key"),
+        Index("ix_patient_queue_status_check_in", "status", "check_in_time", "id"), # OPD history paging
+    )
 
 class DoctorRoom(Base):
     __tablename__ = "doctor_rooms"
@@ -218,6 +294,9 @@ class DoctorRoom(Base):
     status = Column(String, default="IDLE") # IDLE, ACTIVE
     # Add this line:
     current_patient_id = Column(String, nullable=True)
+    # Rolling service statistics, updated on every completed consultation
+    avg_service_minutes = Column(Float, nullable=True) # EWMA of consultation length
+    consults_completed = Column(Integer, default=0)
 
 class PartnerHospital(Base):
     __tablename__ = "partner_hospitals"
@@ -237,7 +316,7 @@ class BillingLedger(Base):
     item_type = Column(String) # BED, PHARMACY, CLINICAL, LAB
     description = Column(String)
     amount = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True) # Revenue history ranges
 
 class HospitalExpense(Base):
     __tablename__ = "hospital_expenses"
@@ -246,7 +325,7 @@ class HospitalExpense(Base):
     category = Column(String) # Salary, Utilities, Medical Supplies, Maintenance
     amount = Column(Float)
     description = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True) # Expense history ranges
 
 class FinancialLedger(Base):
     __tablename__ = "financial_ledger"
@@ -257,5 +336,14 @@ class FinancialLedger(Base):
     amount = Column(Float)
     reference_id = Column(String, nullable=True) # patient_id or expense_id
     description = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True) # 30-day expense window
     immutable_hash = Column(String, nullable=True) # For audit integrity
+
+class OutboxEvent(Base):
+    __tablename__ = "event_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String)
+    payload = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    dispatched_at = Column(DateTime, nullable=True, index=True) # NULL until delivered to sockets
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models
+from hospital_state import hospital_state
+
+SAMPLE_SECONDS = 60
+# (bucket width in seconds, retention): every sample lands in all three levels, so the
+# coarser series are complete as soon as a sample is written (no separate rollup job)
+LEVELS = [
+    (60, timedelta(days=2)),
+    (15 * 60, timedelta(days=30)),
+    (60 * 60, timedelta(days=365)),
+]
+RESOLUTIONS = {"1m": 60, "15m": 15 * 60, "1h": 60 * 60}
+MAX_POINTS = 1500 # Per series, when the resolution is picked automatically
+EPOCH = datetime(1970, 1, 1)
+UNASSIGNED = "unassigned" # Metric label for beds with no type / unit
+
+def bucket_start(at: datetime, width_seconds: int) -> datetime:
+    return at - timedelta(seconds=(at - EPOCH).total_seconds() % width_seconds)
+
+def resolution_name(width_seconds: int) -> str:
+    return next(name for name, width in RESOLUTIONS.items() if width == width_seconds)
+
+def as_utc(ts: datetime) -> datetime:
+    """Aware datetimes -> naive UTC (the storage format); naive ones are taken as UTC already."""
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+class OccupancySeries:
+    """
+    Occupancy time series (occupancy_series): one narrow row per (resolution, metric, bucket)
+    holding the mean / min / max of the samples that fell in the bucket.
+    Metrics: occupied.total, occupied.type.<bed type>, occupied.unit.<unit>, opd_queue,
+    ventilators_in_use, ambulances_idle (beds without a type or unit count under UNASSIGNED).
+    """
+    @staticmethod
+    def metrics_from_snapshot(snapshot) -> dict:
+        metrics = {
+            "occupied.total": snapshot.occupied_beds,
+            "opd_queue": snapshot.opd_waiting,
+            "ventilators_in_use": snapshot.beds["ventilators_in_use"],
+            "ambulances_idle": snapshot.ambulances.get("IDLE", 0),
+        }
+        for bed_type, counts in snapshot.beds["by_type"].items():
+            metrics[f"occupied.type.{bed_type or UNASSIGNED}"] = counts["occupied"]
+        for unit, counts in snapshot.beds["by_unit"].items():
+            metrics[f"occupied.unit.{unit or UNASSIGNED}"] = counts["occupied"]
+        return metrics
+
+    @staticmethod
+    def record(db: Session, metrics: dict, at: datetime):
+        """Folds one sample of every metric into its 1m, 15m and 1h buckets: one upsert. Does not commit."""
+        series = models.OccupancySample
+        stmt = sqlite_insert(series)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[series.resolution, series.metric, series.bucket_start],
+            set_={
+                "value": (series.value * series.samples + stmt.excluded.value) / (series.samples + 1),
+                "min_value": func.min(series.min_value, stmt.excluded.min_value),
+                "max_value": func.max(series.max_value, stmt.excluded.max_value),
+                "samples": series.samples + 1,
+            }
+        ), [
+            {"resolution": width, "metric": metric, "bucket_start": bucket_start(at, width),
+             "value": value, "min_value": value, "max_value": value, "samples": 1}
+            for width, _ in LEVELS for metric, value in metrics.items()
+        ])
+
+    @staticmethod
+    def prune(db: Session, now: datetime):
+        """Drops buckets past their level's retention. Does not commit."""
+        series = models.OccupancySample
+        db.execute(delete(series).where(or_(*[
+            (series.resolution == width) & (series.bucket_start < now - retention) for width, retention in LEVELS
+        ])))
+
+    @staticmethod
+    def pick_resolution(start: datetime, end: datetime, now: datetime) -> int:
+        """Finest level still retained at `start` that fits the range in MAX_POINTS buckets."""
+        for width, retention in LEVELS:
+            if start >= now - retention and (end - start).total_seconds() / width <= MAX_POINTS:
+                return width
+        return LEVELS[-1][0]
+
+    @staticmethod
+    def query(db: Session, start: datetime, end: datetime, resolution: str = None, metrics: list = None, now: datetime = None):
+        """
+        Buckets in [start, end) per metric as [bucket_start, mean, min, max] rows.
+        Raises ValueError on an unknown resolution or an empty range.
+        """
+        if end <= start:
+            raise ValueError("end must be after start")
+        if resolution and resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}'. Valid: {', '.join(RESOLUTIONS)}")
+        width = RESOLUTIONS[resolution] if resolution else OccupancySeries.pick_resolution(start, end, now or datetime.utcnow())
+
+        series = models.OccupancySample
+        stmt = select(series.metric, series.bucket_start, series.value, series.min_value, series.max_value).where(
+            series.resolution == width, series.bucket_start >= bucket_start(start, width), series.bucket_start < end
+        ).order_by(series.metric, series.bucket_start)
+        if metrics:
+            stmt = stmt.where(series.metric.in_(metrics))
+        result = {}
+        for metric, ts, mean, low, high in db.execute(stmt):
+            result.setdefault(metric, []).append([ts, round(mean, 3), low, high])
+        return {
+            "resolution": resolution_name(width),
+            "start": start,
+            "end": end,
+            "columns": ["bucket_start", "mean", "min", "max"],
+            "series": result,
+        }
+
+class OccupancyRecorder:
+    """Samples the hospital state snapshot every SAMPLE_SECONDS into the occupancy series, off the event loop."""
+    def __init__(self, interval_seconds: float = SAMPLE_SECONDS):
+        self.interval = interval_seconds
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.tick)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Occupancy sample failed, retrying next cycle: {e}")
+            await asyncio.sleep(self.interval)
+
+    def tick(self, now: datetime = None):
+        now = now or datetime.utcnow()
+        db = SessionLocal()
+        try:
+            metrics = OccupancySeries.metrics_from_snapshot(hospital_state.snapshot(db))
+            OccupancySeries.record(db, metrics, now)
+            OccupancySeries.prune(db, now)
+            db.commit()
+            return metrics
+        finally:
+            db.close()
@@ -0,0 +1,108 @@
+import re
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from database import engine
+import models
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+CANDIDATE_FACTOR = 4 # limit * factor newest matches are ranked in Python; bounds the work for common prefixes
+
+# FTS5 index over patients, kept in sync by triggers, so every writer (admission, triage,
+# discharge, seeders) maintains it inside its own transaction.
+# patients has a TEXT primary key and no stable rowid (VACUUM may renumber it), so
+# patient_search_map gives each patient a permanent integer key for the FTS row.
+# Prefixes up to 8 characters are indexed: a prefix query without an index of its length
+# merges the doclist of every matching term (~10 ms for a common word at 1M patients).
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS patient_search_map (rowid INTEGER PRIMARY KEY, patient_id TEXT UNIQUE NOT NULL)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS patient_search USING fts5(
+        patient_name, patient_id, condition, bed_id,
+        tokenize = 'unicode61', prefix = '1 2 3 4 5 6 7 8'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS patients_search_insert AFTER INSERT ON patients BEGIN
+        INSERT INTO patient_search_map (patient_id) VALUES (new.id);
+        INSERT INTO patient_search (rowid, patient_name, patient_id, condition, bed_id)
+            VALUES (last_insert_rowid(), new.patient_name, new.id, new.condition, new.bed_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patients_search_update
+        AFTER UPDATE OF id, patient_name, condition, bed_id ON patients BEGIN
+        UPDATE patient_search_map SET patient_id = new.id WHERE patient_id = old.id;
+        UPDATE patient_search
+            SET patient_name = new.patient_name, patient_id = new.id, condition = new.condition, bed_id = new.bed_id
+            WHERE rowid = (SELECT rowid FROM patient_search_map WHERE patient_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patients_search_delete AFTER DELETE ON patients BEGIN
+        DELETE FROM patient_search WHERE rowid = (SELECT rowid FROM patient_search_map WHERE patient_id = old.id);
+        DELETE FROM patient_search_map WHERE patient_id = old.id;
+    END""",
+]
+
+class PatientSearch:
+    @staticmethod
+    def ensure_schema(bind=engine):
+        """Creates the index and triggers if missing and backfills patients admitted before it existed."""
+        with bind.begin() as conn:
+            for statement in SCHEMA:
+                conn.execute(text(statement))
+            missing = conn.execute(text(
+                "SELECT COUNT(*) FROM patients WHERE id NOT IN (SELECT patient_id FROM patient_search_map)"
+            )).scalar()
+            if missing:
+                conn.execute(text(
+                    "INSERT INTO patient_search_map (patient_id) "
+                    "SELECT id FROM patients WHERE id NOT IN (SELECT patient_id FROM patient_search_map) ORDER BY timestamp"
+                ))
+                conn.execute(text(
+                    "INSERT INTO patient_search (rowid, patient_name, patient_id, condition, bed_id) "
+                    "SELECT m.rowid, p.patient_name, p.id, p.condition, p.bed_id FROM patient_search_map m "
+                    "JOIN patients p ON p.id = m.patient_id "
+                    "WHERE m.rowid NOT IN (SELECT rowid FROM patient_search)"
+                ))
+                print(f"Indexed {missing} patients for search")
+
+    @staticmethod
+    def match_expression(query: str):
+        """'Ravi icu-1' -> '"ravi"* "icu"* "1"*' (every word must prefix-match some column)."""
+        tokens = TOKEN_RE.findall(query.lower())
+        return " ".join(f'"{t}"*' for t in tokens) if tokens else None
+
+    @staticmethod
+    def _rank(query: str, name: str, patient_id: str) -> int:
+        q = query.strip().lower()
+        name = (name or "").lower()
+        if patient_id.lower() == q:
+            return 0
+        if name.startswith(q):
+            return 1
+        if patient_id.lower().startswith(q):
+            return 2
+        if any(word.startswith(q) for word in name.split()):
+            return 3
+        return 4 # Matched on condition / bed, or only across several words
+
+    @staticmethod
+    def search(db: Session, query: str, limit: int = 20):
+        """
+        Prefix search over name, id, condition and bed.
+        FTS5 returns the newest limit * CANDIDATE_FACTOR matches (rowid order, no full scoring
+        pass), which are ranked: exact id, name prefix, id prefix, name word prefix, other fields;
+        newest first within a rank. Returns patient rows as dicts.
+        """
+        match = PatientSearch.match_expression(query)
+        if not match:
+            return []
+        candidates = db.execute(text(
+            "SELECT s.patient_id, s.patient_name FROM patient_search s "
+            "WHERE patient_search MATCH :match ORDER BY s.rowid DESC LIMIT :cap"
+        ), {"match": match, "cap": limit * CANDIDATE_FACTOR}).all()
+
+        ranked = sorted(
+            enumerate(candidates),
+            key=lambda c: (PatientSearch._rank(query, c[1].patient_name, c[1].patient_id), c[0])
+        )
+        ids = [c.patient_id for _, c in ranked[:limit]]
+        if not ids:
+            return []
+        table = models.PatientRecord.__table__
+        records = {r.id: r._mapping for r in db.execute(select(table).where(table.c.id.in_(ids)))}
+        return [dict(records[i]) for i in ids if i in records]
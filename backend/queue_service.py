@@ -0,0 +1,337 @@
+import simple_icd_10 as icd
+import os
+import asyncio
+import threading
+import uuid
+from datetime import datetime
+from sqlalchemy import event, update, func
+from sqlalchemy.orm import Session
+import models
+
+# --- Integrated ICD-10 Priority Logic ---
+
+# Chapter-based weights (Industry standard approach)
+ICD_CHAPTER_WEIGHTS = {
+    "I": 40,  # Circulatory System
+    "J": 35,  # Respiratory System
+    "S": 30,  # Injury, poisoning (Trauma)
+    "T": 30,  # External causes
+    "G": 25,  # Nervous system
+    "A": 15,  # Infectious and parasitic
+    "B": 15,  # Infectious and parasitic
+    "E": 20,  # Endocrine/Metabolic
+    "L": 5,   # Skin diseases (Lower priority)
+}
+
+# Anti-starvation rate: one priority point per this many minutes waited
+WAIT_MINUTES_PER_POINT = 2
+
+# Fixed origin for the ordering key; keeps the float small and precise
+KEY_EPOCH = datetime(2024, 1, 1)
+
+def calculate_static_score(patient: models.PatientQueue) -> float:
+    """
+    Time-invariant part of the Phrelis Triage Algorithm v2.5:
+    Base ESI + ICD-10 chapter weight + symptom bonuses. Computed once at check-in.
+    """
+    # 1. Base ESI: (6 - Level) * 20
+    score = (6 - patient.base_acuity) * 20
+
+    # 2. ICD-10 Dynamic Weighting [INTEGRATED]
+    if getattr(patient, 'icd_code', None):
+        # Validate using simple_icd_10 library
+        if icd.is_valid_item(patient.icd_code):
+            chapter = patient.icd_code[0].upper()
+            chapter_bonus = ICD_CHAPTER_WEIGHTS.get(chapter, 10)
+            score += chapter_bonus
+
+    # 3. Standard Symptom Bonuses (Fallback/Addition)
+    symptoms_lower = [s.lower() for s in (patient.symptoms or [])]
+    if any("chest pain" in s for s in symptoms_lower): score += 25
+    if any("shortness of breath" in s for s in symptoms_lower): score += 20
+
+    return float(score)
+
+def wait_bonus(check_in_time: datetime, now: datetime = None) -> float:
+    """4. Anti-Starvation (Wait-Time Compensation): +1 point per 2 minutes waited."""
+    wait_time_mins = ((now or datetime.utcnow()) - check_in_time).total_seconds() / 60
+    return float(wait_time_mins // WAIT_MINUTES_PER_POINT)
+
+def calculate_priority_key(static_score: float, check_in_time: datetime) -> float:
+    """
+    Ordering key that never changes while the patient waits.
+    Live score ~ static + (now - check_in) / 2 min, and 'now' is the same for everyone,
+    so ranking by static - check_in / 2 min gives the same order at any moment.
+    """
+    check_in_mins = (check_in_time - KEY_EPOCH).total_seconds() / 60
+    return static_score - check_in_mins / WAIT_MINUTES_PER_POINT
+
+def calculate_priority_index(patient: models.PatientQueue, now: datetime = None) -> float:
+    """
+    Phrelis Triage Algorithm v2.5 (ICD-10 Integrated): live score = static part + wait bonus.
+    """
+    static_score = patient.static_score if patient.static_score is not None else calculate_static_score(patient)
+    return static_score + wait_bonus(patient.check_in_time, now)
+
+def apply_static_scores(patient: models.PatientQueue):
+    """Stores the static score and ordering key on a patient about to be queued."""
+    patient.static_score = calculate_static_score(patient)
+    patient.priority_key = calculate_priority_key(patient.static_score, patient.check_in_time)
+    patient.priority_score = calculate_priority_index(patient, now=patient.check_in_time)
+
+
+CHANGED_KEY = "queue_changed"
+# Server-side dispatch: a room that goes IDLE immediately takes the top waiting patient
+AUTO_DISPATCH = os.getenv("OPD_AUTO_DISPATCH", "1") != "0"
+
+# Service-rate statistics
+DEFAULT_SERVICE_MINUTES = 10.0 # Prior for a room with no completed consultations yet
+SERVICE_EWMA_ALPHA = 0.2 # Weight of the newest consultation in the rolling average
+MIN_SERVICE_MINUTES = 1.0 # Instant 'completes' (mis-clicks) are clamped
+MAX_SERVICE_MINUTES = 120.0 # Longer consultations (rooms left open) are clamped
+
+class QueueVersion:
+    """
+    In-process version counter for the OPD queue and doctor rooms.
+    Bumped after every committed check-in, call and completion; long-poll
+    requests wait on it instead of re-querying on a timer.
+    Per process: matches the single uvicorn process the app runs as. Commits made
+    by another worker process do not move this counter.
+    """
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:8] # Keeps ETags from a previous process from matching
+        self.version = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._changed = None
+
+    def bump(self):
+        with self._lock:
+            self.version += 1
+        if self._loop:
+            # Commits happen on worker threads too; wake waiters on the event loop
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if self._changed:
+            self._changed.set()
+            self._changed = None
+
+    async def wait_for_change(self, since_version: int, timeout: float) -> int:
+        """Returns as soon as the version differs from since_version, or after timeout."""
+        self._loop = asyncio.get_running_loop()
+        if self.version != since_version:
+            return self.version
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        changed = self._changed
+        try:
+            await asyncio.wait_for(changed.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.version
+
+    def etag(self, suffix: str = "") -> str:
+        return f'W/"{self.boot_id}-{self.version}{suffix}"'
+
+queue_version = QueueVersion()
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_queue_version(session):
+    if session.info.pop(CHANGED_KEY, False):
+        queue_version.bump()
+
+@event.listens_for(Session, "after_rollback")
+def _drop_queue_change(session):
+    session.info.pop(CHANGED_KEY, None)
+
+
+class QueueService:
+    @staticmethod
+    def mark_changed(db: Session):
+        """Flags the unit of work as changing the queue or rooms; the version moves when it commits."""
+        db.info[CHANGED_KEY] = True
+
+    @staticmethod
+    def score_clock() -> datetime:
+        """
+        Scoring time truncated to the minute, so a sorted payload is fully determined by
+        (queue version, minute) and can be cached by ETag. The wait bonus only moves every 2 minutes.
+        """
+        return datetime.utcnow().replace(second=0, microsecond=0)
+
+    _capacity_cache = (None, None)
+
+    @staticmethod
+    def service_capacity(db: Session):
+        """
+        (idle rooms, combined service rate in patients/minute) across all doctor rooms.
+        Room stats only move on commits that bump the queue version, so the one small
+        query is cached per version.
+        """
+        version, capacity = QueueService._capacity_cache
+        if version == queue_version.version and capacity is not None:
+            return capacity
+        version = queue_version.version
+        rooms = db.query(models.DoctorRoom.status, models.DoctorRoom.avg_service_minutes).all()
+        idle = sum(1 for r in rooms if r.status == "IDLE")
+        rate = sum(1.0 / (r.avg_service_minutes or DEFAULT_SERVICE_MINUTES) for r in rooms)
+        capacity = (idle, rate)
+        QueueService._capacity_cache = (version, capacity)
+        return capacity
+
+    @staticmethod
+    def estimate_wait(position: int, idle_rooms: int, rate_per_min: float) -> float:
+        """
+        ETA in minutes for the patient at 0-based queue position: the first idle_rooms
+        patients go straight in; after that one room frees up every 1/rate minutes on average.
+        """
+        if rate_per_min <= 0:
+            return None
+        return max(0, position + 1 - idle_rooms) / rate_per_min
+
+    @staticmethod
+    def record_service(db: Session, room_id: str, started: datetime, ended: datetime):
+        """Folds one consultation into the room's rolling average (a single atomic UPDATE)."""
+        minutes = min(max((ended - started).total_seconds() / 60, MIN_SERVICE_MINUTES), MAX_SERVICE_MINUTES)
+        current = func.coalesce(models.DoctorRoom.avg_service_minutes, minutes)
+        db.execute(
+            update(models.DoctorRoom)
+            .where(models.DoctorRoom.id == room_id)
+            .values(
+                avg_service_minutes=current + SERVICE_EWMA_ALPHA * (minutes - current),
+                consults_completed=func.coalesce(models.DoctorRoom.consults_completed, 0) + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def get_sorted_waiting(db: Session, now: datetime = None):
+        """
+        One indexed, read-only query (status, priority_key). Live scores and ETAs are derived
+        here and never written back. Returns (patient dicts in priority order, average live score).
+        """
+        now = now or QueueService.score_clock()
+        idle_rooms, rate = QueueService.service_capacity(db)
+        # Plain column rows: no ORM identity map or change tracking on a hot read path
+        results = db.query(*models.PatientQueue.__table__.columns).filter(
+            models.PatientQueue.status == "WAITING"
+        ).order_by(models.PatientQueue.priority_key.desc()).all()
+
+        rows = []
+        total = 0.0
+        for position, result in enumerate(results):
+            row = dict(result._mapping)
+            row["priority_score"] = row["static_score"] + wait_bonus(row["check_in_time"], now)
+            eta = QueueService.estimate_wait(position, idle_rooms, rate)
+            row["eta_minutes"] = round(eta, 1) if eta is not None else None
+            total += row["priority_score"]
+            rows.append(row)
+
+        avg_score = total / len(rows) if rows else 0
+        return rows, avg_score
+
+    @staticmethod
+    def claim_room(db: Session, room_id: str, patient_id: str) -> bool:
+        """IDLE -> ACTIVE as one conditional UPDATE; False if the room is already taken."""
+        result = db.execute(
+            update(models.DoctorRoom)
+            .where(models.DoctorRoom.id == room_id, models.DoctorRoom.status == "IDLE")
+            .values(status="ACTIVE", current_patient_id=patient_id)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def release_room(db: Session, room_id: str, patient_id: str) -> bool:
+        """ACTIVE -> IDLE, only if the room still holds patient_id (a second 'complete' gets False)."""
+        stmt = update(models.DoctorRoom).where(
+            models.DoctorRoom.id == room_id,
+            models.DoctorRoom.status == "ACTIVE"
+        )
+        if patient_id:
+            stmt = stmt.where(models.DoctorRoom.current_patient_id == patient_id)
+        result = db.execute(
+            stmt.values(status="IDLE", current_patient_id=None).execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def claim_patient(db: Session, patient_id: str, room_id: str, priority_score: float) -> bool:
+        """WAITING -> CONSULTATION as one conditional UPDATE; False if the patient was already called."""
+        result = db.execute(
+            update(models.PatientQueue)
+            .where(models.PatientQueue.id == patient_id, models.PatientQueue.status == "WAITING")
+            .values(
+                status="CONSULTATION",
+                assigned_room=room_id,
+                priority_score=priority_score,
+                consultation_start=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    @staticmethod
+    def dispatch_next(db: Session, room_id: str, batch_size: int = 8):
+        """
+        Assigns the highest-priority waiting patient to an IDLE room inside the caller's
+        unit of work. Returns the patient id, or None if the queue is empty or the room
+        was taken. Concurrent dispatchers never double-assign: both the patient and the
+        room are claimed with conditional UPDATEs, and a lost patient claim moves on to
+        the next candidate.
+        """
+        now = datetime.utcnow()
+        while True:
+            candidates = db.query(
+                models.PatientQueue.id,
+                models.PatientQueue.static_score,
+                models.PatientQueue.check_in_time
+            ).filter(
+                models.PatientQueue.status == "WAITING"
+            ).order_by(models.PatientQueue.priority_key.desc()).limit(batch_size).all()
+            if not candidates:
+                return None
+
+            for c in candidates:
+                # Keep the score the patient was called with for history, as call_to_room does
+                score = (c.static_score or 0.0) + wait_bonus(c.check_in_time, now)
+                if QueueService.claim_patient(db, c.id, room_id, score):
+                    if QueueService.claim_room(db, room_id, c.id):
+                        return c.id
+                    # The room went to a manual call first: put the patient back in line
+                    db.execute(
+                        update(models.PatientQueue)
+                        .where(models.PatientQueue.id == c.id)
+                        .values(status="WAITING", assigned_room=None, priority_score=c.static_score, consultation_start=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                    return None
+            # Every candidate was called elsewhere in the meantime; look again
+
+    @staticmethod
+    def dispatch_idle_rooms(db: Session):
+        """Fills every IDLE room from the queue (after a check-in). Returns [(room_id, patient_id)]."""
+        assigned = []
+        idle_rooms = db.query(models.DoctorRoom.id).filter(
+            models.DoctorRoom.status == "IDLE"
+        ).order_by(models.DoctorRoom.id).all()
+        for room in idle_rooms:
+            patient_id = QueueService.dispatch_next(db, room.id)
+            if patient_id:
+                assigned.append((room.id, patient_id))
+        return assigned
+
+    @staticmethod
+    def backfill_scores(db: Session):
+        """Fills static_score / priority_key for rows queued before those columns existed."""
+        pending = db.query(models.PatientQueue).filter(
+            models.PatientQueue.status == "WAITING",
+            models.PatientQueue.priority_key == None
+        ).all()
+        for p in pending:
+            p.static_score = calculate_static_score(p)
+            p.priority_key = calculate_priority_key(p.static_score, p.check_in_time)
+        if pending:
+            db.commit()
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from urllib.parse import parse_qsl, urlencode
+from table_versions import table_versions
+
+# Cached GET routes: path -> (tables the response is computed from, TTL in seconds).
+# A tracked commit to any of the tables invalidates the route's entries (table_versions);
+# the TTL bounds everything else: time-dependent figures (accrued bed revenue) and writes
+# made by another worker process.
+CACHE_RULES = {
+    "/api/erp/beds": (("beds",), 30),
+    "/api/erp/inventory": (("inventory_items",), 30),
+    "/api/queue/rooms": (("doctor_rooms",), 30),
+    "/api/ambulances": (("ambulances",), 30),
+    "/api/staff": (("staff", "bed_assignments"), 30),
+    "/api/finance/payer-mix": (("patients",), 60),
+    "/api/finance/department-pl": (("patient_ledger", "patients", "beds", "bed_master"), 60),
+}
+MAX_ENTRIES = 512
+
+class CachedResponse:
+    def __init__(self, versions: tuple, expires: float, status: int, headers: list, body: bytes):
+        self.versions = versions
+        self.expires = expires
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def etag(self):
+        return next((value for name, value in self.headers if name == b"etag"), None)
+
+class ResponseCache:
+    """
+    Whole-response cache for the read-heavy GET routes in CACHE_RULES, keyed by path and
+    query parameters. Single-flight: while one request computes a response, identical
+    requests wait for it instead of running the endpoint themselves.
+    Only 200 responses are stored. Per process, like the table versions it is keyed on: a
+    client that wrote through another process can send `Cache-Control: no-cache` to get
+    (and store) a freshly computed response.
+    """
+    def __init__(self, rules: dict = None, max_entries: int = MAX_ENTRIES):
+        self.rules = CACHE_RULES if rules is None else rules
+        self.max_entries = max_entries
+        self.entries = {}   # key -> CachedResponse
+        self.inflight = {}  # key -> (versions, future resolved with the CachedResponse or None)
+
+    def clear(self):
+        self.entries = {}
+
+    def lookup(self, key, versions: tuple):
+        entry = self.entries.get(key)
+        if entry and entry.versions == versions and time.monotonic() < entry.expires:
+            return entry
+        return None
+
+    def store(self, key, entry: CachedResponse):
+        self.entries.pop(key, None)
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.pop(next(iter(self.entries))) # Oldest first
+
+class ResponseCacheMiddleware:
+    """ASGI middleware serving CACHE_RULES routes from a ResponseCache."""
+    def __init__(self, app, cache: ResponseCache = None):
+        self.app = app
+        self.cache = cache or response_cache
+
+    async def __call__(self, scope, receive, send):
+        rule = self.cache.rules.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if rule is None:
+            return await self.app(scope, receive, send)
+        tables, ttl = rule
+        query = urlencode(sorted(parse_qsl(scope.get("query_string", b"").decode(), keep_blank_values=True)))
+        key = (scope["path"], query)
+        # Versions read before computing: a commit landing mid-request leaves a stale key behind
+        versions = table_versions.key(*tables)
+
+        entry = None
+        if b"no-cache" not in dict(scope.get("headers", [])).get(b"cache-control", b""):
+            entry = self.cache.lookup(key, versions)
+            flight = self.cache.inflight.get(key)
+            if entry is None and flight and flight[0] == versions:
+                entry = await asyncio.shield(flight[1])
+        if entry is not None:
+            return await self.replay(scope, send, entry, b"HIT")
+        return await self.compute(scope, receive, send, key, versions, ttl)
+
+    async def compute(self, scope, receive, send, key, versions, ttl):
+        future = asyncio.get_running_loop().create_future()
+        self.cache.inflight[key] = (versions, future)
+        start, chunks = {}, []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+                message = {**message, "headers": [*message.get("headers", []), (b"x-cache", b"MISS")]}
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        entry = None
+        try:
+            await self.app(scope, receive, capture)
+            if start.get("status") == 200:
+                entry = CachedResponse(versions, time.monotonic() + ttl, 200, list(start.get("headers", [])), b"".join(chunks))
+                self.cache.store(key, entry)
+        finally:
+            # Waiters get the response, or None (error, non-200) and compute their own
+            future.set_result(entry)
+            if self.cache.inflight.get(key, (None, None))[1] is future:
+                del self.cache.inflight[key]
+
+    async def replay(self, scope, send, entry: CachedResponse, cache_status: bytes):
+        etag = entry.etag()
+        if etag and dict(scope.get("headers", [])).get(b"if-none-match") == etag:
+            await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", etag), (b"x-cache", cache_status)]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await send({"type": "http.response.start", "status": entry.status, "headers": [*entry.headers, (b"x-cache", cache_status)]})
+        await send({"type": "http.response.body", "body": entry.body})
+
+response_cache = ResponseCache()
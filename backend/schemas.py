@@ -0,0 +1,201 @@
+from datetime import datetime
+from typing import Any, List, Optional, Union
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Response schemas for the hot read endpoints (polled every few seconds by the dashboards).
+# Each schema is the endpoint's response_model (OpenAPI contract) and also decides which
+# columns are read: the endpoint selects exactly those columns as plain rows and returns a
+# FastJSONResponse, so no ORM objects are built and nothing walks the rows with
+# jsonable_encoder or re-validates them. Fields mirror models.py; everything is optional
+# because legacy rows carry NULLs.
+
+class FastJSONResponse(JSONResponse):
+    """orjson rendering (datetimes come out in the same ISO format jsonable_encoder produced)."""
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS, default=str)
+
+def columns(model, schema, fields=None):
+    """The model's table columns for a response schema's fields (or the `fields` subset), in schema order."""
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields if name in table.c and (fields is None or name in fields)]
+
+def sparse_fields(schema, fields: Optional[str]):
+    """
+    Parses a ?fields=id,status,... sparse fieldset against a response schema.
+    None when absent (all fields); "id" is always included. Raises ValueError on unknown names.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - schema.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Valid: {', '.join(schema.model_fields)}")
+    return requested | {"id"}
+
+def csv_values(value: Optional[str]):
+    """?status=DIRTY,CLEANING -> ["DIRTY", "CLEANING"] (None when absent)."""
+    if not value:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+def as_dicts(rows):
+    return [dict(r._mapping) for r in rows]
+
+class BedOut(BaseModel):
+    id: str
+    type: Optional[str] = None
+    unit: Optional[str] = None
+    is_occupied: Optional[bool] = None
+    status: Optional[str] = None
+    color_code: Optional[str] = None # Derived from status in SQL
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    condition: Optional[str] = None
+    surgeon_name: Optional[str] = None
+    vitals_snapshot: Optional[str] = None
+    admission_time: Optional[datetime] = None
+    ventilator_in_use: Optional[bool] = None
+    gender: Optional[str] = None
+    current_state: Optional[str] = None
+    expected_end_time: Optional[datetime] = None
+    cleanup_start_time: Optional[datetime] = None
+    next_surgery_start_time: Optional[datetime] = None
+
+class QueuePatientOut(BaseModel):
+    id: str
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    gender: Optional[str] = None
+    base_acuity: Optional[int] = None
+    vitals: Optional[Any] = None
+    symptoms: Optional[Any] = None
+    icd_code: Optional[str] = None
+    icd_rationale: Optional[str] = None
+    triage_urgency: Optional[str] = None
+    check_in_time: Optional[datetime] = None
+    status: Optional[str] = None
+    priority_score: Optional[float] = None
+    assigned_room: Optional[str] = None
+    static_score: Optional[float] = None
+    priority_key: Optional[float] = None
+    consultation_start: Optional[datetime] = None
+    consultation_end: Optional[datetime] = None
+    eta_minutes: Optional[float] = None # Only on the live sorted queue
+
+class DoctorRoomOut(BaseModel):
+    id: str
+    doctor_name: Optional[str] = None
+    status: Optional[str] = None
+    current_patient_id: Optional[str] = None
+    avg_service_minutes: Optional[float] = None
+    consults_completed: Optional[int] = None
+
+class SortedQueueOut(BaseModel):
+    patients: List[QueuePatientOut]
+    surge_warning: bool
+    average_score: float
+    system_status: str
+    service_rate_per_hour: float
+    auto_dispatch: bool
+    version: int
+    rooms: Optional[List[DoctorRoomOut]] = None # Long-poll responses only
+
+class StaffOut(BaseModel):
+    # hashed_password is deliberately absent
+    id: str
+    name: Optional[str] = None
+    role: Optional[str] = None
+    is_clocked_in: Optional[bool] = None
+    department_id: Optional[str] = None
+
+class BedAssignmentOut(BaseModel):
+    id: int
+    bed_id: Optional[str] = None
+    staff_id: Optional[str] = None
+    assignment_type: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    is_active: Optional[bool] = None
+
+class StaffStatsOut(BaseModel):
+    nurses_on_shift: int
+    doctors_on_shift: int
+
+class StaffOverviewOut(BaseModel):
+    stats: StaffStatsOut
+    staff: List[StaffOut]
+    assignments: List[BedAssignmentOut]
+
+class LedgerEntryOut(BaseModel):
+    id: int
+    patient_id: Optional[str] = None
+    item_type: Optional[str] = None
+    description: Optional[str] = None
+    amount: Optional[float] = None
+    timestamp: Optional[datetime] = None
+
+class BedInfoOut(BaseModel):
+    id: Optional[str] = None
+    category: Optional[str] = None
+    daily_rate: float
+    admission_time: Optional[datetime] = None
+
+class BillingCostsOut(BaseModel):
+    accrued_bed_cost: float
+    resource_charges: float
+    subtotal: float
+    tax: float
+    grand_total: float
+
+class LiveBillingOut(BaseModel):
+    patient_id: str
+    patient_name: Optional[str] = None
+    bed_info: BedInfoOut
+    costs: BillingCostsOut
+    ledger: List[LedgerEntryOut]
+
+class ClinicalRecordOut(BaseModel):
+    id: str
+    esi_level: Optional[int] = None
+    acuity: Optional[str] = None
+    gender: Optional[str] = None
+    symptoms: Optional[Any] = None
+    timestamp: Optional[datetime] = None
+    bed_id: Optional[str] = None
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    condition: Optional[str] = None
+    discharge_time: Optional[datetime] = None
+    assigned_staff: Optional[str] = None
+    payer_type: Optional[str] = None
+    collection_status: Optional[str] = None
+
+class SurgeryRecordOut(BaseModel):
+    id: int
+    room_id: Optional[str] = None
+    patient_name: Optional[str] = None
+    patient_age: Optional[int] = None
+    surgeon_name: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    total_duration_minutes: Optional[int] = None
+    overtime_minutes: Optional[int] = None
+
+class ClinicalHistoryPage(BaseModel):
+    items: List[ClinicalRecordOut]
+    next_cursor: Optional[str] = None
+
+class SurgeryHistoryPage(BaseModel):
+    items: List[SurgeryRecordOut]
+    next_cursor: Optional[str] = None
+
+class OpdHistoryPage(BaseModel):
+    items: List[QueuePatientOut]
+    next_cursor: Optional[str] = None
+
+# History endpoints: one keyset page with limit/cursor, otherwise the whole (streamed) array
+ClinicalHistoryOut = Union[ClinicalHistoryPage, List[ClinicalRecordOut]]
+SurgeryHistoryOut = Union[SurgeryHistoryPage, List[SurgeryRecordOut]]
+OpdHistoryOut = Union[OpdHistoryPage, List[QueuePatientOut]]
@@ -0,0 +1,168 @@
+import argparse
+import heapq
+import json
+import os
+import sqlite3
+import time
+from types import SimpleNamespace
+import numpy as np
+import queue_service
+from queue_service import calculate_static_score
+
+# Path to your database (only needed for --from-db)
+DB_PATH = 'hospital_os.db'
+
+# Synthetic arrival mix (ESI level -> share of arrivals)
+ESI_MIX = {1: 0.02, 2: 0.15, 3: 0.45, 4: 0.28, 5: 0.10}
+ICD_POOL = [None, None, "I21.9", "J44.9", "J18.9", "S06.0", "A09", "E11.9", "G43.9", "L03.9", "R50.9"]
+SYMPTOM_POOL = [(), ("Fever",), ("Chest Pain",), ("Shortness of Breath",), ("Chest Pain", "Shortness of Breath"), ("Rash",)]
+
+# Time-to-provider targets per ESI level (minutes; ESI 1 "immediate" = within a minute)
+ESI_TARGET_MINUTES = {1: 1, 2: 10, 3: 30, 4: 60, 5: 120}
+
+
+def synthetic_arrivals(count: int, rate_per_hour: float, seed: int = 7):
+    """Poisson arrival stream with a typical ESI / ICD / symptom mix."""
+    rng = np.random.default_rng(seed)
+    arrival = np.cumsum(rng.exponential(60.0 / rate_per_hour, count))
+    levels = np.array(list(ESI_MIX))
+    acuity = rng.choice(levels, size=count, p=np.array(list(ESI_MIX.values())))
+    icd_idx = rng.integers(0, len(ICD_POOL), count)
+    symptom_idx = rng.integers(0, len(SYMPTOM_POOL), count)
+    profiles = [(int(a), ICD_POOL[i], SYMPTOM_POOL[s]) for a, i, s in zip(acuity, icd_idx, symptom_idx)]
+    return arrival, acuity, profiles
+
+
+def recorded_arrivals(db_path: str = DB_PATH):
+    """Replays check-ins recorded in patient_queue (arrival minutes relative to the first one)."""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT check_in_time, base_acuity, icd_code, symptoms FROM patient_queue "
+        "WHERE check_in_time IS NOT NULL ORDER BY check_in_time"
+    ).fetchall()
+    conn.close()
+    if not rows:
+        raise SystemExit(f"No recorded check-ins in {db_path}")
+    check_in = np.array([np.datetime64(r[0]) for r in rows])
+    arrival = (check_in - check_in[0]) / np.timedelta64(1, "s") / 60.0
+    acuity = np.array([r[1] or 3 for r in rows])
+    profiles = [(int(r[1] or 3), r[2], tuple(json.loads(r[3]) if r[3] else ())) for r in rows]
+    return arrival, acuity, profiles
+
+
+def static_scores(profiles):
+    """
+    Scores every arrival with the real calculate_static_score. Arrivals share a handful
+    of (ESI, ICD, symptoms) profiles, so each distinct profile is scored once and the
+    result is broadcast back with a NumPy index.
+    """
+    index = {}
+    inverse = np.empty(len(profiles), dtype=np.int64)
+    for n, profile in enumerate(profiles):
+        inverse[n] = index.setdefault(profile, len(index))
+    unique_scores = np.empty(len(index))
+    for (acuity, icd_code, symptoms), i in index.items():
+        patient = SimpleNamespace(base_acuity=acuity, icd_code=icd_code, symptoms=list(symptoms), static_score=None)
+        unique_scores[i] = calculate_static_score(patient)
+    return unique_scores[inverse]
+
+
+def simulate(arrival, static, service, rooms: int):
+    """
+    Event-driven run of the server's policy: whenever a room frees up, it takes the waiting
+    patient with the highest priority_key (static - arrival / WAIT_MINUTES_PER_POINT, the
+    same time-invariant key the live queue is ordered by). Returns consultation start times.
+    """
+    # Vectorized ordering key; heapq is a min-heap, so store it negated
+    neg_key = -(static - arrival / queue_service.WAIT_MINUTES_PER_POINT)
+    n = len(arrival)
+    start = np.empty(n)
+    free = [(0.0, r) for r in range(rooms)]
+    waiting = []
+    i = 0
+    while i < n or waiting:
+        t_free, room = heapq.heappop(free)
+        while i < n and arrival[i] <= t_free:
+            heapq.heappush(waiting, (neg_key[i], i))
+            i += 1
+        if waiting:
+            t = t_free
+        else:
+            # Room sits idle until the next arrival
+            t = arrival[i]
+            heapq.heappush(waiting, (neg_key[i], i))
+            i += 1
+        _, j = heapq.heappop(waiting)
+        start[j] = t
+        heapq.heappush(free, (t + service[j], room))
+    return start
+
+
+def report(arrival, acuity, start, service, rooms: int, starvation_minutes: float):
+    wait = start - arrival
+    end = start + service
+    horizon_hours = (end.max() - arrival.min()) / 60
+    print(f"\n{'ESI':>4} {'count':>8} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>9} {'breach%':>8}")
+    for level in sorted(ESI_TARGET_MINUTES):
+        w = wait[acuity == level]
+        if not len(w):
+            continue
+        p50, p90, p99 = np.percentile(w, [50, 90, 99])
+        breach = np.mean(w > ESI_TARGET_MINUTES[level]) * 100
+        print(f"{level:>4} {len(w):>8} {w.mean():>8.1f} {p50:>8.1f} {p90:>8.1f} {p99:>8.1f} {w.max():>9.1f} {breach:>7.1f}%")
+
+    starved = wait > starvation_minutes
+    print(f"\nStarvation (wait > {starvation_minutes:.0f} min): {int(starved.sum())} patients "
+          f"({starved.mean() * 100:.2f}%), by ESI: "
+          + ", ".join(f"{lvl}={int(starved[acuity == lvl].sum())}" for lvl in sorted(ESI_TARGET_MINUTES)))
+    print(f"Throughput: {len(arrival) / horizon_hours:.1f} patients/hour over {horizon_hours:.1f} h, "
+          f"room utilization {service.sum() / (rooms * horizon_hours * 60) * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline OPD triage policy simulator (times in minutes).")
+    parser.add_argument("--arrivals", type=int, default=100000, help="Synthetic arrivals to generate")
+    parser.add_argument("--rate", type=float, default=20.0, help="Baseline arrivals per hour")
+    parser.add_argument("--scale", type=float, default=10.0, help="Volume multiplier (10 = 10x arrivals per hour)")
+    parser.add_argument("--rooms", type=int, default=40, help="Consultation rooms")
+    parser.add_argument("--service-minutes", type=float, default=10.0, help="Mean consultation length")
+    parser.add_argument("--starvation-minutes", type=float, default=240.0)
+    parser.add_argument("--wait-minutes-per-point", type=float, default=queue_service.WAIT_MINUTES_PER_POINT,
+                        help="Anti-starvation rate to try")
+    parser.add_argument("--weights", default="", help="ICD chapter weights to try, e.g. I=50,J=30")
+    parser.add_argument("--from-db", action="store_true", help="Replay check-ins recorded in hospital_os.db")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # Candidate weights go straight into the real scoring module
+    queue_service.WAIT_MINUTES_PER_POINT = args.wait_minutes_per_point
+    for pair in filter(None, args.weights.split(",")):
+        chapter, weight = pair.split("=")
+        queue_service.ICD_CHAPTER_WEIGHTS[chapter.strip().upper()] = float(weight)
+
+    started = time.perf_counter()
+    if args.from_db:
+        if not os.path.exists(DB_PATH):
+            raise SystemExit(f"Error: Database not found at {DB_PATH}")
+        arrival, acuity, profiles = recorded_arrivals()
+        arrival = arrival / args.scale
+    else:
+        arrival, acuity, profiles = synthetic_arrivals(args.arrivals, args.rate * args.scale, args.seed)
+    static = static_scores(profiles)
+
+    rng = np.random.default_rng(args.seed + 1)
+    # Lognormal consultation lengths with the requested mean
+    sigma = 0.5
+    service = rng.lognormal(np.log(args.service_minutes) - sigma ** 2 / 2, sigma, len(arrival))
+
+    start = simulate(arrival, static, service, args.rooms)
+    elapsed = time.perf_counter() - started
+
+    span_hours = max(arrival[-1] - arrival[0], 1e-9) / 60
+    print(f"Simulated {len(arrival)} arrivals at {len(arrival) / span_hours:.0f}/hour through "
+          f"{args.rooms} rooms in {elapsed:.2f}s")
+    report(arrival, acuity, start, service, args.rooms, args.starvation_minutes)
+
+
+if __name__ == "__main__":
+    main()
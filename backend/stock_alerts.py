@@ -0,0 +1,185 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from event_bus import EventBus
+import models
+
+# Hysteresis: an alert opens below reorder_level (CRITICAL at or below a quarter of it) and
+# only steps down once stock is back above the threshold by CLEAR_FACTOR, so an item
+# hovering around its reorder level does not flap
+CRITICAL_FACTOR = 0.25
+CLEAR_FACTOR = 1.2
+# Unacknowledged open alerts are re-sent, one level higher, after this long in their state
+ESCALATION_MINUTES = {"LOW": 60, "CRITICAL": 15}
+ESCALATION_CHECK_SECONDS = 60
+SEVERITY = {"OK": 0, "LOW": 1, "CRITICAL": 2}
+
+def next_state(state: str, quantity: int, reorder_level: int) -> str:
+    """Alert state for a stock level, given the current state (OK / LOW / CRITICAL)."""
+    critical = reorder_level * CRITICAL_FACTOR
+    if quantity <= critical:
+        return "CRITICAL"
+    if state == "CRITICAL" and quantity <= critical * CLEAR_FACTOR:
+        return "CRITICAL"
+    if quantity < reorder_level:
+        return "LOW"
+    if state != "OK" and quantity < reorder_level * CLEAR_FACTOR:
+        return "LOW"
+    return "OK"
+
+class StockAlertService:
+    """
+    Per-item low-stock alert state (stock_alerts). Events go out only on a state change,
+    not on every deduction of an item that is already low; open alerts are listed from
+    this table without scanning the inventory.
+    Every transition is a conditional UPDATE on the state it was computed from, so two
+    concurrent deductions cannot both announce the same transition.
+    """
+    @staticmethod
+    def evaluate(db: Session, items, now: datetime = None):
+        """
+        Applies stock levels (rows with id, name, quantity, reorder_level) to the alert states
+        and publishes the transitions to the outbox. Does not commit. Returns the transitions.
+        """
+        if not items:
+            return []
+        now = now or datetime.utcnow()
+        alert = models.StockAlert
+        states = dict(db.execute(select(alert.item_id, alert.state).where(alert.item_id.in_([i.id for i in items]))).all())
+        transitions = []
+        for item in items:
+            current = states.get(item.id, "OK")
+            new = next_state(current, item.quantity, item.reorder_level or 0)
+            if new == current:
+                continue
+            if item.id not in states:
+                db.execute(sqlite_insert(alert).values(item_id=item.id, state="OK").on_conflict_do_nothing())
+            if not StockAlertService.transition(db, item, current, new, now):
+                continue
+            transitions.append((item.id, current, new))
+        return transitions
+
+    @staticmethod
+    def transition(db: Session, item, current: str, new: str, now: datetime) -> bool:
+        alert = models.StockAlert
+        values = {"state": new, "quantity": item.quantity, "changed_at": now}
+        if new == "OK":
+            values.update(next_escalation_at=None, acknowledged_at=None)
+        elif SEVERITY[new] > SEVERITY[current]:
+            # Opened or worsened: (re)starts escalation and needs a fresh acknowledgement
+            values.update(escalation_level=0, acknowledged_at=None,
+                          next_escalation_at=now + timedelta(minutes=ESCALATION_MINUTES[new]))
+            if current == "OK":
+                values["opened_at"] = now
+        result = db.execute(update(alert).where(alert.item_id == item.id, alert.state == current).values(**values))
+        if result.rowcount != 1:
+            return False # Another transaction moved this alert first
+
+        if new == "OK":
+            EventBus.publish(db, {
+                "type": "LOW_STOCK_RESOLVED",
+                "item_name": item.name,
+                "remaining": item.quantity,
+                "message": f"{item.name} restocked ({item.quantity} available)."
+            })
+        else:
+            EventBus.publish(db, {
+                "type": "LOW_STOCK_ALERT",
+                "item_name": item.name,
+                "remaining": item.quantity,
+                "state": new,
+                "previous_state": current,
+                "message": f"{'CRITICAL' if new == 'CRITICAL' else 'LOW STOCK'}: {item.name} is low ({item.quantity} remaining)!"
+            })
+        return True
+
+    @staticmethod
+    def sync_all(db: Session):
+        """Evaluates every item once (startup: alerts for stock that was low before this table existed)."""
+        item = models.InventoryItem
+        StockAlertService.evaluate(db, db.execute(select(item.id, item.name, item.quantity, item.reorder_level)).all())
+        db.commit()
+
+    @staticmethod
+    def open_alerts(db: Session):
+        """Open alerts, most severe and oldest first."""
+        alert, item = models.StockAlert, models.InventoryItem
+        rows = db.execute(
+            select(alert.item_id, item.name, alert.state, alert.quantity, item.reorder_level, alert.opened_at,
+                   alert.changed_at, alert.escalation_level, alert.next_escalation_at, alert.acknowledged_at)
+            .join(item, item.id == alert.item_id)
+            .where(alert.state != "OK")
+            .order_by(case((alert.state == "CRITICAL", 0), else_=1), alert.opened_at)
+        ).all()
+        return [dict(r._mapping) for r in rows]
+
+    @staticmethod
+    def acknowledge(db: Session, item_id: int, now: datetime = None) -> bool:
+        """Stops escalation of an open alert until it worsens. False if no alert is open."""
+        alert = models.StockAlert
+        result = db.execute(update(alert).where(alert.item_id == item_id, alert.state != "OK").values(
+            acknowledged_at=now or datetime.utcnow(), next_escalation_at=None
+        ))
+        db.commit()
+        return result.rowcount == 1
+
+    @staticmethod
+    def escalate_due(db: Session, now: datetime = None, item_ids=None) -> int:
+        """
+        Re-sends every open, unacknowledged alert whose escalation time has passed, one level up
+        (only those of `item_ids`, if given).
+        """
+        now = now or datetime.utcnow()
+        alert, item = models.StockAlert, models.InventoryItem
+        conditions = [alert.state != "OK", alert.next_escalation_at <= now]
+        if item_ids is not None:
+            conditions.append(alert.item_id.in_(item_ids))
+        due = db.execute(
+            select(alert.item_id, alert.state, alert.escalation_level, alert.next_escalation_at, alert.quantity, item.name)
+            .join(item, item.id == alert.item_id)
+            .where(*conditions)
+        ).all()
+        escalated = 0
+        for row in due:
+            level = row.escalation_level + 1
+            result = db.execute(update(alert).where(
+                alert.item_id == row.item_id, alert.next_escalation_at == row.next_escalation_at
+            ).values(escalation_level=level, next_escalation_at=now + timedelta(minutes=ESCALATION_MINUTES[row.state])))
+            if result.rowcount != 1:
+                continue
+            EventBus.publish(db, {
+                "type": "LOW_STOCK_ESCALATION",
+                "item_name": row.name,
+                "remaining": row.quantity,
+                "state": row.state,
+                "escalation_level": level,
+                "message": f"ESCALATION {level}: {row.name} still {row.state.lower()} ({row.quantity} remaining), unacknowledged."
+            })
+            escalated += 1
+        db.commit()
+        return escalated
+
+class StockAlertEscalator:
+    """Runs StockAlertService.escalate_due off the event loop every ESCALATION_CHECK_SECONDS."""
+    def __init__(self, interval_seconds: float = ESCALATION_CHECK_SECONDS):
+        self.interval = interval_seconds
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.tick)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stock alert escalation failed, retrying next cycle: {e}")
+            await asyncio.sleep(self.interval)
+
+    def tick(self):
+        db = SessionLocal()
+        try:
+            return StockAlertService.escalate_due(db)
+        finally:
+            db.close()
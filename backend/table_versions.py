@@ -0,0 +1,54 @@
+import threading
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CHANGED_TABLES_KEY = "changed_tables"
+
+class TableVersions:
+    """
+    In-process commit counters per table. A session collects the tables it writes (ORM
+    flushes and bulk insert/update/delete statements) and their counters move when it
+    commits, so a result computed from a set of tables can be memoized on their versions.
+    Per process, like QueueVersion: writes made by another worker process, or through a bare
+    engine connection, do not move these counters; memoized readers also bound their age.
+    """
+    def __init__(self):
+        self.versions = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables):
+        with self._lock:
+            for table in tables:
+                self.versions[table] = self.versions.get(table, 0) + 1
+
+    def key(self, *tables) -> tuple:
+        """Current versions of `tables`: equal keys mean no tracked commit touched them in between."""
+        return tuple(self.versions.get(table, 0) for table in tables)
+
+table_versions = TableVersions()
+
+
+def _changed(session) -> set:
+    return session.info.setdefault(CHANGED_TABLES_KEY, set())
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tables = {obj.__table__.name for obj in chain(session.new, session.dirty, session.deleted) if hasattr(obj, "__table__")}
+    if tables:
+        _changed(session).update(tables)
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _changed(orm_execute_state.session).add(orm_execute_state.statement.table.name)
+
+@event.listens_for(Session, "after_commit")
+def _bump_table_versions(session):
+    tables = session.info.pop(CHANGED_TABLES_KEY, None)
+    if tables:
+        table_versions.bump(tables)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_table_changes(session):
+    session.info.pop(CHANGED_TABLES_KEY, None)
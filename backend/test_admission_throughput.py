@@ -0,0 +1,144 @@
+import requests
+import time
+import uuid
+import pytest
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, delete, select, update
+from database import SessionLocal, engine
+import models
+from billing_utility import BillingListener
+from inventory_service import InventoryService, hour_bucket
+from stock_alerts import StockAlertService
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000"
+NAME_PREFIX = "Throughput"
+MAX_P95_MS = 1000
+BENCH_ADMISSIONS = 50
+
+def free_beds():
+    beds = requests.get(f"{BASE_URL}/api/erp/beds").json()
+    return [b["id"] for b in beds if b["type"] in ["ICU", "ER"] and b["status"] == "AVAILABLE" and not b["is_occupied"]]
+
+def admit(bed_id):
+    start = time.perf_counter()
+    res = requests.post(f"{BASE_URL}/api/erp/admit", json={
+        "bed_id": bed_id,
+        "patient_name": f"{NAME_PREFIX} {bed_id}",
+        "patient_age": 40,
+        "gender": "Male",
+        "condition": "Stable",
+        "staff_id": "N-01"
+    })
+    return res.status_code, (time.perf_counter() - start) * 1000
+
+def turnover(bed_id):
+    requests.post(f"{BASE_URL}/api/erp/discharge/{bed_id}")
+    requests.post(f"{BASE_URL}/api/erp/beds/{bed_id}/cleaning-complete")
+
+def cleanup(conn):
+    # Usage logs and their burn-rate buckets, then the patients with their tasks and ledger rows
+    logs = models.InventoryLog.__table__
+    burn = models.InventoryBurnRate.__table__
+    used = {}
+    for item_id, at, n in conn.execute(select(logs.c.item_id, logs.c.timestamp, logs.c.quantity_used).where(logs.c.patient_name.like(f"{NAME_PREFIX}%"))):
+        key = (hour_bucket(at), item_id)
+        used[key] = used.get(key, 0) + n
+    if used:
+        conn.execute(update(burn).where(burn.c.hour_start == bindparam("hour"), burn.c.item_id == bindparam("item"))
+                     .values(quantity_used=burn.c.quantity_used - bindparam("n")),
+                     [{"hour": h, "item": i, "n": n} for (h, i), n in used.items()])
+    conn.execute(delete(logs).where(logs.c.patient_name.like(f"{NAME_PREFIX}%")))
+    ids = select(models.PatientRecord.id).where(models.PatientRecord.patient_name.like(f"{NAME_PREFIX}%"))
+    conn.execute(delete(models.BillingLedger.__table__).where(models.BillingLedger.patient_id.in_(ids)))
+    conn.execute(delete(models.FinancialLedger.__table__).where(models.FinancialLedger.reference_id.in_(ids)))
+    conn.execute(delete(models.Task.__table__).where(models.Task.patient_id.in_(ids)))
+    conn.execute(delete(models.PatientRecord.__table__).where(models.PatientRecord.patient_name.like(f"{NAME_PREFIX}%")))
+
+@contextmanager
+def restored():
+    """Puts stock, ICU/ER beds and ledgers back as they were: admissions consume real inventory."""
+    items, beds = models.InventoryItem.__table__, models.BedModel.__table__
+    with engine.begin() as conn:
+        cleanup(conn)
+        stock = [dict(r._mapping) for r in conn.execute(select(items.c.id, items.c.quantity))]
+        bed_rows = [dict(r._mapping) for r in conn.execute(select(beds).where(beds.c.type.in_(["ICU", "ER"])))]
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            cleanup(conn)
+            conn.execute(update(items).where(items.c.id == bindparam("item_id")).values(quantity=bindparam("qty")),
+                         [{"item_id": r["id"], "qty": r["quantity"]} for r in stock])
+            columns = [c.name for c in beds.c if c.name != "id"]
+            conn.execute(update(beds).where(beds.c.id == bindparam("bed_id")).values({c: bindparam(c) for c in columns}),
+                         [{"bed_id": r["id"], **{c: r[c] for c in columns}} for r in bed_rows])
+        db = SessionLocal()
+        StockAlertService.evaluate(db, db.execute(select(items.c.id, items.c.name, items.c.quantity, items.c.reorder_level)).all())
+        db.commit()
+        db.close()
+
+@pytest.fixture(scope="module", autouse=True)
+def live_state():
+    with restored():
+        yield
+
+def run_round(label, workers):
+    beds = free_beds()
+    assert beds, f"No free ICU/ER beds for {label}"
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(admit, beds))
+    elapsed = time.perf_counter() - start
+
+    ok = sum(1 for code, _ in results if code == 200)
+    latencies = sorted(ms for _, ms in results)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"   {label}: {ok}/{len(beds)} admitted in {elapsed:.2f}s -> {ok / elapsed:.1f} admissions/sec, p95 {p95:.0f} ms")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(turnover, beds))
+    assert ok == len(beds), f"{len(beds) - ok} admissions to free beds failed"
+    assert p95 < MAX_P95_MS, f"p95 admission latency {p95:.0f} ms"
+
+def test_admission_throughput():
+    print("--- Admission Throughput Benchmark ---")
+    run_round("Sequential (1 client)", 1)
+    run_round("Concurrent (8 clients)", 8)
+
+def admission_writes(db, commit_each_step):
+    # The writes of one ICU admission; the old endpoint committed after each step
+    step = db.commit if commit_each_step else db.flush
+    patient_id = str(uuid.uuid4())
+    name = f"{NAME_PREFIX} bench {patient_id[:8]}"
+    db.add(models.PatientRecord(id=patient_id, esi_level=3, acuity="Direct Admission", symptoms=["Stable"],
+                                timestamp=datetime.utcnow(), patient_name=name, condition="Stable"))
+    step()
+    db.add(models.Task(patient_id=patient_id, description="Routine Ward Rounds", due_time=datetime.utcnow() + timedelta(hours=4), priority="Low"))
+    step()
+    for item_name in ["Ventilator Circuit", "Sedation Kit"]:
+        InventoryService.deduct_stock(db, item_name, 1, patient_name=name, condition="Stable", patient_id=patient_id)
+        step()
+    BillingListener.log_event(db, patient_id, "CLINICAL", "Admission/Registration Fee (ICU)", 500.0)
+    db.commit()
+
+def test_single_commit_vs_per_step():
+    print(f"--- Baseline: {BENCH_ADMISSIONS} admissions, commit per step (before) vs one unit of work (now) ---")
+    db = SessionLocal()
+    timings = {}
+    for label, commit_each_step in [("commit per step", True), ("one commit", False)]:
+        start = time.perf_counter()
+        for _ in range(BENCH_ADMISSIONS):
+            admission_writes(db, commit_each_step)
+        timings[label] = (time.perf_counter() - start) / BENCH_ADMISSIONS * 1000
+        print(f"   {label:<16} {timings[label]:6.2f} ms per admission")
+    db.close()
+    assert timings["one commit"] < timings["commit per step"], "Single unit of work should be faster"
+
+if __name__ == "__main__":
+    with restored():
+        test_admission_throughput()
+        test_single_commit_vs_per_step()
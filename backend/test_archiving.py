@@ -0,0 +1,158 @@
+import requests
+import time
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, insert, delete
+from database import SessionLocal, engine
+import models
+from archive_service import ArchiveService, ARCHIVE_TABLES
+from time_filters import HOSPITAL_TZ, day_bounds
+from testing_utils import seeded, seeding
+
+# Run from the server's working directory so both share hospital_os.db (and hospital_archive.db)
+BASE_URL = "http://localhost:8000/api"
+BATCH_TAG = "Archive Test"
+OLD_PATIENTS = 200000
+RECENT_PATIENTS = 20000
+
+def seed(chunk=50000):
+    print(f"Seeding {OLD_PATIENTS + RECENT_PATIENTS:,} patients, 20,000 events, 10,001 tasks...")
+    now = datetime.utcnow()
+    old_day = now - timedelta(days=150)
+    # A local day fully covered by the old admissions, with some still-admitted patients on it
+    local_day = old_day.replace(tzinfo=timezone.utc).astimezone(HOSPITAL_TZ).date() + timedelta(days=2)
+    day_start = day_bounds(local_day)[0]
+    table = models.PatientRecord.__table__
+    with engine.begin() as conn:
+        # Discharged long ago: from 150 days back, 10 admissions a minute
+        for offset in range(0, OLD_PATIENTS, chunk):
+            conn.execute(table.insert(), [{
+                "id": str(uuid.uuid4()), "esi_level": 3, "acuity": "Stable", "symptoms": [],
+                "patient_name": f"{BATCH_TAG} {i}", "payer_type": "Insurance",
+                "timestamp": old_day + timedelta(seconds=6 * i),
+                "discharge_time": old_day + timedelta(seconds=6 * i, days=2)
+            } for i in range(offset, min(offset + chunk, OLD_PATIENTS))])
+        # Recently discharged or still admitted (some admitted on the same old day)
+        conn.execute(table.insert(), [{
+            "id": str(uuid.uuid4()), "esi_level": 2, "acuity": "Critical", "symptoms": [],
+            "patient_name": f"{BATCH_TAG} recent {i}", "payer_type": "Cash",
+            "timestamp": day_start + timedelta(seconds=30 + i * 60) if i < 50 else now - timedelta(days=3),
+            "discharge_time": None if i < 50 else now - timedelta(days=1)
+        } for i in range(RECENT_PATIENTS)])
+        conn.execute(models.Event.__table__.insert(), [
+            {"patient_id": None, "event_type": "TEST", "details": BATCH_TAG, "timestamp": old_day + timedelta(minutes=i)}
+            for i in range(20000)
+        ])
+        conn.execute(models.Task.__table__.insert(), [
+            {"bed_id": None, "title": BATCH_TAG, "description": BATCH_TAG, "status": "Completed" if i % 2 else "Cancelled",
+             "due_time": old_day, "completed_at": old_day if i % 2 else None, "priority": "Low"}
+            for i in range(10000)
+        ] + [{"bed_id": None, "title": BATCH_TAG, "description": BATCH_TAG, "status": "Pending", "due_time": old_day, "completed_at": None, "priority": "Low"}])
+    return old_day, local_day
+
+def cleanup():
+    with engine.begin() as conn:
+        for table in (models.PatientRecord.__table__, ARCHIVE_TABLES["patients"]):
+            conn.execute(delete(table).where(table.c.patient_name.like(f"{BATCH_TAG}%")))
+        for table in (models.Event.__table__, ARCHIVE_TABLES["events"]):
+            conn.execute(delete(table).where(table.c.details == BATCH_TAG))
+        for table in (models.Task.__table__, ARCHIVE_TABLES["tasks"]):
+            conn.execute(delete(table).where(table.c.title == BATCH_TAG))
+
+batch = seeded(seed, cleanup, "batch")
+
+@pytest.fixture
+def old_day(batch):
+    return batch[0]
+
+@pytest.fixture
+def local_day(batch):
+    return batch[1]
+
+def count(db, table, *conditions):
+    return db.execute(select(func.count()).select_from(table).where(*conditions)).scalar()
+
+def timed_dashboard_scan(db):
+    # The shape of the dashboard / finance scans: aggregate over the whole patients table
+    start = time.perf_counter()
+    for _ in range(5):
+        db.query(models.PatientRecord.payer_type, func.count(models.PatientRecord.id)).group_by(models.PatientRecord.payer_type).all()
+        db.query(func.count(models.PatientRecord.id)).filter(models.PatientRecord.discharge_time == None).scalar()
+    return (time.perf_counter() - start) / 5 * 1000
+
+def test_archive_run():
+    print("--- Archiver Pass ---")
+    db = SessionLocal()
+    hot = models.PatientRecord.__table__
+    before_rows = count(db, hot)
+    before_ms = timed_dashboard_scan(db)
+    mix_before = {m["name"]: m["value"] for m in requests.get(f"{BASE_URL}/finance/payer-mix", headers={"Cache-Control": "no-cache"}).json()}
+
+    start = time.perf_counter()
+    moved = ArchiveService.run()
+    elapsed = time.perf_counter() - start
+    print(f"   Moved {moved} in {elapsed:.1f}s")
+    assert moved["patients"] >= OLD_PATIENTS and moved["events"] >= 20000 and moved["tasks"] >= 10000
+
+    after_ms = timed_dashboard_scan(db)
+    print(f"   Hot patients {before_rows:,} -> {count(db, hot):,}; dashboard scans {before_ms:.1f} ms -> {after_ms:.1f} ms")
+    assert count(db, hot, hot.c.patient_name.like(f"{BATCH_TAG} recent%")) == RECENT_PATIENTS, "Recent patients must stay hot"
+    assert count(db, models.Task.__table__, models.Task.title == BATCH_TAG) == 1, "Pending task must stay hot"
+    assert ArchiveService.run()["patients"] == 0, "Second pass should find nothing to move"
+
+    mix_after = {m["name"]: m["value"] for m in requests.get(f"{BASE_URL}/finance/payer-mix", headers={"Cache-Control": "no-cache"}).json()}
+    assert mix_after == mix_before, "Payer mix changed after archiving"
+    db.close()
+    print("   [PASS] Closed records moved; open ones stay hot; payer mix unchanged.")
+
+def test_transparent_history(local_day):
+    print("--- History Across Hot + Archive ---")
+    res = requests.get(f"{BASE_URL}/history/day/{local_day}", params={"format": "ndjson"})
+    rows = res.text.splitlines()
+    names = [r for r in rows if "recent" in r]
+    assert len(rows) == 14400 + len(names), f"Expected a full archived day plus hot rows, got {len(rows)}"
+    assert names, "Hot patients admitted that day are missing"
+
+    # Keyset pages walk across both tables without gaps or repeats
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 500}
+        if cursor:
+            params["cursor"] = cursor
+        page = requests.get(f"{BASE_URL}/history/day/{local_day}", params=params).json()
+        ids += [p["id"] for p in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert len(ids) == len(rows) == len(set(ids))
+    print(f"   [PASS] {local_day}: {len(rows)} rows ({len(names)} hot), paged without gaps.")
+
+    export = requests.get(f"{BASE_URL}/export/patients", params={"format": "ndjson", "start_date": local_day, "end_date": local_day})
+    assert len(export.text.splitlines()) == len(rows)
+    print("   [PASS] Export covers the same rows.")
+
+def test_interrupted_move(old_day):
+    print("--- Interrupted Move (copied, not yet deleted) ---")
+    db = SessionLocal()
+    hot, archived = models.PatientRecord.__table__, ARCHIVE_TABLES["patients"]
+    pid = str(uuid.uuid4())
+    row = {"id": pid, "esi_level": 3, "acuity": "Stable", "symptoms": [], "patient_name": f"{BATCH_TAG} crash",
+           "timestamp": old_day, "discharge_time": old_day + timedelta(days=1)}
+    db.execute(insert(hot).values(**row))
+    db.execute(insert(archived).values(**row))
+    db.commit()
+
+    local_day = old_day.replace(tzinfo=timezone.utc).astimezone(HOSPITAL_TZ).date()
+    rows = requests.get(f"{BASE_URL}/history/day/{local_day}", params={"format": "ndjson"}).text
+    assert rows.count(pid) == 1, "Row in both tables must be read once"
+    assert ArchiveService.run()["patients"] == 1
+    assert count(db, hot, hot.c.id == pid) == 0 and count(db, archived, archived.c.id == pid) == 1
+    db.close()
+    print("   [PASS] Duplicate read once; next pass completes the move.")
+
+if __name__ == "__main__":
+    with seeding(seed, cleanup) as (old_day, local_day):
+        test_archive_run()
+        test_transparent_history(local_day)
+        test_interrupted_move(old_day)
@@ -0,0 +1,83 @@
+import requests
+import statistics
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, text
+from database import engine
+import models
+from testing_utils import seeded, seeding
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/erp/beds"
+# Beds are seeded from this process, which the server's response cache cannot see; this also
+# measures the endpoint itself rather than cache hits
+NO_CACHE = {"Cache-Control": "no-cache"}
+BED_PREFIX = "BOARD-"
+UNITS = 20
+BEDS_PER_UNIT = 100 # 2,000-bed hospital
+STATUSES = ["AVAILABLE", "OCCUPIED", "OCCUPIED", "DIRTY", "CLEANING"]
+
+def seed():
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(models.BedModel.__table__.insert(), [{
+            "id": f"{BED_PREFIX}{u}-{i}", "type": "Wards", "unit": f"Board Unit {u}",
+            "status": STATUSES[i % len(STATUSES)], "is_occupied": STATUSES[i % len(STATUSES)] == "OCCUPIED",
+            "patient_name": f"Board Patient {u}-{i}", "patient_age": 30 + i % 50, "condition": "Stable",
+            "surgeon_name": "Dr. Board", "vitals_snapshot": '{"hr": 88, "bp": "120/80", "spo2": 97, "rr": 16, "temp": 37.1}',
+            "admission_time": now - timedelta(hours=i), "ventilator_in_use": False, "gender": "Any",
+            "current_state": STATUSES[i % len(STATUSES)], "expected_end_time": now, "cleanup_start_time": now,
+            "next_surgery_start_time": now
+        } for u in range(UNITS) for i in range(BEDS_PER_UNIT)])
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(delete(models.BedModel.__table__).where(models.BedModel.id.like(f"{BED_PREFIX}%")))
+
+board = seeded(seed, cleanup, "board")
+
+def measure(label, params, rounds=30):
+    requests.get(BASE_URL, params=params, headers=NO_CACHE) # Warm-up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        res = requests.get(BASE_URL, params=params, headers=NO_CACHE)
+        timings.append((time.perf_counter() - start) * 1000)
+    assert res.status_code == 200, res.text
+    print(f"   {label:<46} {len(res.json()):5} beds {len(res.content) / 1024:8.1f} KB   p50 {statistics.median(timings):6.2f} ms")
+    return res
+
+def test_payload_and_latency():
+    print(f"--- Bed Board: {UNITS * BEDS_PER_UNIT:,} beds ---")
+    full = measure("full board", {})
+    tablet = measure("one unit, fields=id,status,color_code", {"unit": "Board Unit 3", "fields": "id,status,color_code"})
+    assert len(tablet.content) * 50 < len(full.content), "Sparse unit view should be a small fraction of the full board"
+    print(f"   -> {len(full.content) / len(tablet.content):.0f}x smaller per tablet poll")
+
+def test_filters_and_projection():
+    print("--- Filters / Sparse Fieldsets ---")
+    beds = requests.get(BASE_URL, params={"unit": "Board Unit 3", "fields": "status,color_code"}, headers=NO_CACHE).json()
+    assert len(beds) == BEDS_PER_UNIT
+    assert all(set(b) == {"id", "status", "color_code"} for b in beds), "id is always included, nothing else"
+    assert all(b["color_code"] == models.BED_STATUS_COLORS[b["status"]] for b in beds)
+
+    dirty = requests.get(BASE_URL, params={"unit": "Board Unit 3,Board Unit 4", "status": "DIRTY,CLEANING"}, headers=NO_CACHE).json()
+    assert len(dirty) == 2 * BEDS_PER_UNIT * 2 // len(STATUSES)
+    assert {b["status"] for b in dirty} == {"DIRTY", "CLEANING"} and "vitals_snapshot" in dirty[0]
+
+    assert requests.get(BASE_URL, params={"type": "Wards", "unit": "No Such Unit"}, headers=NO_CACHE).json() == []
+    res = requests.get(BASE_URL, params={"fields": "id,hashed_password"}, headers=NO_CACHE)
+    assert res.status_code == 400 and "hashed_password" in res.json()["detail"]
+    print("   [PASS] unit/status filters, projection, color_code and unknown-field rejection.")
+
+def test_index_used():
+    with engine.connect() as conn:
+        plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT id, status FROM beds WHERE unit IN ('Board Unit 3') AND status IN ('DIRTY')")).all()
+    assert any("ix_beds_unit_status" in str(row) for row in plan), plan
+    print("   [PASS] Unit/status filter uses ix_beds_unit_status.")
+
+if __name__ == "__main__":
+    with seeding(seed, cleanup):
+        test_payload_and_latency()
+        test_filters_and_projection()
+        test_index_used()
@@ -0,0 +1,157 @@
+import requests
+import time
+import csv
+import io
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from database import SessionLocal, engine
+import models
+from time_filters import hospital_today
+from testing_utils import seeded, seeding
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/export"
+BATCH_TAG = "Export Audit"
+ROWS = 500000
+
+def seed_ledger(count=ROWS, chunk=50000):
+    # One entry a minute, ending now, so date ranges have something to cut
+    print(f"Seeding {count:,} ledger entries...")
+    table = models.BillingLedger.__table__
+    start = datetime.utcnow() - timedelta(minutes=count)
+    with engine.begin() as conn:
+        for offset in range(0, count, chunk):
+            conn.execute(table.insert(), [{
+                "patient_id": None,
+                "item_type": "PHARMACY",
+                "description": BATCH_TAG,
+                "amount": 100.0 + i % 50,
+                "timestamp": start + timedelta(minutes=i)
+            } for i in range(offset, min(offset + chunk, count))])
+    return count
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(models.BillingLedger.__table__.delete().where(models.BillingLedger.description == BATCH_TAG))
+
+# Exports cover the whole ledger: the assertions count only this batch's rows
+total = seeded(seed_ledger, cleanup, "total")
+
+def batch_rows(rows):
+    return [r for r in rows if r["description"] == BATCH_TAG]
+
+def server_rss_mb():
+    """Server RSS from /proc, when its pid is known (SERVER_PID or a server.pid file); else None."""
+    pid = os.getenv("SERVER_PID")
+    if not pid and os.path.exists("server.pid"):
+        with open("server.pid") as f:
+            pid = f.read().strip()
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, TypeError):
+        return None
+
+def test_full_export_formats(total):
+    print("--- Full Export (CSV / NDJSON / Parquet) ---")
+    rss_before = server_rss_mb()
+    start = time.perf_counter()
+    res = requests.get(f"{BASE_URL}/patient_ledger", params={"format": "csv"})
+    elapsed = time.perf_counter() - start
+    rows = batch_rows(csv.DictReader(io.StringIO(res.text)))
+    assert res.status_code == 200 and len(rows) == total, f"CSV rows: {len(rows)} != {total}"
+    rss = f", server RSS +{server_rss_mb() - rss_before:.0f} MB" if rss_before is not None else ""
+    print(f"   CSV: {len(rows):,} rows, {len(res.content) / 1e6:.1f} MB in {elapsed:.1f}s "
+          f"({len(rows) / elapsed:,.0f} rows/s){rss}")
+
+    start = time.perf_counter()
+    res = requests.get(f"{BASE_URL}/patient_ledger", params={"format": "ndjson"})
+    lines = batch_rows(json.loads(line) for line in res.text.splitlines())
+    assert len(lines) == total
+    print(f"   NDJSON: {len(lines):,} rows in {time.perf_counter() - start:.1f}s")
+
+    import pyarrow.parquet as pq
+    start = time.perf_counter()
+    res = requests.get(f"{BASE_URL}/patient_ledger", params={"format": "parquet"})
+    parquet = pq.read_table(io.BytesIO(res.content))
+    seeded_rows = parquet.column("description").to_pylist().count(BATCH_TAG)
+    assert seeded_rows == total and str(parquet.schema.field("timestamp").type) == "timestamp[us]"
+    print(f"   Parquet: {seeded_rows:,} rows, {len(res.content) / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
+    print("   [PASS] All formats export every row.")
+
+def test_date_range():
+    print("--- Date Range (IST days, inclusive) ---")
+    today = hospital_today()
+    res = requests.get(f"{BASE_URL}/patient_ledger", params={"format": "ndjson", "start_date": today - timedelta(days=1), "end_date": today})
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [r["timestamp"] for r in rows] == sorted(r["timestamp"] for r in rows), "Export is not oldest first"
+    # Other ledger rows written today fall in the range too: count only this batch (one a minute)
+    stamps = [r["timestamp"] for r in batch_rows(rows)]
+    assert 1440 <= len(stamps) <= 2 * 1440, f"Two local days should hold at most 2880 minutes, got {len(stamps)}"
+    print(f"   [PASS] Yesterday + today: {len(stamps)} seeded rows ({len(rows)} in all), in order.")
+
+def test_resumable_batches(total, batch=100000):
+    print(f"--- Batched Export (limit={batch:,}, X-Next-Cursor) ---")
+    cursor, seen, batches = None, set(), 0
+    while True:
+        params = {"format": "ndjson", "limit": batch}
+        if cursor:
+            params["cursor"] = cursor
+        res = requests.get(f"{BASE_URL}/patient_ledger", params=params)
+        ids = [r["id"] for r in batch_rows(json.loads(line) for line in res.text.splitlines())]
+        assert not seen.intersection(ids), "Batches overlap"
+        seen.update(ids)
+        batches += 1
+        cursor = res.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        # A retried batch returns exactly the same rows
+        if batches == 2:
+            again = requests.get(f"{BASE_URL}/patient_ledger", params={"format": "ndjson", "limit": 10, "cursor": cursor})
+            assert again.headers.get("X-Next-Cursor")
+    assert len(seen) == total, f"Batches covered {len(seen)} of {total}"
+    assert requests.get(f"{BASE_URL}/patient_ledger", params={"cursor": "garbage", "limit": 5}).status_code == 400
+    print(f"   [PASS] {batches} batches, {len(seen):,} rows, no overlap or gaps.")
+
+def test_writes_during_export():
+    print("--- Clinical Writes While an Export Streams ---")
+    # A slow consumer keeps the export's read open for several seconds
+    def slow_download():
+        with requests.get(f"{BASE_URL}/patient_ledger", params={"format": "csv"}, stream=True) as res:
+            for _ in res.iter_content(chunk_size=64 * 1024):
+                time.sleep(0.005)
+
+    reader = threading.Thread(target=slow_download)
+    reader.start()
+    time.sleep(1)
+
+    db = SessionLocal()
+    write_ms, api_ms = [], []
+    for _ in range(20):
+        start = time.perf_counter()
+        db.add(models.BillingLedger(item_type="TEST", description=BATCH_TAG, amount=1.0))
+        db.commit()
+        write_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        assert requests.get("http://localhost:8000/api/queue/rooms").status_code == 200
+        api_ms.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    db.close()
+    still_streaming = reader.is_alive()
+    reader.join()
+    print(f"   Ledger commit max {max(write_ms):.1f} ms, API request max {max(api_ms):.1f} ms "
+          f"(export still streaming: {still_streaming})")
+    assert max(write_ms) < 500 and max(api_ms) < 500, "Export blocked clinical traffic"
+    print("   [PASS] Writes and API calls are not blocked by a running export.")
+
+if __name__ == "__main__":
+    with seeding(seed_ledger, cleanup) as total:
+        test_full_export_formats(total)
+        test_date_range()
+        test_resumable_batches(total)
+        test_writes_during_export()
@@ -0,0 +1,140 @@
+import requests
+import time
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from database import SessionLocal, engine
+import models
+from billing_utility import BillingListener
+from inventory_service import InventoryService, get_consumption_rules
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api"
+# ICU admission items (plus PPE for infectious conditions), stocked for the tests and put back afterwards
+ICU_ITEMS = ["Ventilator Circuit", "Sedation Kit", "PPE Kit"]
+
+@contextmanager
+def stocked(names, quantity=50):
+    # Known stock whatever earlier runs left in the shared DB: an empty item is neither deducted nor billed
+    item = models.InventoryItem
+    db = SessionLocal()
+    original = dict(db.query(item.name, item.quantity).filter(item.name.in_(names)).all())
+    db.query(item).filter(item.name.in_(names)).update({"quantity": quantity}, synchronize_session=False)
+    db.commit()
+    try:
+        yield
+    finally:
+        for name, qty in original.items():
+            db.query(item).filter(item.name == name).update({"quantity": qty}, synchronize_session=False)
+        db.commit()
+        db.close()
+
+@pytest.fixture(scope="module", autouse=True)
+def icu_stock():
+    with stocked(ICU_ITEMS):
+        yield
+
+def legacy_items(context, condition):
+    # The if/elif rules record_usage used to hard-code
+    items = []
+    if context == "ICU":
+        items.extend([("Ventilator Circuit", 1), ("Sedation Kit", 1)])
+    elif context == "ER":
+        items.extend([("Trauma IV Kit", 1), ("Saline Pack", 1)])
+    elif context.startswith("Surgery"):
+        items.extend([("OR Prep Kit", 1), ("Sterile Gowns", 2)])
+    elif context == "OPD_Consultation":
+        items.extend([("Gloves", 2), ("Tongue Depressor", 1)])
+    if "infec" in condition.lower() or "isolation" in condition.lower():
+        items.append(("PPE Kit", 1))
+    if context == "Cleaning":
+        items.extend([("Sanitization Kit", 1), ("Bed Linens", 1)])
+    return items
+
+def legacy_record_usage(db, context, patient_name, bed_id, condition, patient_id):
+    # One item lookup, patient lookup and billing write per item, as deduct_stock used to do
+    for item_name, qty in legacy_items(context, condition):
+        item = db.query(models.InventoryItem).filter(models.InventoryItem.name == item_name).first()
+        used = min(item.quantity, qty)
+        item.quantity -= used
+        db.add(models.InventoryLog(item_id=item.id, patient_name=patient_name, bed_id=bed_id, quantity_used=used, reason=condition))
+        pid = patient_id
+        if bed_id and not pid:
+            patient = db.query(models.PatientRecord).filter(models.PatientRecord.bed_id == bed_id).first()
+            pid = patient.id if patient else None
+        if pid:
+            BillingListener.log_event(db, pid, "PHARMACY", f"Inventory: {item_name} (x{used})", item.unit_price * used)
+
+def count_statements(fn):
+    statements = []
+    listener = lambda conn, cursor, statement, params, context, executemany: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        fn(db)
+        db.flush()
+        elapsed = (time.perf_counter() - start) * 1000
+        db.rollback()
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", listener)
+    return len(statements), elapsed
+
+def test_rules_match_legacy():
+    print("--- Consumption Rules (data) vs Hard-coded Branches ---")
+    db = SessionLocal()
+    rules = get_consumption_rules(db)
+    for context in ["ICU", "ER", "Wards", "Surgery", "Surgery Start", "OPD_Consultation", "Cleaning"]:
+        for condition in ["", "Stable", "Severe Pneumonia (Infectious)", "Contact ISOLATION", "infection, isolation ward"]:
+            expected = {}
+            for name, qty in legacy_items(context, condition):
+                expected[rules.item_ids[name]] = expected.get(rules.item_ids[name], 0) + qty
+            assert rules.items_for(context, condition) == expected, (context, condition)
+    db.close()
+    print("   [PASS] Seeded rules reproduce every branch of the old if/elif chain.")
+
+def test_batched_statements():
+    print("--- Statements per Clinical Event (ICU, infectious, bed lookup) ---")
+    db = SessionLocal()
+    bed_id = db.query(models.BedModel.id).filter(models.BedModel.type == "ICU").first().id
+    db.close()
+    args = ("Batch Test", bed_id, "Severe Pneumonia (Infectious)", None)
+    legacy_n, legacy_ms = count_statements(lambda db: legacy_record_usage(db, "ICU", *args))
+    batched_n, batched_ms = count_statements(lambda db: InventoryService.record_usage(
+        db, "ICU", {"patient_name": args[0], "bed_id": args[1], "condition": args[2]}))
+    print(f"   Per-item: {legacy_n} statements ({legacy_ms:.1f} ms) | batched: {batched_n} statements ({batched_ms:.1f} ms)")
+    assert batched_n < legacy_n
+
+def test_admission_billing():
+    print("--- Admission: Stock, Logs, Itemised Ledger, One Revenue Entry ---")
+    db = SessionLocal()
+    stock = dict(db.query(models.InventoryItem.name, models.InventoryItem.quantity).all())
+    bed = requests.get(f"{BASE_URL}/erp/beds", params={"type": "ICU", "status": "AVAILABLE", "fields": "id"}).json()[0]
+    res = requests.post(f"{BASE_URL}/erp/admit", json={
+        "patient_name": "Rules Test", "patient_age": 50, "gender": "M",
+        "condition": "Post-op Observation", "staff_id": "N-01", "bed_id": bed["id"]
+    })
+    assert res.status_code == 200, res.text
+    patient_id = res.json()["patient_id"]
+
+    db.expire_all()
+    after = dict(db.query(models.InventoryItem.name, models.InventoryItem.quantity).all())
+    for name in ["Ventilator Circuit", "Sedation Kit"]:
+        assert after[name] == stock[name] - 1, name
+    ledger = requests.get(f"{BASE_URL}/billing/live/{patient_id}").json()["ledger"]
+    charges = [l for l in ledger if l["item_type"] == "PHARMACY"]
+    assert len(charges) == 2, "Patient ledger stays itemised"
+    revenue = db.query(models.FinancialLedger).filter(
+        models.FinancialLedger.reference_id == patient_id, models.FinancialLedger.description.like("Revenue: Inventory:%")
+    ).all()
+    assert len(revenue) == 1 and abs(revenue[0].amount - sum(c["amount"] for c in charges)) < 1e-6
+    requests.post(f"{BASE_URL}/erp/discharge/{bed['id']}")
+    db.close()
+    print("   [PASS] Two items deducted, billed as two ledger lines and one revenue entry.")
+
+if __name__ == "__main__":
+    with stocked(ICU_ITEMS):
+        test_rules_match_legacy()
+        test_batched_statements()
+        test_admission_billing()
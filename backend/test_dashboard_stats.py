@@ -0,0 +1,126 @@
+import requests
+import statistics
+import threading
+import time
+from sqlalchemy import update
+import models
+from dashboard_service import DashboardService
+from hospital_state import HospitalState, hospital_state
+from testing_utils import memory_session, statements, timed
+
+STATS_URL = "http://localhost:8000/api/dashboard/stats"
+BASE_URL = "http://localhost:8000/api"
+
+def make_session(n_beds):
+    engine, db = memory_session(models.BedModel, models.PatientQueue, models.Ambulance, models.Staff)
+    units = ["ER", "ICU", "Wards", "Surgery"]
+    db.add_all(models.BedModel(
+        id=f"BED-{i}", type=units[i % 4], is_occupied=i % 3 == 0, status="OCCUPIED" if i % 3 == 0 else "AVAILABLE",
+        ventilator_in_use=i % 7 == 0
+    ) for i in range(n_beds))
+    db.add_all(models.Ambulance(id=f"AMB-{i}", status="IDLE" if i % 2 else "EN_ROUTE") for i in range(5))
+    db.add_all(models.Staff(id=f"D-{i}", name=f"Doctor {i}", role="Doctor", is_clocked_in=i % 2 == 0) for i in range(8))
+    db.commit()
+    return engine, db
+
+def legacy_stats(db):
+    # The per-figure COUNT queries the endpoint used to run
+    def get_count(unit_type):
+        return db.query(models.BedModel).filter(
+            models.BedModel.type == unit_type, (models.BedModel.is_occupied == True) | (models.BedModel.status == "OCCUPIED")
+        ).count()
+    occupancy = {unit: get_count(unit) for unit in ["ER", "ICU", "Wards", "Surgery"]}
+    total_beds = db.query(models.BedModel).count() or 190
+    vents = db.query(models.BedModel).filter(models.BedModel.ventilator_in_use == True).count()
+    amb_total = db.query(models.Ambulance).count()
+    amb_avail = db.query(models.Ambulance).filter(models.Ambulance.status == "IDLE").count()
+    doctors = db.query(models.Staff).filter(models.Staff.role == "Doctor", models.Staff.is_clocked_in == True).count()
+    total = sum(occupancy.values())
+    return {
+        "staff_ratio": f"1:{round(total / doctors, 1)}" if doctors else "N/A",
+        "occupancy": occupancy,
+        "bed_stats": {"total": total_beds, "occupied": total, "available": total_beds - total},
+        "resources": {"Ventilators": {"total": 20, "in_use": vents}, "Ambulances": {"total": amb_total, "available": amb_avail}}
+    }
+
+def test_matches_legacy_and_scales():
+    print("--- Snapshot vs Per-figure COUNTs ---")
+    for n_beds in (200, 2000, 20000):
+        engine, db = make_session(n_beds)
+        hospital_state.invalidate() # A new private database behind the process-wide snapshot
+        cold_n, stats = statements(engine, lambda: DashboardService.get_stats(db))
+        assert stats == legacy_stats(db)
+        legacy_n, _ = statements(engine, lambda: legacy_stats(db))
+        warm_n, _ = statements(engine, lambda: DashboardService.get_stats(db))
+        legacy_ms, _ = timed(lambda: legacy_stats(db))
+        cold_ms, _ = timed(lambda: DashboardService.from_snapshot(HospitalState().snapshot(db)))
+        warm_ms, _ = timed(lambda: DashboardService.get_stats(db))
+        print(f"   {n_beds:6} beds | legacy {legacy_n} stmts {legacy_ms:6.2f} ms | cold snapshot {cold_n} stmts {cold_ms:6.2f} ms | warm {warm_n} stmts {warm_ms:.3f} ms")
+        assert cold_n == 4 and warm_n == 0
+        db.close()
+    print("   [PASS] Same figures from the snapshot's grouped queries; repeat reads run none.")
+
+def test_invalidation():
+    print("--- Stats Follow Commits to beds / ambulances / staff ---")
+    engine, db = make_session(40)
+    hospital_state.invalidate()
+    before = DashboardService.get_stats(db)
+
+    bed = db.get(models.BedModel, "BED-1")
+    bed.is_occupied, bed.status = True, "OCCUPIED"
+    db.rollback()
+    n, again = statements(engine, lambda: DashboardService.get_stats(db))
+    assert n == 0 and again == before, "Rolled-back change invalidated the snapshot"
+
+    bed = db.get(models.BedModel, "BED-1")
+    bed.is_occupied, bed.status = True, "OCCUPIED"
+    db.commit()
+    after = DashboardService.get_stats(db)
+    assert after["occupancy"]["ICU"] == before["occupancy"]["ICU"] + 1 # ORM flush
+
+    db.execute(update(models.Ambulance).values(status="IDLE"))
+    db.commit()
+    assert DashboardService.get_stats(db)["resources"]["Ambulances"]["available"] == 5 # Bulk UPDATE
+    db.close()
+    print("   [PASS] ORM and bulk writes show up after commit; rollbacks do not.")
+
+def test_endpoint_tracks_admissions():
+    print("--- GET /api/dashboard/stats around an Admission ---")
+    before = requests.get(STATS_URL).json()
+    bed = requests.get(f"{BASE_URL}/erp/beds", params={"type": "ICU", "status": "AVAILABLE", "fields": "id"}).json()[0]
+    res = requests.post(f"{BASE_URL}/erp/admit", json={
+        "patient_name": "Stats Test", "patient_age": 40, "gender": "M",
+        "condition": "Post-op Observation", "staff_id": "N-01", "bed_id": bed["id"]
+    })
+    assert res.status_code == 200, res.text
+    try:
+        during = requests.get(STATS_URL).json()
+        assert during["occupancy"]["ICU"] == before["occupancy"]["ICU"] + 1
+    finally:
+        requests.post(f"{BASE_URL}/erp/discharge/{bed['id']}")
+    assert requests.get(STATS_URL).json()["occupancy"]["ICU"] == before["occupancy"]["ICU"]
+    print("   [PASS] Admission and discharge show up on the next poll.")
+
+def test_endpoint_under_load(clients=16, polls=25):
+    print(f"--- {clients} Dashboards Polling Concurrently ---")
+    timings = []
+    lock = threading.Lock()
+    def client():
+        session = requests.Session()
+        for _ in range(polls):
+            start = time.perf_counter()
+            assert session.get(STATS_URL).status_code == 200
+            with lock:
+                timings.append((time.perf_counter() - start) * 1000)
+    pool = [threading.Thread(target=client) for _ in range(clients)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    print(f"   {len(timings)} requests: p50 {statistics.median(timings):.1f} ms, p95 {statistics.quantiles(timings, n=20)[-1]:.1f} ms")
+
+if __name__ == "__main__":
+    test_matches_legacy_and_scales()
+    test_invalidation()
+    test_endpoint_tracks_admissions()
+    test_endpoint_under_load()
@@ -0,0 +1,121 @@
+import requests
+import statistics
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import delete, insert, select
+from database import SessionLocal, engine
+import models
+from inventory_service import InventoryService, hour_bucket
+from demand_forecast import DemandForecaster, fit_forecast, HISTORY_HOURS, HORIZON_HOURS
+
+# Run from the server's working directory so both share hospital_os.db
+FORECAST_URL = "http://localhost:8000/api/inventory/forecast"
+ITEM_PREFIX = "Demand Test"
+SKUS = 5000
+
+def synthetic(n_items, seed=1):
+    # Poisson hourly usage around a daily cycle (peak mid-day, quiet nights)
+    rng = np.random.default_rng(seed)
+    hours = np.arange(HISTORY_HOURS + HORIZON_HOURS)
+    base = rng.uniform(0.5, 10, n_items)[:, None]
+    amplitude = rng.uniform(0.2, 0.8, n_items)[:, None]
+    rate = base * (1 + amplitude * np.sin(2 * np.pi * hours / 24))
+    return rate, rng.poisson(rate).astype(float)
+
+def test_accuracy():
+    print("--- Holt-Winters on Synthetic Seasonal Demand ---")
+    rate, observed = synthetic(1000)
+    demand, sigma, seasonal = fit_forecast(observed[:, :HISTORY_HOURS])
+    assert seasonal.all()
+    future = rate[:, HISTORY_HOURS:HISTORY_HOURS + 72].sum(axis=1)
+    error = np.median(np.abs(demand[:, :72].sum(axis=1) - future) / future)
+    actual = observed[:, HISTORY_HOURS:HISTORY_HOURS + 24].sum(axis=1)
+    band = 1.645 * sigma * np.sqrt(24)
+    coverage = np.mean(np.abs(actual - demand[:, :24].sum(axis=1)) <= band)
+    print(f"   72h demand error (median): {error:.1%}; 24h usage inside the 90% band: {coverage:.0%}")
+    assert error < 0.15 and coverage > 0.75
+
+    # The daily shape is learned: forecast peak and trough land on the true ones
+    peak_true, peak_forecast = rate[:, HISTORY_HOURS:HISTORY_HOURS + 24].argmax(axis=1), demand[:, :24].argmax(axis=1)
+    assert np.median(np.abs(peak_true - peak_forecast)) <= 2
+    print("   [PASS] Level, daily seasonality and bands recovered.")
+
+def test_scale():
+    print(f"--- Fit Cost: {SKUS:,} SKUs x {HISTORY_HOURS} hours ---")
+    _, observed = synthetic(SKUS, seed=2)
+    start = time.perf_counter()
+    fit_forecast(observed[:, :HISTORY_HOURS])
+    elapsed = time.perf_counter() - start
+    print(f"   One vectorised pass: {elapsed:.2f}s")
+    assert elapsed < 10
+
+def cleanup():
+    with engine.begin() as conn:
+        ids = select(models.InventoryItem.id).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%"))
+        for table in (models.InventoryLog.__table__, models.InventoryBurnRate.__table__):
+            conn.execute(delete(table).where(table.c.item_id.in_(ids)))
+        conn.execute(delete(models.InventoryItem.__table__).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")))
+
+def test_forecaster_on_rollup():
+    print("--- Forecaster over the Burn-Rate Rollup ---")
+    now = datetime.utcnow()
+    origin = hour_bucket(now)
+    # ~3 units/hour on a daily cycle: 200 in stock lasts roughly 2-3 days
+    hours = np.arange(HISTORY_HOURS)
+    observed = np.random.default_rng(3).poisson(3 * (1 + 0.5 * np.sin(2 * np.pi * hours / 24)))
+    with engine.begin() as conn:
+        names = ["busy", "short history", "unused"]
+        for name in names:
+            conn.execute(insert(models.InventoryItem.__table__).values(
+                name=f"{ITEM_PREFIX} {name}", category="Test", quantity=200, reorder_level=10, unit_price=1.0))
+        ids = dict(conn.execute(select(models.InventoryItem.name, models.InventoryItem.id).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%"))).all())
+        busy, short = ids[f"{ITEM_PREFIX} busy"], ids[f"{ITEM_PREFIX} short history"]
+        conn.execute(insert(models.InventoryBurnRate.__table__), [
+            {"hour_start": origin - timedelta(hours=HISTORY_HOURS - h), "item_id": busy, "quantity_used": int(observed[h])}
+            for h in range(HISTORY_HOURS)
+        ] + [
+            {"hour_start": origin - timedelta(hours=h), "item_id": short, "quantity_used": 4} for h in range(1, 11)
+        ])
+
+    forecaster = DemandForecaster()
+    forecaster.refresh(now)
+    db = SessionLocal()
+    result = {f["name"][len(ITEM_PREFIX) + 1:]: f for f in forecaster.forecast(db, now)}
+    busy_f, short_f, unused_f = result["busy"], result["short history"], result["unused"]
+    print(f"   busy: {busy_f['burn_rate']}/h, stockout in {busy_f['hours_remaining']}h "
+          f"[{busy_f['stockout_hours_low']}, {busy_f['stockout_hours_high']}], reorder {busy_f['reorder_quantity']}")
+    assert busy_f["model"] == "holt_winters" and short_f["model"] == "mean_rate"
+    assert busy_f["stockout_hours_low"] <= busy_f["hours_remaining"] <= busy_f["stockout_hours_high"]
+    assert busy_f["reorder_quantity"] > 0
+    assert abs(short_f["burn_rate"] - 4.0) < 0.01 and abs(short_f["hours_remaining"] - 50) < 1.5
+    assert unused_f["hours_remaining"] == 999.0 and unused_f["reorder_quantity"] == 0 and unused_f["stockout_at"] is None
+
+    # Stock levels are read live: a deduction moves the stockout without a refit
+    InventoryService.deduct_items(db, {short: 100}, patient_name=ITEM_PREFIX)
+    db.commit()
+    after = {f["id"]: f for f in forecaster.forecast(db, now)}
+    assert abs(after[short]["hours_remaining"] - 25) < 1.5
+    db.close()
+    print("   [PASS] Seasonal, short-history and unused items; stock changes apply without a refit.")
+
+def test_endpoint_is_cache_read(rounds=30):
+    print("--- GET /api/inventory/forecast ---")
+    requests.get(FORECAST_URL)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        res = requests.get(FORECAST_URL)
+        timings.append((time.perf_counter() - start) * 1000)
+    assert res.status_code == 200 and {"stockout_hours_low", "reorder_quantity", "model"} <= res.json()[0].keys()
+    print(f"   {len(res.json())} items, p50 {statistics.median(timings):.1f} ms")
+
+if __name__ == "__main__":
+    test_accuracy()
+    test_scale()
+    cleanup()
+    try:
+        test_forecaster_on_rollup()
+        test_endpoint_is_cache_read()
+    finally:
+        cleanup()
@@ -0,0 +1,124 @@
+import requests
+import time
+import json
+import uuid
+import random
+import tracemalloc
+from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
+from database import SessionLocal, engine
+import models
+from history_service import HistoryService
+from testing_utils import seeded, seeding
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/history"
+BATCH_TAG = "History Scale"
+VISITS = 1_000_000
+
+def seed_completed_visits(count=VISITS, chunk=50000):
+    print(f"Seeding {count:,} completed OPD visits...")
+    table = models.PatientQueue.__table__
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / count
+    with engine.begin() as conn:
+        for offset in range(0, count, chunk):
+            conn.execute(table.insert(), [{
+                "id": str(uuid.uuid4()),
+                "patient_name": f"{BATCH_TAG} {i}",
+                "patient_age": random.randint(1, 90),
+                "gender": random.choice(["Male", "Female"]),
+                "base_acuity": random.randint(1, 5),
+                "vitals": {"hr": 80, "bp": "120/80", "spo2": 97},
+                "symptoms": ["Fever"],
+                "check_in_time": start + step * i,
+                "status": "COMPLETED",
+                "priority_score": 60.0
+            } for i in range(offset, min(offset + chunk, count))])
+    return count
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(models.PatientQueue.__table__.delete().where(
+            models.PatientQueue.patient_name.like(f"{BATCH_TAG}%")
+        ))
+
+visits = seeded(seed_completed_visits, cleanup, "visits")
+
+def timed_get(url, **params):
+    start = time.perf_counter()
+    res = requests.get(url, params=params)
+    return res, (time.perf_counter() - start) * 1000
+
+def test_keyset_pages():
+    print("--- Keyset Pages (GET /api/history/opd?limit=100) ---")
+    res, first_ms = timed_get(f"{BASE_URL}/opd", limit=100)
+    page = res.json()
+    assert len(page["items"]) == 100 and page["next_cursor"]
+
+    # Walk 50 pages: every page must start strictly after the previous one
+    cursor, seen, timings = page["next_cursor"], {i["id"] for i in page["items"]}, []
+    for _ in range(50):
+        res, ms = timed_get(f"{BASE_URL}/opd", limit=100, cursor=cursor)
+        page = res.json()
+        timings.append(ms)
+        ids = {i["id"] for i in page["items"]}
+        assert not ids & seen, "Pages overlap"
+        seen |= ids
+        cursor = page["next_cursor"]
+
+    # A cursor at the far end of the history (what OFFSET 999,900 would be)
+    db = SessionLocal()
+    oldest = db.query(models.PatientQueue.check_in_time, models.PatientQueue.id).filter(
+        models.PatientQueue.status == "COMPLETED"
+    ).order_by(models.PatientQueue.check_in_time.asc(), models.PatientQueue.id.asc()).offset(100).first()
+    db.close()
+    res, deep_ms = timed_get(f"{BASE_URL}/opd", limit=100, cursor=HistoryService.encode_cursor(*oldest))
+    assert len(res.json()["items"]) == 100
+    timings.sort()
+    print(f"   First page: {first_ms:.1f} ms, next 50 pages p50: {timings[len(timings) // 2]:.1f} ms, "
+          f"last page of history: {deep_ms:.1f} ms")
+
+def test_streaming_export(visits):
+    print("--- NDJSON Streaming (GET /api/history/opd?format=ndjson) ---")
+    start = time.perf_counter()
+    rows, first_byte = 0, None
+    with requests.get(f"{BASE_URL}/opd", params={"format": "ndjson"}, stream=True) as res:
+        for line in res.iter_lines():
+            if first_byte is None:
+                first_byte = (time.perf_counter() - start) * 1000
+            rows += 1
+    elapsed = time.perf_counter() - start
+    print(f"   {rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s), first row after {first_byte:.0f} ms")
+    assert rows >= visits
+
+def test_memory_in_process(legacy_rows=200_000):
+    print("--- Peak Python memory to serialize the OPD history (in-process) ---")
+    tracemalloc.start()
+    size = sum(len(chunk) for chunk in HistoryService.stream("opd", (models.PatientQueue.status == "COMPLETED",), "ndjson"))
+    streamed_peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f"   Streaming (1,000-row pages): peak {streamed_peak:.0f} MB for {size / 1e6:.0f} MB of output")
+
+    # The previous implementation: every ORM row in memory, then one encoded body.
+    # Capped, since at 1M rows it needs more RAM than a small box has; it grows linearly.
+    tracemalloc.start()
+    db = SessionLocal()
+    records = db.query(models.PatientQueue).filter(
+        models.PatientQueue.status == "COMPLETED"
+    ).order_by(models.PatientQueue.check_in_time.desc()).limit(legacy_rows).all()
+    body = json.dumps(jsonable_encoder(records))
+    legacy_peak = tracemalloc.get_traced_memory()[1] / 1e6
+    loaded = len(records)
+    db.close()
+    del records, body
+    tracemalloc.stop()
+    print(f"   Load-all + jsonable_encoder: peak {legacy_peak:.0f} MB for the newest {loaded:,} rows")
+
+if __name__ == "__main__":
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else VISITS
+    with seeding(lambda: seed_completed_visits(count), cleanup):
+        test_keyset_pages()
+        test_streaming_export(count)
+        test_memory_in_process()
@@ -0,0 +1,101 @@
+import requests
+import statistics
+import time
+import uuid
+from sqlalchemy import update
+import models
+from hospital_state import HospitalState
+from testing_utils import memory_session, statements
+
+BASE_URL = "http://localhost:8000/api"
+
+def make_session(n_beds=400):
+    engine, db = memory_session(models.BedModel, models.PatientQueue, models.Ambulance, models.Staff)
+    units = ["ER", "ICU", "Wards", "Surgery"]
+    db.add_all(models.BedModel(
+        id=f"BED-{i}", type=units[i % 4], unit=f"Unit {i % 6}", is_occupied=i % 3 == 0,
+        status="OCCUPIED" if i % 3 == 0 else ("DIRTY" if i % 5 == 0 else "AVAILABLE"), ventilator_in_use=i % 7 == 0
+    ) for i in range(n_beds))
+    # Marked OCCUPIED without the is_occupied flag: in_use (the dashboard's occupancy), not occupied
+    db.add(models.BedModel(id="BED-X", type="ICU", unit="Unit X", is_occupied=False, status="OCCUPIED"))
+    db.add_all(models.PatientQueue(id=str(uuid.uuid4()), patient_name=f"OPD {i}", status="WAITING" if i % 4 else "COMPLETED") for i in range(30))
+    db.add_all(models.Ambulance(id=f"AMB-{i}", status="IDLE" if i % 2 else "DISPATCHED") for i in range(5))
+    db.add_all(models.Staff(id=f"S-{i}", name=f"Staff {i}", role="Doctor" if i % 2 else "Nurse", is_clocked_in=i % 3 != 0) for i in range(12))
+    db.commit()
+    return engine, db
+
+def test_snapshot_matches_counts():
+    print("--- Snapshot vs Individual COUNT Queries ---")
+    engine, db = make_session()
+    snapshot = HospitalState().snapshot(db)
+    bed = models.BedModel
+    assert snapshot.total_beds == db.query(bed).count()
+    assert snapshot.occupied_beds == db.query(bed).filter(bed.is_occupied == True).count()
+    for bed_type in ["ER", "ICU", "Wards", "Surgery"]:
+        assert snapshot.occupied(bed_type) == db.query(bed).filter(bed.type == bed_type, bed.is_occupied == True).count()
+        assert snapshot.beds["by_type"][bed_type]["in_use"] == db.query(bed).filter(
+            bed.type == bed_type, (bed.is_occupied == True) | (bed.status == "OCCUPIED")
+        ).count()
+    assert snapshot.beds["by_unit"]["Unit 2"]["total"] == db.query(bed).filter(bed.unit == "Unit 2").count()
+    assert snapshot.beds["by_status"]["DIRTY"] == db.query(bed).filter(bed.status == "DIRTY").count()
+    assert snapshot.beds["ventilators_in_use"] == db.query(bed).filter(bed.ventilator_in_use == True).count()
+    assert snapshot.opd_waiting == db.query(models.PatientQueue).filter(models.PatientQueue.status == "WAITING").count()
+    assert snapshot.ambulances["IDLE"] == 2
+    assert snapshot.staff_on_shift == {"Doctor": 4, "Nurse": 4}
+    db.close()
+    print("   [PASS] Totals, per type / unit / status, queue, ambulances and staff agree.")
+
+def test_section_refresh():
+    print("--- Statements per Capacity Read ---")
+    engine, db = make_session()
+    state = HospitalState()
+    cold, _ = statements(engine, lambda: state.snapshot(db))
+    warm, _ = statements(engine, lambda: state.snapshot(db))
+
+    db.execute(update(models.BedModel).where(models.BedModel.id == "BED-1").values(is_occupied=True))
+    db.commit()
+    after_bed, snapshot = statements(engine, lambda: state.snapshot(db))
+    print(f"   Cold: {cold} grouped queries | unchanged: {warm} | after a bed commit: {after_bed}")
+    assert (cold, warm, after_bed) == (4, 0, 1)
+    assert snapshot.occupied("ICU") == db.query(models.BedModel).filter(models.BedModel.type == "ICU", models.BedModel.is_occupied == True).count()
+    db.close()
+    print("   [PASS] A commit recounts only the section whose table it touched.")
+
+def test_endpoints_follow_admission():
+    print("--- Capacity Endpoints around an Admission ---")
+    def read():
+        return (requests.get(f"{BASE_URL}/external/capacity").json()["beds_available"],
+                requests.get(f"{BASE_URL}/public/status").json()["occupied"],
+                requests.get(f"{BASE_URL}/finance/stats").json()["active_occupancy"])
+    available, occupied, kpi_occupied = read()
+    assert kpi_occupied == occupied
+    bed = requests.get(f"{BASE_URL}/erp/beds", params={"type": "ICU", "status": "AVAILABLE", "fields": "id"}).json()[0]
+    res = requests.post(f"{BASE_URL}/erp/admit", json={
+        "patient_name": "Snapshot Test", "patient_age": 52, "gender": "M",
+        "condition": "Post-op Observation", "staff_id": "N-01", "bed_id": bed["id"]
+    })
+    assert res.status_code == 200, res.text
+    try:
+        assert read() == (available - 1, occupied + 1, occupied + 1)
+    finally:
+        requests.post(f"{BASE_URL}/erp/discharge/{bed['id']}")
+    assert read() == (available, occupied, occupied)
+    print("   [PASS] External capacity, public status and KPIs move together on the next read.")
+
+def test_endpoint_latency(rounds=50):
+    print("--- Capacity Read Latency ---")
+    session = requests.Session()
+    for path in ["external/capacity", "public/status", "diversion/recommend"]:
+        session.get(f"{BASE_URL}/{path}")
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            assert session.get(f"{BASE_URL}/{path}").status_code == 200
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"   /api/{path:<22} p50 {statistics.median(timings):5.1f} ms")
+
+if __name__ == "__main__":
+    test_snapshot_matches_counts()
+    test_section_refresh()
+    test_endpoints_follow_admission()
+    test_endpoint_latency()
@@ -0,0 +1,61 @@
+import requests
+import time
+from icd_index import get_icd_index
+
+BASE_URL = "http://localhost:8000/api/queue"
+
+TYPEAHEAD_QUERIES = ["I", "I2", "I21", "i21.9", "a", "r0", "heart", "heart fail", "acute myo",
+                     "chest pain", "pneumonia", "diabetes", "type 2 diabetes with coma",
+                     "fracture of femur", "fractur fem clos", "infection", "concussion"]
+
+def test_icd_index_latency(rounds=300):
+    print("--- ICD-10 Index Latency (in-process) ---")
+    start = time.perf_counter()
+    index = get_icd_index()
+    print(f"   Loaded {len(index.codes)} codes in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    timings = []
+    for _ in range(rounds):
+        for q in TYPEAHEAD_QUERIES:
+            t0 = time.perf_counter()
+            index.search(q, 10)
+            timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"   {len(timings)} searches, p50: {timings[len(timings) // 2]:.3f} ms, p99: {p99:.3f} ms")
+    assert p99 < 1.0, "Typeahead p99 should be sub-millisecond"
+
+def test_code_prefix_ranking():
+    print("--- ICD-10 Code Prefix Ranking ---")
+    index = get_icd_index()
+    keys = sorted(index.by_code, key=lambda k: (len(k), k))
+    prefixes = {k[:n] for k in keys for n in (1, 2, 3)}
+    for prefix in prefixes:
+        expected = [index.by_code[k] for k in keys if k.startswith(prefix)][:10]
+        assert index._code_prefix(prefix, 10) == expected, prefix
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index._code_prefix("I", 10)
+    print(f"   One-letter prefix: {(time.perf_counter() - t0):.3f} ms per lookup")
+    print(f"   [PASS] {len(prefixes)} prefixes rank broader codes first, then in code order.")
+
+def test_icd_search_endpoint():
+    print("--- ICD-10 Search Endpoint ---")
+    res = requests.get(f"{BASE_URL}/icd-search", params={"query": "i21.9"}).json()
+    assert res[0]["code"] == "I21.9", res
+    print(f"   [PASS] Exact code: {res[0]['code']} - {res[0]['desc']}")
+
+    res = requests.get(f"{BASE_URL}/icd-search", params={"query": "heart fail", "limit": 5}).json()
+    assert len(res) == 5 and res[0]["code"] == "I50", res
+    print(f"   [PASS] Description search ranks {res[0]['code']} ({res[0]['desc']}) first")
+
+    res = requests.get(f"{BASE_URL}/icd-validate", params={"code": "j44.9"}).json()
+    assert res["valid"] and res["chapter"] == "J", res
+    res = requests.get(f"{BASE_URL}/icd-validate", params={"code": "ZZZ"}).json()
+    assert not res["valid"], res
+    print("   [PASS] Validation uses the index.")
+
+if __name__ == "__main__":
+    test_icd_index_latency()
+    test_code_prefix_ranking()
+    test_icd_search_endpoint()
@@ -3,19 +3,14 @@ from sqlalchemy.orm import sessionmaker
 from models import Base, InventoryItem, InventoryLog, BedModel
 from inventory_service import InventoryService
 from database import SQLALCHEMY_DATABASE_URL
-import asyncio
+import models
 
 # Setup Test DB Connection
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-class MockManager:
-    async def broadcast(self, msg):
-        print(f"[MOCK WS] Broadcasting: {msg}")
-
-async def test_inventory_flow():
+def test_inventory_flow():
     db = TestingSessionLocal()
-    manager = MockManager()
     
     print("--- 1. Initial State ---")
     vent_item = db.query(InventoryItem).filter_by(name="Ventilator Circuit").first()
@@ -31,7 +26,7 @@ async def test_inventory_flow():
     context = "ICU"
     patient_data = {"patient_name": "Test Patient", "bed_id": "ICU-TEST", "condition": "Severe Pneumonia (Infectious)"}
     
-    await InventoryService.process_usage(db, manager, context, patient_data)
+    InventoryService.process_usage(db, context, patient_data)
     
     # Check Deduction
     db.refresh(vent_item)
@@ -43,10 +38,14 @@ async def test_inventory_flow():
     ppe_item = db.query(InventoryItem).filter_by(name="PPE Kit").first()
     print(f"PPE Kit used: {ppe_item.quantity}")
 
+    # WebSocket events are written to the outbox in the same transaction
+    pending = db.query(models.OutboxEvent).filter(models.OutboxEvent.event_type == "REFRESH_INVENTORY").count()
+    assert pending > 0, "Expected a REFRESH_INVENTORY event in the outbox"
+
     print("\n--- 3. Simulating Surgery Start ---")
     context = "Surgery"
     patient_data = {"patient_name": "Surgery Patient", "bed_id": "OR-1", "condition": "Surgery Start"}
-    await InventoryService.process_usage(db, manager, context, patient_data)
+    InventoryService.process_usage(db, context, patient_data)
     
     gown_item = db.query(InventoryItem).filter_by(name="Sterile Gowns").first()
     print(f"Sterile Gowns after Surgery Start: {gown_item.quantity}") # Should decrease by 2
@@ -73,4 +72,4 @@ async def test_inventory_flow():
     db.close()
 
 if __name__ == "__main__":
-    asyncio.run(test_inventory_flow())
+    test_inventory_flow()
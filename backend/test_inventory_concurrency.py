@@ -0,0 +1,126 @@
+import threading
+import time
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import OperationalError
+from database import SessionLocal, engine
+import models
+from inventory_service import InventoryService
+
+# Concurrent clinical events deducting the same items. Run from the server's working
+# directory (or any directory with an initialised hospital_os.db).
+ITEM_PREFIX = "Concurrency Test"
+EVENTS_PER_THREAD = 150
+
+def create_items(stock):
+    with engine.begin() as conn:
+        cleanup(conn)
+        for i, qty in enumerate(stock):
+            conn.execute(insert(models.InventoryItem.__table__).values(
+                name=f"{ITEM_PREFIX} {i}", category="Test", quantity=qty, reorder_level=0, unit_price=1.0))
+        return [r[0] for r in conn.execute(select(models.InventoryItem.id).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")).order_by(models.InventoryItem.id))]
+
+def cleanup(conn):
+    ids = select(models.InventoryItem.id).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%"))
+    for table in (models.InventoryLog.__table__, models.InventoryBurnRate.__table__):
+        conn.execute(delete(table).where(table.c.item_id.in_(ids)))
+    conn.execute(delete(models.InventoryItem.__table__).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")))
+
+def levels(ids):
+    with engine.connect() as conn:
+        stock = dict(conn.execute(select(models.InventoryItem.id, models.InventoryItem.quantity).where(models.InventoryItem.id.in_(ids))).all())
+        logged = dict(conn.execute(select(models.InventoryLog.item_id, func.sum(models.InventoryLog.quantity_used))
+                                   .where(models.InventoryLog.item_id.in_(ids)).group_by(models.InventoryLog.item_id)).all())
+    return stock, logged
+
+def run_threads(threads, event):
+    retries = [0]
+    lock = threading.Lock()
+    def worker():
+        db = SessionLocal()
+        try:
+            for _ in range(EVENTS_PER_THREAD):
+                while True:
+                    try:
+                        event(db)
+                        db.commit()
+                        break
+                    except OperationalError: # Lock wait exceeded: retry the whole unit of work
+                        db.rollback()
+                        with lock:
+                            retries[0] += 1
+        finally:
+            db.close()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - start, retries[0]
+
+def deduct(quantities):
+    return lambda db: InventoryService.deduct_items(db, quantities, patient_name=ITEM_PREFIX)
+
+def test_totals_and_throughput():
+    print("--- Concurrent Deductions: Totals and Throughput ---")
+    baseline = None
+    for threads in (1, 2, 4, 8):
+        ids = create_items([1_000_000, 1_000_000])
+        quantities = {ids[0]: 1, ids[1]: 3}
+        elapsed, retries = run_threads(threads, deduct(quantities))
+        events = threads * EVENTS_PER_THREAD
+        stock, logged = levels(ids)
+        for item_id, n in quantities.items():
+            assert 1_000_000 - stock[item_id] == logged[item_id] == events * n, f"{threads} threads lost updates"
+        rate = events / elapsed
+        baseline = baseline or rate
+        print(f"   {threads} threads: {events:5} events in {elapsed:5.2f}s = {rate:6.0f} events/s ({rate / baseline:.2f}x), {retries} lock retries, totals exact")
+        assert rate > baseline * 0.5, "Throughput collapsed under contention"
+
+def test_scarce_stock():
+    print("--- Scarce Stock: 8 threads x 150 events competing for 500 units ---")
+    ids = create_items([500])
+    run_threads(8, deduct({ids[0]: 1}))
+    stock, logged = levels(ids)
+    assert stock[ids[0]] == 0 and logged[ids[0]] == 500, (stock, logged)
+    with engine.connect() as conn:
+        log_rows = conn.execute(select(func.count()).where(models.InventoryLog.item_id == ids[0])).scalar()
+    assert log_rows == 500, f"{log_rows - 500} empty usage rows logged"
+    print("   [PASS] Exactly 500 units given out; stock stopped at 0; no usage rows for the other 700 events.")
+
+    db = SessionLocal()
+    InventoryService.deduct_items(db, {ids[0]: 2}, patient_name=ITEM_PREFIX)
+    db.flush()
+    shortfall = db.query(models.OutboxEvent).filter(models.OutboxEvent.event_type == "STOCK_SHORTFALL").order_by(models.OutboxEvent.id.desc()).first()
+    assert shortfall and shortfall.payload["items"] == [{"item_name": f"{ITEM_PREFIX} 0", "requested": 2, "supplied": 0}]
+    db.rollback()
+    db.close()
+    print("   [PASS] A deduction from an empty item reports the shortfall instead.")
+
+    ids = create_items([7])
+    db = SessionLocal()
+    rows, used = InventoryService.decrement(db, {ids[0]: 10})
+    db.commit()
+    db.close()
+    assert used[ids[0]] == 7 and rows[0].quantity == 0
+    print("   [PASS] A request larger than the stock takes what is left.")
+
+def test_legacy_read_modify_write():
+    print("--- For comparison: read / subtract / write back in Python ---")
+    ids = create_items([1_000_000])
+    def event(db):
+        item = db.query(models.InventoryItem).filter(models.InventoryItem.id == ids[0]).first()
+        item.quantity -= 1
+    run_threads(8, event)
+    stock, _ = levels(ids)
+    lost = 8 * EVENTS_PER_THREAD - (1_000_000 - stock[ids[0]])
+    print(f"   {lost} of {8 * EVENTS_PER_THREAD} decrements lost")
+
+if __name__ == "__main__":
+    try:
+        test_totals_and_throughput()
+        test_scarce_stock()
+        test_legacy_read_modify_write()
+    finally:
+        with engine.begin() as conn:
+            cleanup(conn)
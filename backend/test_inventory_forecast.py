@@ -0,0 +1,110 @@
+import requests
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import delete, func
+from database import SessionLocal, engine
+import models
+from inventory_service import InventoryService, BURN_WINDOW_HOURS, hour_bucket
+from demand_forecast import DemandForecaster, HISTORY_HOURS
+from testing_utils import seeded, seeding, timed
+
+# Run from the server's working directory so both share hospital_os.db
+FORECAST_URL = "http://localhost:8000/api/inventory/forecast"
+ITEM_PREFIX = "Forecast Test"
+ITEMS = 500
+HISTORY_DAYS = 30
+LOGS_PER_ITEM_HOUR = 1 # 500 items x 720 hours = 360k history rows
+
+def cleanup():
+    with engine.begin() as conn:
+        ids = [r[0] for r in conn.execute(models.InventoryItem.__table__.select().with_only_columns(models.InventoryItem.id)
+                                          .where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")))]
+        for table in (models.InventoryBurnRate.__table__, models.InventoryLog.__table__):
+            conn.execute(delete(table).where(table.c.item_id.in_(ids)))
+        conn.execute(delete(models.InventoryItem.__table__).where(models.InventoryItem.id.in_(ids)))
+
+def seed_history():
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(models.InventoryItem.__table__.insert(), [
+            {"name": f"{ITEM_PREFIX} {i}", "category": "Test", "quantity": 10000, "reorder_level": 10, "unit_price": 1.0}
+            for i in range(ITEMS)
+        ])
+        ids = [r[0] for r in conn.execute(models.InventoryItem.__table__.select().with_only_columns(models.InventoryItem.id)
+                                          .where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")))]
+        for hour in range(HISTORY_DAYS * 24, 0, -1):
+            at = now - timedelta(hours=hour, minutes=7)
+            conn.execute(models.InventoryLog.__table__.insert(), [
+                {"item_id": item_id, "patient_name": ITEM_PREFIX, "quantity_used": 1 + item_id % 3, "reason": ITEM_PREFIX, "timestamp": at}
+                for item_id in ids for _ in range(LOGS_PER_ITEM_HOUR)
+            ])
+    db = SessionLocal()
+    InventoryService.rebuild_burn_rates(db) # History was bulk-loaded behind deduct_stock's back
+    db.close()
+    return ids
+
+ids = seeded(seed_history, cleanup, "ids")
+
+def legacy_window_usage(db, start, end):
+    # The per-item shape the endpoint used to have: one windowed log query per item
+    used = {}
+    for item in db.query(models.InventoryItem).all():
+        logs = db.query(models.InventoryLog).filter(
+            models.InventoryLog.item_id == item.id, models.InventoryLog.timestamp >= start, models.InventoryLog.timestamp < end
+        ).all()
+        used[item.id] = sum(log.quantity_used for log in logs)
+    return used
+
+def test_rollup_tracks_deductions():
+    print("--- Rollup Maintained by deduct_stock ---")
+    db = SessionLocal()
+    item = db.query(models.InventoryItem).filter_by(name=f"{ITEM_PREFIX} 0").first()
+    bucket = hour_bucket(datetime.utcnow())
+    before = db.query(models.InventoryBurnRate.quantity_used).filter_by(item_id=item.id, hour_start=bucket).scalar() or 0
+    for _ in range(5):
+        InventoryService.deduct_stock(db, item.name, 3, patient_name=ITEM_PREFIX)
+    db.commit()
+    after = db.query(models.InventoryBurnRate.quantity_used).filter_by(item_id=item.id, hour_start=bucket).scalar()
+    assert after - before == 15, f"Expected +15 in the current bucket, got {after - before}"
+
+    # Buckets agree with the logs they summarise, hour by hour
+    logged = db.query(func.sum(models.InventoryLog.quantity_used)).filter(
+        models.InventoryLog.item_id == item.id, models.InventoryLog.timestamp >= bucket
+    ).scalar()
+    assert logged == after
+    db.close()
+    print("   [PASS] Five deductions landed in the current hourly bucket.")
+
+def test_series_matches_logs(ids):
+    print("--- Forecast Input Series vs Raw Logs ---")
+    db = SessionLocal()
+    origin = hour_bucket(datetime.utcnow())
+    item_ids, series = DemandForecaster.load_series(db, origin)
+    row = {int(i): n for n, i in enumerate(item_ids)}
+    exact = legacy_window_usage(db, origin - timedelta(hours=BURN_WINDOW_HOURS), origin)
+    # Complete hours only: the trailing window of the series is exactly the logs it summarises
+    worst = max(abs(series[row[i], -BURN_WINDOW_HOURS:].sum() - exact[i]) for i in ids)
+    assert worst == 0, f"Rollup drifted from the logs by {worst}"
+    assert np.all(series[[row[i] for i in ids]].sum(axis=1) > 0)
+    forecast = {f["id"]: f for f in requests.get(FORECAST_URL).json()}
+    assert set(ids) <= forecast.keys()
+    db.close()
+    print(f"   [PASS] Hourly series match the raw-log sums over the last {BURN_WINDOW_HOURS} complete hours.")
+
+def test_constant_time():
+    print(f"--- Forecast Cost: {ITEMS} items, {ITEMS * HISTORY_DAYS * 24 * LOGS_PER_ITEM_HOUR:,} history logs ---")
+    db = SessionLocal()
+    origin = hour_bucket(datetime.utcnow())
+    legacy_ms, _ = timed(lambda: legacy_window_usage(db, origin - timedelta(hours=BURN_WINDOW_HOURS), origin), rounds=5)
+    series_ms, _ = timed(lambda: DemandForecaster.load_series(db, origin), rounds=5)
+    endpoint_ms, _ = timed(lambda: requests.get(FORECAST_URL).json(), rounds=5)
+    db.close()
+    print(f"   Per-item {BURN_WINDOW_HOURS} h log queries: {legacy_ms:.1f} ms | {HISTORY_HOURS} h rollup series: {series_ms:.1f} ms | endpoint: {endpoint_ms:.1f} ms")
+    # The series is read by the background refit; a request only reads the cached model
+    assert endpoint_ms * 5 < legacy_ms
+
+if __name__ == "__main__":
+    with seeding(seed_history, cleanup) as item_ids:
+        test_rollup_tracks_deductions()
+        test_series_matches_logs(item_ids)
+        test_constant_time()
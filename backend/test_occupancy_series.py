@@ -0,0 +1,92 @@
+import math
+import requests
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+import models
+from occupancy_series import OccupancySeries, OccupancyRecorder, UNASSIGNED
+from hospital_state import HospitalState
+from testing_utils import memory_session
+
+# Run from the server's working directory so both share hospital_os.db
+SERIES_URL = "http://localhost:8000/api/metrics/occupancy"
+DAYS = 3
+
+def synthetic(minute):
+    # Daily occupancy cycle plus a queue that fills every morning
+    hour = minute / 60
+    return {
+        "occupied.total": 120 + round(30 * math.sin(2 * math.pi * hour / 24)),
+        "occupied.type.ICU": 12 + minute % 5,
+        "opd_queue": max(0, round(20 * math.sin(2 * math.pi * (hour - 6) / 24))),
+        "ventilators_in_use": minute % 7,
+        "ambulances_idle": 5 - minute % 3,
+    }
+
+def test_downsampling_and_retention():
+    print(f"--- {DAYS} Days of Minute Samples ---")
+    _, db = memory_session(models.OccupancySample)
+    origin = datetime(2026, 3, 2)
+    minutes = DAYS * 24 * 60
+    start = time.perf_counter()
+    for m in range(minutes):
+        OccupancySeries.record(db, synthetic(m), origin + timedelta(minutes=m, seconds=7))
+    db.commit()
+    per_tick = (time.perf_counter() - start) / minutes * 1000
+    now = origin + timedelta(minutes=minutes)
+    OccupancySeries.prune(db, now)
+    db.commit()
+    counts = dict(db.query(models.OccupancySample.resolution, func.count()).group_by(models.OccupancySample.resolution).all())
+    print(f"   {per_tick:.2f} ms per sample; rows kept: 1m {counts[60]}, 15m {counts[900]}, 1h {counts[3600]}")
+    assert counts[60] == 2 * 24 * 60 * 5, "1m buckets past 2 days not pruned"
+    assert counts[900] == minutes // 15 * 5 and counts[3600] == minutes // 60 * 5
+
+    # A 15m / 1h bucket holds the mean, min and max of the minute samples inside it
+    for width, first in [(900, 2 * 24 * 60 + 300), (3600, 60 * 30)]:
+        bucket = origin + timedelta(minutes=first)
+        values = [synthetic(m)["occupied.total"] for m in range(first, first + width // 60)]
+        row = db.get(models.OccupancySample, (width, "occupied.total", bucket))
+        assert row.samples == len(values) and abs(row.value - sum(values) / len(values)) < 1e-9
+        assert (row.min_value, row.max_value) == (min(values), max(values))
+
+    # Range queries pick the finest level that is still retained and fits MAX_POINTS
+    for hours, expected in [(6, "1m"), (7 * 24, "15m"), (60 * 24, "1h")]:
+        result = OccupancySeries.query(db, now - timedelta(hours=hours), now, metrics=["opd_queue"], now=now)
+        assert result["resolution"] == expected, (hours, result["resolution"])
+    result = OccupancySeries.query(db, now - timedelta(hours=6), now, metrics=["occupied.type.ICU"], now=now)
+    assert list(result["series"]) == ["occupied.type.ICU"] and len(result["series"]["occupied.type.ICU"]) == 360
+    db.close()
+    print("   [PASS] Buckets aggregate exactly, each level keeps its retention window, ranges pick their resolution.")
+
+def test_unassigned_unit():
+    print("--- Beds Without a Unit ---")
+    _, db = memory_session(models.BedModel, models.PatientQueue, models.Ambulance, models.Staff)
+    db.add_all([models.BedModel(id="BED-1", type="ICU", unit="Unit 1", is_occupied=True, status="OCCUPIED"),
+                models.BedModel(id="BED-2", type="ICU", unit=None, is_occupied=True, status="OCCUPIED")])
+    db.commit()
+    metrics = OccupancySeries.metrics_from_snapshot(HospitalState().snapshot(db))
+    assert metrics[f"occupied.unit.{UNASSIGNED}"] == 1 and metrics["occupied.unit.Unit 1"] == 1
+    assert not any(name.endswith(".None") for name in metrics), metrics
+    db.close()
+    print(f"   [PASS] Counted under occupied.unit.{UNASSIGNED}.")
+
+def test_recorder_and_endpoint():
+    print("--- Recorder Tick and GET /api/metrics/occupancy ---")
+    metrics = OccupancyRecorder().tick()
+    assert {"occupied.total", "opd_queue", "ventilators_in_use", "ambulances_idle", "occupied.type.ICU"} <= metrics.keys()
+    assert any(name.startswith("occupied.unit.") for name in metrics)
+
+    res = requests.get(SERIES_URL, params={"start": (datetime.utcnow() - timedelta(hours=1)).isoformat(), "metrics": "occupied.total,opd_queue"})
+    assert res.status_code == 200, res.text
+    body = res.json()
+    assert body["resolution"] == "1m" and set(body["series"]) == {"occupied.total", "opd_queue"}
+    assert body["series"]["occupied.total"][-1][1] == metrics["occupied.total"]
+    assert requests.get(SERIES_URL, params={"resolution": "5m"}).status_code == 400
+    past = datetime.utcnow() - timedelta(days=1)
+    assert requests.get(SERIES_URL, params={"start": past.isoformat(), "end": (past - timedelta(hours=1)).isoformat()}).status_code == 400
+    print(f"   [PASS] {len(metrics)} metrics sampled from the hospital snapshot and served by range.")
+
+if __name__ == "__main__":
+    test_downsampling_and_retention()
+    test_unassigned_unit()
+    test_recorder_and_endpoint()
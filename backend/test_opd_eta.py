@@ -0,0 +1,58 @@
+import requests
+from datetime import datetime, timedelta
+from database import SessionLocal
+import models
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/queue"
+
+def checkin(i, acuity=3):
+    return requests.post(f"{BASE_URL}/checkin", json={
+        "patient_name": f"ETA {i}",
+        "patient_age": 40,
+        "gender": "Female",
+        "base_acuity": acuity,
+        "vitals": {"hr": 85, "bp": "125/80", "spo2": 97},
+        "symptoms": ["Fever"]
+    }).json()["patient_id"]
+
+def backdate_consultation(patient_id, minutes):
+    db = SessionLocal()
+    patient = db.query(models.PatientQueue).filter(models.PatientQueue.id == patient_id).first()
+    patient.consultation_start = datetime.utcnow() - timedelta(minutes=minutes)
+    db.commit()
+    db.close()
+
+def test_service_stats_and_eta(patients=20):
+    print("--- OPD Service Rate & ETA ---")
+    for i in range(patients):
+        checkin(i)
+
+    rooms = requests.get(f"{BASE_URL}/rooms").json()
+    room = next(r for r in rooms if r["status"] == "ACTIVE")
+    before = room.get("consults_completed") or 0
+    patient_id = room["current_patient_id"]
+    backdate_consultation(patient_id, 15)
+
+    requests.post(f"{BASE_URL}/complete/{room['id']}")
+
+    db = SessionLocal()
+    patient = db.query(models.PatientQueue).filter(models.PatientQueue.id == patient_id).first()
+    assert patient.consultation_start and patient.consultation_end, "Consultation timestamps missing"
+    duration = (patient.consultation_end - patient.consultation_start).total_seconds() / 60
+    db.close()
+    print(f"   [PASS] Consultation recorded: {duration:.1f} min")
+
+    room = next(r for r in requests.get(f"{BASE_URL}/rooms").json() if r["id"] == room["id"])
+    assert room["consults_completed"] == before + 1
+    print(f"   [PASS] {room['id']} rolling average: {room['avg_service_minutes']:.1f} min over {room['consults_completed']} consults")
+
+    queue = requests.get(f"{BASE_URL}/sorted").json()
+    etas = [p["eta_minutes"] for p in queue["patients"]]
+    assert all(e is not None for e in etas), "Every waiting patient needs an ETA"
+    assert all(a <= b for a, b in zip(etas, etas[1:])), "ETA must grow with queue position"
+    print(f"   [PASS] {len(etas)} ETAs at {queue['service_rate_per_hour']} patients/hour: "
+          f"first {etas[0]} min, last {etas[-1]} min")
+
+if __name__ == "__main__":
+    test_service_stats_and_eta()
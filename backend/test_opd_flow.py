@@ -1,11 +1,14 @@
 import requests
 import time
 import json
+from testing_utils import fill_idle_rooms, idle_test_room
 
+# Run from the server's working directory: the consultation room is written straight to hospital_os.db
 BASE_URL = "http://localhost:8000/api"
 
 def test_opd_flow():
     print("Starting OPD Queue Flow Verification...")
+    fill_idle_rooms() # Seeded rooms busy: with auto-dispatch on, A and B stay in the queue
     
     # 1. Check-In Patient A (Mild - ESI 4)
     print("\n1. Checking in Patient A (Mild Fever, ESI 4)...")
@@ -56,9 +59,8 @@ def test_opd_flow():
 
     # 5. Call Patient to Room
     print("\n5. Calling Patient B to Room...")
-    rooms = requests.get(f"{BASE_URL}/queue/rooms").json()
-    room_id = rooms[0]["id"]
-    res_call = requests.post(f"{BASE_URL}/queue/call/{patient_b_id}?room_id={room_id}")
+    with idle_test_room("Flow Room") as room_id:
+        res_call = requests.post(f"{BASE_URL}/queue/call/{patient_b_id}?room_id={room_id}")
     if res_call.status_code == 200:
         print(f"   [PASS] Patient B moved to Room {room_id}")
     
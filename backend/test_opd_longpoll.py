@@ -0,0 +1,69 @@
+import requests
+import threading
+import time
+from testing_utils import fill_idle_rooms
+
+BASE_URL = "http://localhost:8000/api/queue"
+
+def checkin(name):
+    return requests.post(f"{BASE_URL}/checkin", json={
+        "patient_name": name,
+        "patient_age": 40,
+        "gender": "Male",
+        "base_acuity": 3,
+        "vitals": {"hr": 90, "bp": "130/85", "spo2": 96},
+        "symptoms": ["Fever"]
+    })
+
+def test_etag_revalidation(polls=50):
+    print("--- OPD Queue ETag Revalidation ---")
+    fill_idle_rooms() # With auto-dispatch on, an idle room would take the check-in and leave the ETag as is
+    first = requests.get(f"{BASE_URL}/sorted")
+    etag = first.headers.get("ETag")
+    assert etag, "GET /sorted must send an ETag"
+
+    start = time.perf_counter()
+    statuses = [requests.get(f"{BASE_URL}/sorted", headers={"If-None-Match": etag}).status_code for _ in range(polls)]
+    elapsed = (time.perf_counter() - start) * 1000 / polls
+    not_modified = statuses.count(304)
+    print(f"   {not_modified}/{polls} idle polls answered 304 (avg {elapsed:.1f} ms)")
+    # The ETag also rolls over on the scoring minute, so allow one fresh 200
+    assert not_modified >= polls - 1, "Idle queue should revalidate with 304"
+
+    checkin("LongPoll ETag")
+    res = requests.get(f"{BASE_URL}/sorted", headers={"If-None-Match": etag})
+    assert res.status_code == 200 and res.headers["ETag"] != etag, "Check-in must invalidate the ETag"
+    print("   [PASS] Check-in invalidated the ETag.")
+
+def test_long_poll_wakeup():
+    print("--- OPD Queue Long-Poll ---")
+    fill_idle_rooms() # Keeps "LongPoll Wake" in the queue instead of an idle room
+    version = requests.get(f"{BASE_URL}/sorted").json()["version"]
+
+    # Nothing changes: the poll should hold until timeout and return 204
+    start = time.perf_counter()
+    res = requests.get(f"{BASE_URL}/sorted/poll", params={"since_version": version, "timeout": 1})
+    print(f"   Idle poll: {res.status_code} after {time.perf_counter() - start:.2f}s")
+    assert res.status_code == 204
+
+    result = {}
+    def waiter():
+        res = requests.get(f"{BASE_URL}/sorted/poll", params={"since_version": version, "timeout": 20})
+        result["status"] = res.status_code
+        result["body"] = res.json()
+        result["at"] = time.perf_counter()
+
+    t = threading.Thread(target=waiter)
+    t.start()
+    time.sleep(0.5)
+    sent = time.perf_counter()
+    checkin("LongPoll Wake")
+    t.join()
+
+    assert result["status"] == 200 and result["body"]["version"] > version
+    assert any(p["patient_name"] == "LongPoll Wake" for p in result["body"]["patients"])
+    print(f"   [PASS] Long-poll woke {(result['at'] - sent) * 1000:.1f} ms after the check-in was sent.")
+
+if __name__ == "__main__":
+    test_etag_revalidation()
+    test_long_poll_wakeup()
@@ -0,0 +1,75 @@
+import requests
+import time
+import uuid
+import random
+from datetime import datetime, timedelta
+from database import SessionLocal
+import models
+from queue_service import apply_static_scores
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/queue"
+BATCH_TAG = "Scale Test"
+
+def seed_waiting_patients(count):
+    db = SessionLocal()
+    now = datetime.utcnow()
+    symptom_pool = [["Fever"], ["Chest Pain"], ["Shortness of Breath", "Cough"], ["Rash"], []]
+    icd_pool = [None, "I21.9", "J44.9", "L03.90", "S06.0X1A"]
+    for i in range(count):
+        patient = models.PatientQueue(
+            id=str(uuid.uuid4()),
+            patient_name=f"{BATCH_TAG} {i}",
+            patient_age=random.randint(1, 90),
+            gender=random.choice(["Male", "Female"]),
+            base_acuity=random.randint(1, 5),
+            vitals={"hr": 80, "bp": "120/80", "spo2": 97},
+            symptoms=random.choice(symptom_pool),
+            icd_code=random.choice(icd_pool),
+            check_in_time=now - timedelta(minutes=random.uniform(0, 240)),
+            status="WAITING"
+        )
+        apply_static_scores(patient)
+        db.add(patient)
+    db.commit()
+    db.close()
+
+def cleanup():
+    db = SessionLocal()
+    db.query(models.PatientQueue).filter(models.PatientQueue.patient_name.like(f"{BATCH_TAG}%")).delete(synchronize_session=False)
+    db.commit()
+    db.close()
+
+def test_sorted_queue_at_scale(count=5000, polls=20):
+    print(f"--- OPD Sorted Queue Benchmark ({count} waiting patients) ---")
+    seed_waiting_patients(count)
+    try:
+        timings = []
+        for _ in range(polls):
+            start = time.perf_counter()
+            res = requests.get(f"{BASE_URL}/sorted")
+            timings.append((time.perf_counter() - start) * 1000)
+        patients = res.json()["patients"]
+
+        timings.sort()
+        print(f"   Rows returned: {len(patients)}")
+        print(f"   Latency p50: {timings[len(timings) // 2]:.1f} ms, p95: {timings[int(len(timings) * 0.95) - 1]:.1f} ms")
+
+        scores = [p["priority_score"] for p in patients]
+        assert all(a >= b for a, b in zip(scores, scores[1:])), "Queue is not in descending live-score order"
+        print("   [PASS] Live scores are in descending order.")
+
+        # Reads must not write: stored scores still equal the check-in (static) score
+        db = SessionLocal()
+        rewritten = db.query(models.PatientQueue).filter(
+            models.PatientQueue.patient_name.like(f"{BATCH_TAG}%"),
+            models.PatientQueue.priority_score != models.PatientQueue.static_score
+        ).count()
+        db.close()
+        assert rewritten == 0, f"{rewritten} rows were rewritten by a GET"
+        print("   [PASS] GET /sorted wrote nothing.")
+    finally:
+        cleanup()
+
+if __name__ == "__main__":
+    test_sorted_queue_at_scale()
@@ -0,0 +1,102 @@
+import requests
+import time
+import uuid
+import random
+from datetime import datetime, timedelta
+from database import SessionLocal, engine
+import models
+from patient_search import PatientSearch
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/patients/search"
+BATCH_TAG = "SearchScale"
+
+FIRST = ["Aarav", "Vivaan", "Aditya", "Ravi", "Rahul", "Priya", "Ananya", "Diya", "Isha", "Kavya",
+         "Arjun", "Rohan", "Sneha", "Pooja", "Neha", "Karan", "Vikram", "Meera", "Sanjay", "Lakshmi"]
+LAST = ["Sharma", "Verma", "Iyer", "Reddy", "Patel", "Gupta", "Nair", "Rao", "Singh", "Mehta"]
+CONDITIONS = ["ESI 2: Sepsis", "ESI 3: Fracture", "ESI 1: Cardiac Arrest", "ESI 4: Laceration", "Pneumonia", "Post-Op"]
+
+def seed_patients(count, chunk=50000):
+    table = models.PatientRecord.__table__
+    start = datetime.utcnow() - timedelta(days=730)
+    with engine.begin() as conn:
+        for offset in range(0, count, chunk):
+            conn.execute(table.insert(), [{
+                "id": str(uuid.uuid4()),
+                "esi_level": random.randint(1, 5),
+                "acuity": "Stable",
+                "symptoms": [],
+                "timestamp": start + timedelta(seconds=i * 60),
+                "patient_name": f"{random.choice(FIRST)} {random.choice(LAST)} {BATCH_TAG}",
+                "patient_age": random.randint(1, 90),
+                "condition": random.choice(CONDITIONS),
+                "bed_id": None,
+                "discharge_time": start + timedelta(seconds=i * 60 + 3600)
+            } for i in range(offset, min(offset + chunk, count))])
+
+def cleanup():
+    with engine.begin() as conn:
+        conn.execute(models.PatientRecord.__table__.delete().where(
+            models.PatientRecord.patient_name.like(f"%{BATCH_TAG}%")
+        ))
+
+def test_index_follows_writes():
+    print("--- Index maintenance (insert / bed change / delete) ---")
+    db = SessionLocal()
+    pid = str(uuid.uuid4())
+    db.add(models.PatientRecord(id=pid, esi_level=2, acuity="Critical", symptoms=[],
+                                patient_name="Zubin Quraishi", condition="ESI 2: Chest pain"))
+    db.commit()
+    assert PatientSearch.search(db, "zub")[0]["id"] == pid, "New admission not searchable"
+    assert PatientSearch.search(db, pid[:8])[0]["id"] == pid, "Id prefix not searchable"
+
+    record = db.query(models.PatientRecord).filter(models.PatientRecord.id == pid).first()
+    record.bed_id = "ICU-7"
+    db.commit()
+    assert any(r["id"] == pid for r in PatientSearch.search(db, "Zubin ICU-7")), "Bed change not indexed"
+
+    db.delete(record)
+    db.commit()
+    assert not PatientSearch.search(db, "Zubin Quraishi"), "Deleted patient still searchable"
+    db.close()
+    print("   [PASS] Triggers keep the index in step with the patients table.")
+
+def test_search_latency(rounds=200):
+    print("--- Search latency (in-process, FTS5) ---")
+    db = SessionLocal()
+    some_id = db.query(models.PatientRecord.id).first().id
+    queries = ["ra", "rav", "ravi", "ravi sha", "Priya Iyer", "sep", "sepsis", "esi 1", "fract",
+               some_id[:4], some_id[:8], some_id, "zzzz", "l", "me"]
+    timings = []
+    for _ in range(rounds):
+        for q in queries:
+            start = time.perf_counter()
+            PatientSearch.search(db, q)
+            timings.append((time.perf_counter() - start) * 1000)
+    db.close()
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99)]
+    print(f"   {len(timings)} searches: p50 {timings[len(timings) // 2]:.2f} ms, p99 {p99:.2f} ms, max {timings[-1]:.2f} ms")
+    assert p99 < 5.0, "p99 target is 5 ms"
+
+    http = []
+    for q in queries:
+        start = time.perf_counter()
+        res = requests.get(BASE_URL, params={"q": q})
+        http.append((time.perf_counter() - start) * 1000)
+        assert res.status_code == 200
+    http.sort()
+    print(f"   Endpoint p50 {http[len(http) // 2]:.1f} ms (includes HTTP and response encoding)")
+
+if __name__ == "__main__":
+    import sys
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Seeding {count:,} patient records...")
+    start = time.perf_counter()
+    seed_patients(count)
+    print(f"   Seeded (index maintained by triggers) in {time.perf_counter() - start:.0f}s")
+    try:
+        test_index_follows_writes()
+        test_search_latency()
+    finally:
+        cleanup()
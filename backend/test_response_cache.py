@@ -0,0 +1,129 @@
+import asyncio
+import requests
+import statistics
+import threading
+import time
+import httpx
+from fastapi import FastAPI, HTTPException
+from response_cache import ResponseCache, ResponseCacheMiddleware
+from table_versions import table_versions
+
+BASE_URL = "http://localhost:8000/api"
+
+def make_app(ttl=30):
+    calls = {"slow": 0}
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow(q: str = ""):
+        calls["slow"] += 1
+        await asyncio.sleep(0.2)
+        return {"q": q, "call": calls["slow"]}
+
+    @app.get("/fails")
+    async def fails():
+        calls["fails"] = calls.get("fails", 0) + 1
+        raise HTTPException(status_code=503, detail="down")
+
+    cache = ResponseCache({"/slow": (("beds",), ttl), "/fails": (("beds",), ttl)})
+    app.add_middleware(ResponseCacheMiddleware, cache=cache)
+    return app, calls
+
+async def run_in_process():
+    app, calls = make_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        print("--- Single-flight: 50 identical requests at once ---")
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[client.get("/slow", params={"q": "a"}) for _ in range(50)])
+        elapsed = time.perf_counter() - start
+        print(f"   Endpoint ran {calls['slow']} time(s); all 50 answered in {elapsed:.2f}s")
+        assert calls["slow"] == 1 and {r.json()["call"] for r in responses} == {1}
+        assert sorted(r.headers["x-cache"] for r in responses).count("MISS") == 1
+
+        print("--- Keys, Invalidation, TTL, Errors ---")
+        assert (await client.get("/slow?q=a")).headers["x-cache"] == "HIT"
+        assert (await client.get("/slow?q=b")).json()["call"] == 2 # Parameters are part of the key
+        assert (await client.get("/slow?q=a&x=1")).json()["call"] == 3
+        assert (await client.get("/slow?x=1&q=a")).headers["x-cache"] == "HIT" # Parameter order is not
+
+        table_versions.bump(["beds"]) # What a committed write to beds does
+        assert (await client.get("/slow?q=a")).json()["call"] == 4
+        table_versions.bump(["ambulances"]) # Unrelated table: still cached
+        assert (await client.get("/slow?q=a")).headers["x-cache"] == "HIT"
+        forced = await client.get("/slow?q=a", headers={"Cache-Control": "no-cache"})
+        assert forced.json()["call"] == 5 and forced.headers["x-cache"] == "MISS"
+        assert (await client.get("/slow?q=a")).json()["call"] == 5 # The forced response replaced the entry
+
+        for _ in range(3):
+            assert (await client.get("/fails")).status_code == 503
+        assert calls["fails"] == 3, "Error responses were cached"
+
+    app, calls = make_app(ttl=0.3)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        await client.get("/slow")
+        await asyncio.sleep(0.4)
+        assert (await client.get("/slow")).headers["x-cache"] == "MISS"
+    print("   [PASS] Keyed by path and parameters; table writes, TTL and no-cache refresh entries; errors are never cached.")
+
+def test_middleware_in_process():
+    asyncio.run(run_in_process())
+
+def test_server_invalidation():
+    print("--- GET /api/erp/beds around an Admission ---")
+    params = {"type": "ICU", "fields": "id,status"}
+    requests.get(f"{BASE_URL}/erp/beds", params=params)
+    res = requests.get(f"{BASE_URL}/erp/beds", params=params)
+    assert res.headers["x-cache"] == "HIT"
+    bed = next(b for b in res.json() if b["status"] == "AVAILABLE")
+    admit = requests.post(f"{BASE_URL}/erp/admit", json={
+        "patient_name": "Cache Test", "patient_age": 61, "gender": "M",
+        "condition": "Post-op Observation", "staff_id": "N-01", "bed_id": bed["id"]
+    })
+    assert admit.status_code == 200, admit.text
+    try:
+        res = requests.get(f"{BASE_URL}/erp/beds", params=params)
+        assert res.headers["x-cache"] == "MISS"
+        assert {b["id"]: b["status"] for b in res.json()}[bed["id"]] == "OCCUPIED"
+    finally:
+        requests.post(f"{BASE_URL}/erp/discharge/{bed['id']}")
+    print("   [PASS] The admission's commit invalidated the cached bed board.")
+
+    rooms = requests.get(f"{BASE_URL}/queue/rooms")
+    again = requests.get(f"{BASE_URL}/queue/rooms", headers={"If-None-Match": rooms.headers["etag"]})
+    assert again.status_code == 304 and again.headers["x-cache"] == "HIT"
+    print("   [PASS] Conditional requests still get 304 from the cached ETag.")
+
+def test_server_latency(rounds=30, clients=16, polls=20):
+    print("--- Bed Board: Cache Miss vs Hit ---")
+    session = requests.Session()
+    url = f"{BASE_URL}/erp/beds"
+    timings = {"HIT": [], "MISS": []}
+    for i in range(rounds):
+        # The full board is cached after the first round; the filtered query is new every round (always a miss)
+        for params in ({}, {"fields": f"id,status,{'type' if i % 2 else 'unit'}", "status": f"AVAILABLE,OCCUPIED,X{i}"}):
+            start = time.perf_counter()
+            res = session.get(url, params=params)
+            timings[res.headers["x-cache"]].append((time.perf_counter() - start) * 1000)
+    hit, miss = statistics.median(timings["HIT"]), statistics.median(timings["MISS"])
+    print(f"   miss p50 {miss:.1f} ms | hit p50 {hit:.1f} ms")
+    assert hit < miss
+
+    print(f"--- {clients} Clients Polling Concurrently ---")
+    misses = []
+    def client():
+        session = requests.Session()
+        for _ in range(polls):
+            if session.get(url, params={"type": "Wards"}).headers["x-cache"] == "MISS":
+                misses.append(1)
+    pool = [threading.Thread(target=client) for _ in range(clients)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    print(f"   {clients * polls} requests, endpoint ran {len(misses)} time(s)")
+    assert len(misses) <= 1
+
+if __name__ == "__main__":
+    test_middleware_in_process()
+    test_server_invalidation()
+    test_server_latency()
@@ -0,0 +1,80 @@
+import json
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+import models
+import schemas
+from schemas import FastJSONResponse, columns, as_dicts
+from testing_utils import memory_session, timed
+
+# Serialization cost per 1,000 rows for the hot list endpoints: the old path (ORM objects
+# through jsonable_encoder), FastAPI's typed path (response_model validation + pydantic-core
+# dump_json) and the path the endpoints now use (schema columns as plain rows + orjson).
+ROWS = 1000
+
+def make_session():
+    _, db = memory_session(models.BedModel, models.PatientQueue)
+    now = datetime.utcnow()
+    db.add_all(models.BedModel(
+        id=f"WARD-{i}", type="Wards", unit="General", is_occupied=i % 2 == 0, status="OCCUPIED" if i % 2 == 0 else "AVAILABLE",
+        patient_name=f"Patient {i}" if i % 2 == 0 else None, patient_age=40 + i % 30, condition="Stable",
+        admission_time=now - timedelta(hours=i % 48), gender="Any"
+    ) for i in range(ROWS))
+    db.add_all(models.PatientQueue(
+        id=str(uuid.uuid4()), patient_name=f"OPD {i}", patient_age=30 + i % 50, gender="Female", base_acuity=1 + i % 5,
+        vitals={"hr": 88, "bp": "120/80", "spo2": 97}, symptoms=["Fever", "Cough"], icd_code="J18.9",
+        triage_urgency="URGENT", check_in_time=now - timedelta(minutes=i), static_score=75.0, priority_key=1000.0 - i
+    ) for i in range(ROWS))
+    db.commit()
+    return db
+
+@pytest.fixture(scope="module")
+def db():
+    session = make_session()
+    yield session
+    session.close()
+
+def bench(label, db, model, schema):
+    print(f"--- {label}: {ROWS} rows ---")
+    adapter = TypeAdapter(List[schema])
+
+    def legacy():
+        db.expire_all()
+        return json.dumps(jsonable_encoder(db.query(model).all())).encode()
+
+    def typed():
+        db.expire_all()
+        return adapter.dump_json(adapter.validate_python(db.query(model).all(), from_attributes=True))
+
+    def fast():
+        return FastJSONResponse(as_dicts(db.query(*columns(model, schema)))).body
+
+    def report(name, fn):
+        ms, body = timed(fn)
+        print(f"   {name:<58} {ms:7.2f} ms")
+        return ms, body
+
+    legacy_ms, legacy_body = report("ORM + jsonable_encoder + json.dumps (before)", legacy)
+    typed_ms, _ = report("ORM + response_model validation + dump_json", typed)
+    fast_ms, fast_body = report("schema columns + orjson (now)", fast)
+
+    before, after = json.loads(legacy_body), json.loads(fast_body)
+    adapter.validate_python(after) # Conforms to the declared response schema
+    assert [{k: r[k] for k in schema.model_fields if k in r} for r in before] == after, "Payload changed"
+    print(f"   -> {legacy_ms / fast_ms:.1f}x faster than before, {typed_ms / fast_ms:.1f}x faster than validating")
+    assert fast_ms * 2 < legacy_ms, "orjson path should be well ahead of jsonable_encoder"
+    assert fast_ms < typed_ms, "orjson path should beat response_model validation"
+
+def test_bed_board_serialization(db):
+    bench("GET /api/erp/beds", db, models.BedModel, schemas.BedOut)
+
+def test_sorted_queue_serialization(db):
+    bench("GET /api/queue/sorted rows", db, models.PatientQueue, schemas.QueuePatientOut)
+
+if __name__ == "__main__":
+    session = make_session()
+    test_bed_board_serialization(session)
+    test_sorted_queue_serialization(session)
@@ -0,0 +1,139 @@
+import requests
+import threading
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select, update
+from database import SessionLocal, engine
+import models
+from inventory_service import InventoryService
+from stock_alerts import StockAlertService, ESCALATION_MINUTES
+
+# Run from the server's working directory so both share hospital_os.db
+BASE_URL = "http://localhost:8000/api/inventory/alerts"
+ITEM_PREFIX = "Alert Test"
+
+def create_item(quantity, reorder_level):
+    with engine.begin() as conn:
+        cleanup(conn)
+        conn.execute(insert(models.InventoryItem.__table__).values(
+            name=f"{ITEM_PREFIX} item", category="Test", quantity=quantity, reorder_level=reorder_level, unit_price=1.0))
+        return conn.execute(select(models.InventoryItem.id).where(models.InventoryItem.name == f"{ITEM_PREFIX} item")).scalar()
+
+def cleanup(conn):
+    ids = select(models.InventoryItem.id).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%"))
+    for table in (models.InventoryLog.__table__, models.InventoryBurnRate.__table__, models.StockAlert.__table__):
+        conn.execute(delete(table).where(table.c.item_id.in_(ids)))
+    conn.execute(delete(models.InventoryItem.__table__).where(models.InventoryItem.name.like(f"{ITEM_PREFIX}%")))
+
+@pytest.fixture(scope="module", autouse=True)
+def clean_items():
+    yield
+    with engine.begin() as conn:
+        cleanup(conn)
+
+def deduct(db, item_id, n=1):
+    # What record_usage does for each clinical event
+    rows = InventoryService.deduct_items(db, {item_id: n}, patient_name=ITEM_PREFIX)
+    StockAlertService.evaluate(db, rows)
+    db.commit()
+
+def set_stock(db, item_id, quantity):
+    db.execute(update(models.InventoryItem).where(models.InventoryItem.id == item_id).values(quantity=quantity))
+    row = db.execute(select(models.InventoryItem.id, models.InventoryItem.name, models.InventoryItem.quantity,
+                            models.InventoryItem.reorder_level).where(models.InventoryItem.id == item_id)).all()
+    StockAlertService.evaluate(db, row)
+    db.commit()
+
+def events_since(db, since):
+    rows = db.query(models.OutboxEvent).filter(
+        models.OutboxEvent.event_type.like("LOW_STOCK%"), models.OutboxEvent.created_at >= since
+    ).order_by(models.OutboxEvent.id).all()
+    return [(r.event_type, r.payload.get("state")) for r in rows if r.payload.get("item_name", "").startswith(ITEM_PREFIX)]
+
+def state(db, item_id):
+    db.expire_all()
+    return db.get(models.StockAlert, item_id).state
+
+def test_deduplication():
+    print("--- 29 Deductions Through the Reorder Level ---")
+    item_id = create_item(30, 20)
+    db = SessionLocal()
+    since = datetime.utcnow()
+    for _ in range(29):
+        deduct(db, item_id)
+    events = events_since(db, since)
+    print(f"   Below reorder level on 19 deductions; events sent: {events}")
+    assert events == [("LOW_STOCK_ALERT", "LOW"), ("LOW_STOCK_ALERT", "CRITICAL")]
+    db.close()
+    print("   [PASS] One alert when the item went LOW, one when it went CRITICAL.")
+
+def test_hysteresis():
+    print("--- Hysteresis (reorder 20: critical <= 5, clears above 6 / at 24+) ---")
+    item_id = create_item(4, 20)
+    db = SessionLocal()
+    since = datetime.utcnow()
+    for quantity, expected in [(4, "CRITICAL"), (6, "CRITICAL"), (7, "LOW"), (21, "LOW"), (19, "LOW"),
+                               (23, "LOW"), (24, "OK"), (21, "OK"), (19, "LOW"), (2, "CRITICAL"), (30, "OK")]:
+        set_stock(db, item_id, quantity)
+        assert state(db, item_id) == expected, (quantity, state(db, item_id))
+    events = [e for e, _ in events_since(db, since)]
+    assert events == ["LOW_STOCK_ALERT", "LOW_STOCK_ALERT", "LOW_STOCK_RESOLVED",
+                      "LOW_STOCK_ALERT", "LOW_STOCK_ALERT", "LOW_STOCK_RESOLVED"], events
+    db.close()
+    print("   [PASS] No flapping around either threshold; 6 transitions over 11 stock changes.")
+
+def test_escalation_and_endpoint():
+    print("--- Escalation, Open Alerts Endpoint and Acknowledgement ---")
+    item_id = create_item(15, 20)
+    db = SessionLocal()
+    set_stock(db, item_id, 15)
+    now = datetime.utcnow()
+    # Scoped to the test item: real open alerts in the shared DB are left alone
+    mine = [item_id]
+    assert StockAlertService.escalate_due(db, now, mine) == 0
+    later = now + timedelta(minutes=ESCALATION_MINUTES["LOW"] + 1)
+    assert StockAlertService.escalate_due(db, later, mine) == 1
+    assert StockAlertService.escalate_due(db, later, mine) == 0, "Escalated twice for one period"
+
+    alerts = {a["item_id"]: a for a in requests.get(BASE_URL).json()}
+    assert alerts[item_id]["state"] == "LOW" and alerts[item_id]["escalation_level"] == 1
+    assert requests.post(f"{BASE_URL}/{item_id}/ack").status_code == 200
+    assert StockAlertService.escalate_due(db, later + timedelta(days=1), mine) == 0, "Acknowledged alert escalated"
+
+    set_stock(db, item_id, 30)
+    assert item_id not in {a["item_id"] for a in requests.get(BASE_URL).json()}
+    assert requests.post(f"{BASE_URL}/{item_id}/ack").status_code == 404
+    db.close()
+    print("   [PASS] Escalates once per period, listed while open, silenced by ack, gone once cleared.")
+
+def test_concurrent_transitions():
+    print("--- 8 Threads Deducting Through the Threshold ---")
+    item_id = create_item(1000, 900)
+    since = datetime.utcnow()
+    def worker():
+        db = SessionLocal()
+        try:
+            for _ in range(20):
+                deduct(db, item_id)
+        finally:
+            db.close()
+    pool = [threading.Thread(target=worker) for _ in range(8)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    db = SessionLocal()
+    events = events_since(db, since)
+    db.close()
+    assert events == [("LOW_STOCK_ALERT", "LOW")], events
+    print("   [PASS] 60 deductions below the reorder level, exactly one alert.")
+
+if __name__ == "__main__":
+    try:
+        test_deduplication()
+        test_hysteresis()
+        test_escalation_and_endpoint()
+        test_concurrent_transitions()
+    finally:
+        with engine.begin() as conn:
+            cleanup(conn)
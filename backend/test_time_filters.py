@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from database import SessionLocal
+import models
+from finance_service import FinanceService
+from time_filters import day_bounds, day_filter, hospital_today
+
+# Run from the server's working directory (uses hospital_os.db directly)
+TAG = "TZ Filter Test"
+
+def test_ist_day_bounds():
+    print("--- IST day bounds ---")
+    start, end = day_bounds(date(2026, 3, 1))
+    assert start == datetime(2026, 2, 28, 18, 30) and end == datetime(2026, 3, 1, 18, 30), (start, end)
+    print(f"   [PASS] 2026-03-01 IST = [{start}, {end}) UTC")
+
+def test_revenue_history_uses_ist_days():
+    print("--- Revenue history buckets by IST day ---")
+    db = SessionLocal()
+    today = hospital_today()
+    midnight_utc = day_bounds(today)[0]
+    # One minute either side of IST midnight: same UTC date, different IST days
+    db.add_all([
+        models.BillingLedger(item_type="TEST", description=TAG, amount=100.0, timestamp=midnight_utc - timedelta(minutes=1)),
+        models.BillingLedger(item_type="TEST", description=TAG, amount=7.0, timestamp=midnight_utc + timedelta(minutes=1)),
+    ])
+    db.commit()
+    try:
+        before = {h["date"]: h["revenue"] for h in FinanceService.get_revenue_history(db, days=2)}
+        assert before[str(today)] >= 7.0 and before[str(today - timedelta(days=1))] >= 100.0, before
+        print(f"   [PASS] Split across IST midnight: {before}")
+    finally:
+        db.query(models.BillingLedger).filter(models.BillingLedger.description == TAG).delete()
+        db.commit()
+        db.close()
+
+def test_filters_use_indexes():
+    print("--- Query plans ---")
+    db = SessionLocal()
+    checks = {
+        "clinical history day": db.query(models.PatientRecord).filter(*day_filter(models.PatientRecord.timestamp, hospital_today())),
+        "revenue history range": db.query(models.BillingLedger.amount).filter(*day_filter(models.BillingLedger.timestamp, hospital_today())),
+        "expense history range": db.query(models.HospitalExpense.amount).filter(*day_filter(models.HospitalExpense.timestamp, hospital_today())),
+    }
+    for name, query in checks.items():
+        sql = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql)))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, f"{name}: {plan}"
+        print(f"   [PASS] {name}: {plan}")
+    db.close()
+
+if __name__ == "__main__":
+    test_ist_day_bounds()
+    test_revenue_history_uses_ist_days()
+    test_filters_use_indexes()
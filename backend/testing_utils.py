@@ -0,0 +1,86 @@
+import requests
+import time
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from database import SessionLocal
+import models
+
+# Shared helpers for the test_*.py scripts. The server-side ones expect the server on :8000,
+# run from the same working directory so both share hospital_os.db.
+BASE_URL = "http://localhost:8000/api"
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+def memory_session(*tables):
+    """Session on a private in-memory database holding just these models' tables. Returns (engine, session)."""
+    engine = create_engine("sqlite://")
+    for model in tables:
+        model.__table__.create(engine)
+    return engine, sessionmaker(bind=engine)()
+
+@contextmanager
+def seeding(seed_fn, cleanup_fn):
+    """
+    Test data for the shared database: cleanup_fn() (leftovers of an interrupted run), then
+    seed_fn(). Yields what seed_fn returned and runs cleanup_fn() again afterwards.
+    """
+    cleanup_fn()
+    try:
+        yield seed_fn()
+    finally:
+        cleanup_fn()
+
+def seeded(seed_fn, cleanup_fn, name: str):
+    """Module-scoped autouse fixture `name` around seeding(); tests that request it get seed_fn's return value."""
+    @pytest.fixture(scope="module", autouse=True, name=name)
+    def fixture():
+        with seeding(seed_fn, cleanup_fn) as value:
+            yield value
+    return fixture
+
+def timed(fn, rounds: int = 50):
+    """Mean milliseconds per call over `rounds` calls, after one warm-up call; also returns the last result."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = fn()
+    return (time.perf_counter() - start) / rounds * 1000, result
+
+def statements(engine, fn):
+    """Runs fn(); returns (SQL statements it executed on `engine`, its result)."""
+    count = [0]
+    def listener(*args):
+        count[0] += 1
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        result = fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    return count[0], result
+
+def fill_idle_rooms():
+    """
+    Checks in one low-acuity filler per IDLE doctor room. With server-side dispatch on, an
+    idle room takes each arrival at check-in, so patients checked in afterwards stay WAITING.
+    """
+    rooms = requests.get(f"{BASE_URL}/queue/rooms", headers=NO_CACHE).json()
+    for room in rooms:
+        if room["status"] == "IDLE":
+            requests.post(f"{BASE_URL}/queue/checkin", json={
+                "patient_name": f"Filler {room['id']}", "patient_age": 30, "gender": "M",
+                "base_acuity": 5, "vitals": {}, "symptoms": []
+            })
+
+@contextmanager
+def idle_test_room(room_id: str = "Test Room"):
+    """An IDLE doctor room owned by the test, written straight to the database and removed afterwards."""
+    db = SessionLocal()
+    db.merge(models.DoctorRoom(id=room_id, doctor_name="Test Doctor", status="IDLE", current_patient_id=None))
+    db.commit()
+    try:
+        yield room_id
+    finally:
+        db.query(models.DoctorRoom).filter(models.DoctorRoom.id == room_id).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import func
+
+# All timestamps are stored as naive UTC (datetime.utcnow()); "a day" means a calendar
+# day at the hospital. IST has no DST, so a fixed offset is exact.
+HOSPITAL_TZ = timezone(timedelta(hours=5, minutes=30), "IST")
+
+def to_utc_naive(local_dt: datetime) -> datetime:
+    """Hospital-local (or any aware) datetime -> naive UTC, the storage format."""
+    if local_dt.tzinfo is None:
+        local_dt = local_dt.replace(tzinfo=HOSPITAL_TZ)
+    return local_dt.astimezone(timezone.utc).replace(tzinfo=None)
+
+def hospital_today() -> date:
+    return datetime.now(HOSPITAL_TZ).date()
+
+def day_bounds(day: date):
+    """[start, end) in naive UTC for one hospital-local calendar day."""
+    start = to_utc_naive(datetime.combine(day, time.min, tzinfo=HOSPITAL_TZ))
+    return start, start + timedelta(days=1)
+
+def range_bounds(first_day: date, last_day: date):
+    """[start, end) in naive UTC covering hospital-local days first_day..last_day inclusive."""
+    return day_bounds(first_day)[0], day_bounds(last_day)[1]
+
+def day_filter(column, day: date):
+    """
+    Index-friendly replacement for func.date(column) == day: a half-open range on the
+    raw column, so SQLite can seek the timestamp index instead of scanning the table.
+    """
+    start, end = day_bounds(day)
+    return (column >= start, column < end)
+
+def range_filter(column, first_day: date = None, last_day: date = None):
+    """Same as day_filter for an inclusive span of local days; either end may be open."""
+    conditions = []
+    if first_day:
+        conditions.append(column >= day_bounds(first_day)[0])
+    if last_day:
+        conditions.append(column < day_bounds(last_day)[1])
+    return tuple(conditions)
+
+def local_date(column):
+    """
+    Hospital-local calendar date of a UTC column, for GROUP BY / SELECT only
+    (never for filtering: wrapping the column defeats its index).
+    """
+    offset = int(HOSPITAL_TZ.utcoffset(None).total_seconds() // 60)
+    return func.date(column, f"{offset:+d} minutes")
@@ -52,7 +52,7 @@ export default function HistoryPage() {
   const [searchTerm, setSearchTerm] = useState("");
   const [error, setError] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
-  const [selectedDate, setSelectedDate] = useState(new Date().toISOString().split('T')[0]);
+  const [selectedDate, setSelectedDate] = useState(new Date().toLocaleDateString('en-CA')); // Local (IST) calendar day, as the API expects
 
   useEffect(() => {
     const fetchData = async () => {
@@ -14,7 +14,7 @@ export default function CombinedHistoryPage() {
         try {
             // FIX: Manual ISO date construction to ensure YYYY-MM-DD format regardless of browser locale
             const now = new Date();
-            const today = now.toISOString().split('T')[0]; 
+            const today = now.toLocaleDateString('en-CA'); // Local (IST) calendar day
             
             const endpoint = view === "GENERAL" 
                 ? `/api/history/day/${today}` 
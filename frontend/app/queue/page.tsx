@@ -175,6 +175,8 @@ export default function QueuePage() {
         }
 
         // --- 2. ROOM ASSIGNMENT LOGIC (Existing) ---
+        // With server-side dispatch on, idle rooms already take the top of the queue
+        if (queueData?.auto_dispatch) return;
         if (standardAutoPatients.length === 0) {
             if (superCriticalPatients.length === 0) toast("No critical patients to assign.", "info");
             return;